@@ -6,18 +6,26 @@ from tkinter.scrolledtext import ScrolledText
 import tkinter.font as tkFont
 from tkinter.constants import *
 
+import os
 import warnings
 import traceback
 warnings.filterwarnings("ignore", category=FutureWarning) # remove future warnings for debugging
 
 # Import custom modules
-from packages.vtt_formatting import format_VTT
+from packages.transcript_store import load_or_convert
 from packages.timeline_generator import create_timeline_figure
 from packages.stats_generator import create_stats_figure
-from packages.chunk_splitter import split_text_into_chunks
-from packages.summaries import abstractive_summarize_chunks, extractive_summarize_chunks, format_vtt_as_dialogue
-from packages.openai import summarize_text, utility_text
-from packages.sentiment import sentiment
+from packages.speaker_stats import compute_speaker_stats
+from packages.inference_client import split_chunks, sentiment_scores, summary_model_name
+from packages.extractive import extract_key_cues, format_key_cues, WORDS_PER_KEY_CUE
+from packages.mapreduce import MapReduceSummarizer
+from packages.openai import summarize_text, utility_text, MODEL as OPENAI_MODEL
+from packages.sentiment import sentiment, boundary_score
+from packages.models import MODEL_NAME
+from packages.cache import default_cache, content_hash
+from packages.search_index import default_index
+from packages.vtt_formatting import format_milliseconds
+from UI.tasks import TaskExecutor
 
 # Window size
 window_width = 1400
@@ -47,6 +55,7 @@ class VTTAnalyzer(tk.Tk):
         print("Window Initialized")
 
         self.ab = None  # Abstractive summarization result placeholder
+        self.ab_words = None  # Length of the abstractive summary, set by the slider
         self.ex = None  # Extractive summarization result placeholder
         self.ai = None  # Summary generated by openAI api
         self.timeline = None  # Timeline visualization placeholder
@@ -54,9 +63,20 @@ class VTTAnalyzer(tk.Tk):
         self.chunks = None  # Text chunks for analysis placeholder
         self.canvas_widget = None  # Canvas widget for dynamic content display
         self.df = None  # DataFrame to hold VTT data, if applicable
+        self.content_hash = None  # Identifies the loaded transcript in the result cache
+        self.speaker_stats = None  # Per-speaker statistics of the loaded transcript
+        self.file_path = None  # Path of the loaded transcript
+        self.pending_hit = None  # Search hit shown once its meeting is loaded
+        self.cache = default_cache()  # Results persisted across sessions, shared with the batch tools
 
         self.setup_scrollable_window()  # Setup the main GUI components
 
+        # Heavy work runs on background threads, results come back through the Tk main loop
+        self.tasks = TaskExecutor(self)
+        self.tasks.on_progress = self.update_progress
+        self.tasks.on_state_change = self.update_task_status
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
         print("Initialized")
 
 
@@ -193,6 +213,26 @@ class VTTAnalyzer(tk.Tk):
         # Create a Button to trigger the get_text function
         self.prompt_button = tk.Button(self.button_frame, text="Get Text", command=self.get_prompt)
         self.prompt_button.grid(row=7, column=0, pady=10, padx=10, sticky="ew")
+
+        # Search across every indexed meeting
+        self.search_entry = tk.Entry(self.button_frame)
+        self.search_entry.grid(row=8, column=0, pady=[20, 10], padx=10, sticky="ew")
+        self.search_entry.bind('<Return>', self.search_archive)
+
+        self.search_button = ttk.Button(self.button_frame, text="Search all meetings",
+                                        command=self.search_archive, **button_options)
+        self.search_button.grid(row=9, column=0, pady=10, padx=10, sticky="ew")
+
+        # Progress of the background tasks
+        self.task_label = ttk.Label(self.button_frame, text="Idle", style='TLabel')
+        self.task_label.grid(row=10, column=0, pady=[20, 0], padx=10, sticky="w")
+
+        self.progress_bar = ttk.Progressbar(self.button_frame, orient=tk.HORIZONTAL, mode='determinate', maximum=100)
+        self.progress_bar.grid(row=11, column=0, pady=10, padx=10, sticky="ew")
+
+        self.cancel_button = ttk.Button(self.button_frame, text="Cancel", state='disabled',
+                                        command=self.cancel_tasks, **button_options)
+        self.cancel_button.grid(row=12, column=0, pady=10, padx=10, sticky="ew")
         
     def create_widgets(self):
         self.upload_label = tk.Label(self.upload_frame, text="Please upload a VTT file:", 
@@ -269,6 +309,77 @@ class VTTAnalyzer(tk.Tk):
 
 
 
+    def search_archive(self, event=None):
+        """
+        Search the cues of every indexed meeting in the background and list the best matches in the summary box.
+        """
+        query = self.search_entry.get().strip()
+        if query:
+            self.tasks.submit("Search", lambda task: default_index().search(query, limit=20),
+                              on_success=self.show_search_hits, widgets=[self.search_button])
+
+
+
+    def show_search_hits(self, hits):
+        """
+        List search hits in the summary box. Clicking a hit opens its meeting at the matching cue.
+
+        Args:
+            hits (List[SearchHit]): The hits, best first.
+        """
+        self.summary_box.configure(state='normal')
+        self.summary_box.delete('1.0', tk.END)
+        if not hits:
+            self.summary_box.insert(tk.END, "No match.")
+
+        for i, hit in enumerate(hits):
+            timestamp = format_milliseconds(hit.start_ms) if hit.start_ms is not None else "untimed"
+            tag = f"hit{i}"
+            self.summary_box.insert(tk.END, f"{os.path.basename(hit.path)} [{timestamp}] {hit.speaker or ''}: {hit.text or ''}",
+                                    ('hit', tag))
+            self.summary_box.insert(tk.END, "\n\n")
+            self.summary_box.tag_bind(tag, '<Button-1>', lambda event, hit=hit: self.open_hit(hit))
+
+        self.summary_box.tag_config('hit', foreground='blue', underline=True)
+        self.summary_box.configure(state='disabled')
+
+
+
+    def open_hit(self, hit):
+        """
+        Show the transcript of a search hit at the matching cue, loading its meeting first if another one is open.
+
+        Args:
+            hit (SearchHit): The hit.
+        """
+        if hit.path == self.file_path:
+            self.jump_to_cue(hit)
+        elif hit.path.lower().endswith(".vtt"):
+            self.pending_hit = hit
+            self.start_loading(hit.path)
+
+
+
+    def jump_to_cue(self, hit):
+        """
+        Show the full transcript, scrolled to the cue of a search hit and highlighted.
+
+        Args:
+            hit (SearchHit): The hit, from the loaded meeting.
+        """
+        self.view_transcript()
+        if hit.start_ms is None:
+            return
+
+        # Cues are found by their timing line in the formatted content
+        index = self.transcript_box.search(f"{format_milliseconds(hit.start_ms, 3)} -->", '1.0', stopindex='end')
+        if index:
+            self.transcript_box.tag_add('highlight', index, f"{index} +2 lines linestart")
+            self.transcript_box.tag_config('highlight', background='yellow')
+            self.transcript_box.see(index)
+
+
+
     def start_search(self, event=None):
         """
         Initiate the search when the user presses the Enter key or clicks the search button.
@@ -300,44 +411,161 @@ class VTTAnalyzer(tk.Tk):
     def open_file(self):
         """
         Open a file dialog to allow the user to select a VTT file and then load its content into the application.
-        Upon loading, the function will update the interface to reflect the loaded file and enable further analysis options.
+        The file is parsed in the background; once loaded, the interface is updated to reflect the loaded file
+        and further analysis options are enabled.
         """
         # Open a file dialog to select a VTT file
         file_path = filedialog.askopenfilename(filetypes=[("VTT files", "*.vtt")])
         if file_path:
-            try:
-                # Attempt to format and load data from the selected VTT file
-                self.df, self.formatted_content = format_VTT(file_path)
-                
-                self.create_buttons()
-                # Enable analysis buttons once file is successfully loaded
-                self.ex_analyze_button.config(state='normal')
-                self.ab_analyze_button.config(state='normal')
-                self.ai_analyze_button.config(state='normal')
-                self.ai_utility_button.config(state='normal')
-                self.prompt.config(state="normal")
-                self.transcript_button.config(state='normal')
-                self.sentiment_button.config(state='normal')
-                
-                # Update the upload label to show the loaded file name
-                self.upload_label.config(text=f"File loaded: {file_path.split('/')[-1]}")
-                
-                # Optional debugging message to confirm file load
-                print(), print("VTT file loaded successfully.")
-
-                # Display visualizations and summaries based on the loaded data
-                self.show_plot(create_timeline_figure)  # Visualize timeline data
-                self.show_plot(create_stats_figure)  # Visualize statistical data
-                
-
-            except Exception as e:
-                # Capture and print the traceback for detailed error information
-                error_message = traceback.format_exc()
-                print(error_message)
-                
-                # Show a message box with the error
-                # messagebox.showerror("Error", f"An error occurred while loading the file:\n{error_message}")
-                self.upload_label.config(text="Failed to load file.")
+            self.pending_hit = None
+            self.start_loading(file_path)
+
+
+
+    def start_loading(self, file_path):
+        """
+        Load a VTT file in the background, as open_file does once a file is chosen.
+
+        Args:
+            file_path (str): Path of the VTT file.
+        """
+        # Attempt to format and load data from the selected VTT file
+        self.upload_label.config(text=f"Loading: {file_path.split('/')[-1]}")
+        # Instrumentation events of the tasks are labelled with the meeting they work on
+        self.tasks.labels = {"meeting": file_path.split('/')[-1]}
+        self.tasks.submit("Loading file", lambda task: self.load_file(file_path),
+                          on_success=lambda result: self.on_file_loaded(file_path, result),
+                          on_error=lambda error: self.upload_label.config(text="Failed to load file."),
+                          widgets=[self.upload_button])
+
+
+
+    def load_file(self, file_path):
+        """
+        Background part of open_file: load the VTT file from its binary store, parsing it only the first time
+        it is opened or after it changed, and compute the speaker statistics.
+
+        Args:
+            file_path (str): Path of the VTT file.
+
+        Returns:
+            tuple: The DataFrame, the formatted content, its content hash and the speaker statistics.
+        """
+        transcript, formatted_content = load_or_convert(file_path)
+        df = transcript.to_frame(timestamps=True)
+        digest = content_hash(formatted_content)
+        speaker_stats = self.cache.get_or_compute(digest, 'stats', lambda: compute_speaker_stats(df))
+        return df, formatted_content, digest, speaker_stats
+
+
+
+    def on_file_loaded(self, file_path, result):
+        """
+        Update the interface once a VTT file has been parsed in the background.
+
+        Args:
+            file_path (str): Path of the loaded file.
+            result (tuple): The DataFrame, formatted content, content hash and speaker statistics returned by load_file.
+        """
+        try:
+            self.df, self.formatted_content, self.content_hash, self.speaker_stats = result
+            self.file_path = os.path.abspath(file_path)
+
+            # Results computed for the previous file are no longer valid
+            self.ab = None
+            self.ab_words = None
+            self.ex = None
+            self.ai = None
+            self.utility = None
+            self.chunks = None
+
+            # Enable analysis buttons once file is successfully loaded
+            self.ex_analyze_button.config(state='normal')
+            self.ab_analyze_button.config(state='normal')
+            self.ai_analyze_button.config(state='normal')
+            self.ai_utility_button.config(state='normal')
+            self.prompt.config(state="normal")
+            self.transcript_button.config(state='normal')
+            self.sentiment_button.config(state='normal')
+            
+            # Update the upload label to show the loaded file name
+            self.upload_label.config(text=f"File loaded: {file_path.split('/')[-1]}")
+            
+            # Optional debugging message to confirm file load
+            print(), print("VTT file loaded successfully.")
+
+            # Display visualizations and summaries based on the loaded data
+            self.show_plot(create_timeline_figure)  # Visualize timeline data
+            self.show_plot(create_stats_figure, self.speaker_stats)  # Visualize statistical data
+
+            # Opened from a search hit: show the matching cue
+            if self.pending_hit is not None and self.pending_hit.path == self.file_path:
+                hit, self.pending_hit = self.pending_hit, None
+                self.jump_to_cue(hit)
+            
+
+        except Exception as e:
+            # Capture and print the traceback for detailed error information
+            error_message = traceback.format_exc()
+            print(error_message)
+            
+            # Show a message box with the error
+            # messagebox.showerror("Error", f"An error occurred while loading the file:\n{error_message}")
+            self.upload_label.config(text="Failed to load file.")
+
+
+
+    def update_progress(self, task, done, total):
+        """
+        Show the progress reported by a background task.
+
+        Args:
+            task (Task): The task reporting progress.
+            done (int): Units of work completed.
+            total (int): Total units of work.
+        """
+        self.progress_bar.stop()
+        self.progress_bar.config(mode='determinate', value=100 * done / max(total, 1))
+        self.task_label.config(text=f"{task.name}: {done}/{total}")
+
+
+
+    def update_task_status(self, running):
+        """
+        Reflect the set of running background tasks in the status label, progress bar and cancel button.
+
+        Args:
+            running (List[Task]): The tasks currently running.
+        """
+        if running:
+            # Progress is unknown until the task reports some
+            self.task_label.config(text=", ".join(task.name for task in running) + "...")
+            self.progress_bar.config(mode='indeterminate')
+            self.progress_bar.start()
+            self.cancel_button.config(state='normal')
+        else:
+            self.task_label.config(text="Idle")
+            self.progress_bar.stop()
+            self.progress_bar.config(mode='determinate', value=0)
+            self.cancel_button.config(state='disabled')
+
+
+
+    def cancel_tasks(self):
+        """
+        Cancel the running background tasks. Their results are discarded.
+        """
+        self.tasks.cancel_all()
+        self.task_label.config(text="Cancelling...")
+
+
+
+    def on_close(self):
+        """
+        Stop the background tasks before closing the window.
+        """
+        self.tasks.shutdown()
+        self.destroy()
 
 
 
@@ -397,10 +625,46 @@ class VTTAnalyzer(tk.Tk):
 
 
 
+    def is_stale(self, digest):
+        """
+        Whether a background result belongs to a transcript other than the one loaded now, e.g. when another
+        file was opened while it was computed. Such results are dropped.
+
+        Args:
+            digest (str): Content hash of the transcript the result was computed for.
+
+        Returns:
+            bool: True if the result must not be shown.
+        """
+        if digest == self.content_hash:
+            return False
+        print("Result of a previously loaded file discarded")
+        return True
+
+
+
     def view_sentiment(self):
         """
-        View the sentiment analysis
+        View the sentiment analysis. The analysis runs in the background and is shown once done.
+        """
+        df, digest = self.df, self.content_hash
+        self.tasks.submit("Sentiment analysis",
+                          lambda task: (digest, self.cache.get_or_compute(digest, 'sentiment', lambda: sentiment(df, sentiment_scores(df['Text'])),
+                                                                          model='vader', boundary_score=boundary_score)),
+                          on_success=self.show_sentiment, widgets=[self.sentiment_button])
+
+
+
+    def show_sentiment(self, result):
         """
+        Display the result of the sentiment analysis.
+
+        Args:
+            result (tuple): The content hash of the analyzed transcript and the turns flagged by the sentiment analysis.
+        """
+        digest, result = result
+        if self.is_stale(digest):
+            return
         
         # Setup the text box for the sentiment analysis
         
@@ -415,7 +679,7 @@ class VTTAnalyzer(tk.Tk):
         # Clear existing content
         self.sentiment_box.delete('1.0', tk.END)
         # Insert new text
-        self.sentiment_box.insert(tk.END, sentiment(self.df))
+        self.sentiment_box.insert(tk.END, result)
         # Disable the text box to prevent user edits
         self.sentiment_box.configure(state='disabled')
         print("Sentiment printed")
@@ -427,20 +691,56 @@ class VTTAnalyzer(tk.Tk):
     def generate_ex_summary(self):
         """
         Generate an extractive summary from the loaded VTT content. This function checks if the summary has been
-        previously generated. If not, it processes the content, generates the summary, and formats it. The summary
-        is then displayed in the GUI.
+        previously generated. If not, the key cues are selected from the parsed cue table in the background and
+        formatted with their speakers and timestamps. The summary is then displayed in the GUI.
         """
         # Check if the extractive summary has already been generated
-        if self.ex is None:
-            # Split the text into chunks if not already done
-            if self.chunks is None:
-                self.chunks = split_text_into_chunks(self.formatted_content)
-            # Generate an extractive summary from the chunks
-            final_summary = extractive_summarize_chunks(self.chunks)
-            # Format the summary for display
-            self.ex = format_vtt_as_dialogue(final_summary)
-            # Optional debugging message to confirm the extraction
-            print("Key Sentences Extracted")
+        if self.ex is not None:
+            self.insert_text(self.ex)
+            return
+
+        df, digest = self.df, self.content_hash
+
+        def work(task):
+            # Score the cues of the parsed transcript directly, keeping their speakers and timestamps
+            compute = lambda: format_key_cues(extract_key_cues(df))
+            return digest, self.cache.get_or_compute(digest, 'extractive', compute, model='luhn-cues',
+                                                     words_per_cue=WORDS_PER_KEY_CUE)
+
+        self.tasks.submit("Key sentences", work, on_success=self.on_ex_summary, widgets=[self.ex_analyze_button])
+
+
+
+    def cached_chunks(self, digest, content):
+        """
+        Split the transcript into chunks, reading them from the result cache when available.
+        Safe to call from a worker thread.
+
+        Args:
+            digest (str): Content hash of the transcript.
+            content (str): The transcript content.
+
+        Returns:
+            List[str]: The chunks of the transcript.
+        """
+        return self.cache.get_or_compute(digest, 'chunks', lambda: split_chunks(content),
+                                         model=MODEL_NAME, max_tokens=1024)
+
+
+
+    def on_ex_summary(self, result):
+        """
+        Store and display the extractive summary computed in the background.
+
+        Args:
+            result (tuple): The content hash of the transcript and the formatted key cues.
+        """
+        digest, result = result
+        if self.is_stale(digest):
+            return
+        self.ex = result
+        # Optional debugging message to confirm the extraction
+        print("Key Sentences Extracted")
 
         # Display the extractive summary in the GUI
         self.insert_text(self.ex)
@@ -449,19 +749,48 @@ class VTTAnalyzer(tk.Tk):
 
     def generate_ab_summary(self):
         """
-        Generate an abstractive summary from the loaded VTT content. This function checks if the summary has been
-        previously generated. If not, it processes the content and generates the summary. The summary is then displayed
-        in the GUI.
+        Generate an abstractive summary from the loaded VTT content, with the length set by the slider. This
+        function checks if the summary has been previously generated at this length. If not, it processes the
+        content and generates the summary in the background, combining the chunk summaries hierarchically. The
+        summary is then displayed in the GUI.
         """
-        # Check if the abstractive summary has already been generated
-        if self.ab is None:
+        words = int(self.slider.get())
+
+        # Check if the abstractive summary has already been generated at this length
+        if self.ab is not None and self.ab_words == words:
+            self.insert_text(self.ab)
+            return
+
+        chunks, content, digest = self.chunks, self.formatted_content, self.content_hash
+
+        def work(task):
             # Split the text into chunks if not already done
-            if self.chunks is None:
-                self.chunks = split_text_into_chunks(self.formatted_content)
-            # Generate an abstractive summary from the chunks
-            self.ab = abstractive_summarize_chunks(self.chunks)
-            # Optional debugging message to confirm the generation
-            print(), print("Summary Generated")
+            task_chunks = self.cached_chunks(digest, content) if chunks is None else chunks
+            # Generate an abstractive summary from the chunks, reduced to the requested length
+            summary = self.cache.get_or_compute(
+                digest, 'abstractive',
+                lambda: MapReduceSummarizer('bart', target_words=words).summarize_chunks(task_chunks, progress=task.report),
+                model=summary_model_name(), max_tokens=1024, num_beams=4, words=words)
+            return digest, task_chunks, words, summary
+
+        self.tasks.submit("Abstractive summary", work, on_success=self.on_ab_summary, widgets=[self.ab_analyze_button])
+
+
+
+    def on_ab_summary(self, result):
+        """
+        Store and display the abstractive summary computed in the background.
+
+        Args:
+            result (tuple): The content hash of the transcript, its chunks, the summary length in words and the
+                abstractive summary.
+        """
+        digest, chunks, words, summary = result
+        if self.is_stale(digest):
+            return
+        self.chunks, self.ab_words, self.ab = chunks, words, summary
+        # Optional debugging message to confirm the generation
+        print(), print("Summary Generated")
 
         # Display the abstractive summary in the GUI
         self.insert_text(self.ab)
@@ -470,14 +799,29 @@ class VTTAnalyzer(tk.Tk):
 
     def generate_openai_summary(self):
         """
-        Generate a summary using an OpenAI model and print it.
+        Generate a summary using an OpenAI model in the background and print it.
         """
-        tokens = self.slider.get()
-        # Check if the abstractive summary has already been generated
-        # if self.ai is None:
-        # Split the text into chunks if not already done
-        # Generate an abstractive summary from the chunks
-        self.ai = summarize_text(self.formatted_content, tokens)
+        tokens = int(self.slider.get())
+        content, digest = self.formatted_content, self.content_hash
+        self.tasks.submit("openAI summary",
+                          lambda task: (digest, self.cache.get_or_compute(digest, 'openai_summary',
+                                                                          lambda: summarize_text(content, tokens),
+                                                                          model=OPENAI_MODEL, words=tokens)),
+                          on_success=self.on_openai_summary, widgets=[self.ai_analyze_button])
+
+
+
+    def on_openai_summary(self, result):
+        """
+        Store and display the OpenAI summary.
+
+        Args:
+            result (tuple): The content hash of the transcript and the summary returned by the API.
+        """
+        digest, result = result
+        if self.is_stale(digest):
+            return
+        self.ai = result
         #debugging message to confirm the generation
         print(), print("AI Summary Generated")
         
@@ -488,14 +832,27 @@ class VTTAnalyzer(tk.Tk):
 
     def generate_openai_utility(self):
         """
-        Generate a summary using an OpenAI model and print it.
+        Extract the key points and decisions using an OpenAI model in the background and print them.
+        """
+        content, digest = self.formatted_content, self.content_hash
+        self.tasks.submit("Key decisions",
+                          lambda task: (digest, self.cache.get_or_compute(digest, 'openai_utility',
+                                                                          lambda: utility_text(content), model=OPENAI_MODEL)),
+                          on_success=self.on_openai_utility, widgets=[self.ai_utility_button])
+
+
+
+    def on_openai_utility(self, result):
+        """
+        Store and display the key points and decisions.
+
+        Args:
+            result (tuple): The content hash of the transcript and the key points returned by the API.
         """
-        # tokens = self.slider.get()
-        # Check if the abstractive summary has already been generated
-        # if self.ai is None:
-        # Split the text into chunks if not already done
-        # Generate an abstractive summary from the chunks
-        self.utility = utility_text(self.formatted_content)
+        digest, result = result
+        if self.is_stale(digest):
+            return
+        self.utility = result
         #debugging message to confirm the generation
         print(), print("AI Utility Generated")
         
@@ -511,16 +868,17 @@ class VTTAnalyzer(tk.Tk):
 
 
 
-    def show_plot(self, plot_function):
+    def show_plot(self, plot_function, data=None):
         """
         Display a matplotlib plot in the GUI. This method generates a plot using a provided function and
         data, then integrates it into the scrollable canvas area of the interface.
 
         Args:
-            plot_function (function): A function that takes a DataFrame and returns a matplotlib figure.
+            plot_function (function): A function that takes the data and returns a matplotlib figure.
+            data (Any, optional): Data passed to the plot function. Defaults to the loaded DataFrame.
         """
         # Generate a plot with the provided function using the loaded data
-        fig = plot_function(self.df)
+        fig = plot_function(self.df if data is None else data)
         # Close the figure to free up memory resources
         plt.close(fig)
 
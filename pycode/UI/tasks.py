@@ -0,0 +1,163 @@
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from packages.instrumentation import span, labelled
+
+
+class TaskCancelled(Exception):
+    """
+    Raised inside a task when it has been cancelled, to unwind the work at its next progress report.
+    """
+
+
+class Task:
+    """
+    Handle on a piece of work running in the background. The work receives its Task and reports progress
+    through it, which is also where a cancellation takes effect.
+    """
+
+    def __init__(self, name, events):
+        self.name = name
+        self._events = events  # Queue read by the Tk main loop
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """
+        Ask the task to stop. The work stops at its next progress report and its result is discarded.
+        """
+        self._cancel_event.set()
+
+    def report(self, done, total):
+        """
+        Report progress from the worker thread. Meant to be passed as the `progress` callback of the
+        long-running functions.
+
+        Args:
+            done (int): Units of work completed.
+            total (int): Total units of work.
+
+        Raises:
+            TaskCancelled: If the task has been cancelled.
+        """
+        if self.cancelled:
+            raise TaskCancelled(self.name)
+        self._events.put(('progress', self, (done, total)))
+
+
+class TaskExecutor:
+    """
+    Run heavy work on a thread pool and hand its results back to the Tk main loop. Worker threads never
+    touch the widgets: they post events to a queue which is polled with `after()`, and every callback runs
+    on the main loop.
+
+    Args:
+        root (tk.Misc): Widget whose `after()` drives the polling.
+        max_workers (int, optional): Number of worker threads. Defaults to 2.
+        poll_interval (int, optional): Milliseconds between two polls of the event queue. Defaults to 100.
+    """
+
+    def __init__(self, root, max_workers=2, poll_interval=100):
+        self.root = root
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._events = queue.Queue()
+        self._running = {}  # Task name -> (task, callbacks, widgets)
+        self.on_progress = None  # Called with (task, done, total) on every progress report
+        self.on_state_change = None  # Called with the list of running tasks when it changes
+        self.labels = {}  # Added to the instrumentation events of the tasks submitted, e.g. the open meeting
+        self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    @property
+    def running(self):
+        return [task for task, _, _ in self._running.values()]
+
+    def submit(self, name, function, on_success=None, on_error=None, widgets=()):
+        """
+        Run `function(task)` on a worker thread. While it runs, the given widgets are disabled. A task
+        that is already running under the same name is not started twice.
+
+        Args:
+            name (str): Name of the task, also shown to the user.
+            function (Callable[[Task], Any]): The work. It receives the Task and may pass `task.report`
+                as a progress callback.
+            on_success (Callable[[Any], None], optional): Called on the main loop with the result.
+            on_error (Callable[[str], None], optional): Called on the main loop with the formatted traceback.
+            widgets (Iterable, optional): Widgets disabled until the task finishes.
+
+        Returns:
+            Task: The handle of the task.
+        """
+        if name in self._running:
+            return self._running[name][0]
+
+        task = Task(name, self._events)
+        widgets = list(widgets)
+        for widget in widgets:
+            widget.config(state='disabled')
+
+        self._running[name] = (task, (on_success, on_error), widgets)
+        self._notify_state()
+        self._executor.submit(self._run, task, function, dict(self.labels))
+        return task
+
+    def cancel_all(self):
+        """
+        Cancel every running task.
+        """
+        for task in self.running:
+            task.cancel()
+
+    def shutdown(self):
+        """
+        Cancel the running tasks and stop polling. To be called when the window is closed.
+        """
+        self.cancel_all()
+        self.root.after_cancel(self._poll_id)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, task, function, labels):
+        # Runs on a worker thread: only the event queue is touched here
+        try:
+            with labelled(**labels), span(f"task.{task.name}"):
+                result = function(task)
+            self._events.put(('cancelled' if task.cancelled else 'done', task, result))
+        except TaskCancelled:
+            self._events.put(('cancelled', task, None))
+        except Exception:
+            self._events.put(('error', task, traceback.format_exc()))
+
+    def _poll(self):
+        # Runs on the Tk main loop: dispatch every pending event
+        while True:
+            try:
+                kind, task, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == 'progress':
+                if self.on_progress is not None:
+                    self.on_progress(task, *payload)
+                continue
+
+            _, (on_success, on_error), widgets = self._running.pop(task.name)
+            for widget in widgets:
+                widget.config(state='normal')
+
+            if kind == 'done' and on_success is not None:
+                on_success(payload)
+            elif kind == 'error':
+                print(payload)
+                if on_error is not None:
+                    on_error(payload)
+            self._notify_state()
+
+        self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def _notify_state(self):
+        if self.on_state_change is not None:
+            self.on_state_change(self.running)
@@ -0,0 +1,18 @@
+import argparse
+from packages.batch import run_batch
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze every transcript of a directory without the GUI.")
+    parser.add_argument("directory", help="directory holding .vtt or .txt transcripts")
+    parser.add_argument("-o", "--output", default="data/batch_output", help="directory receiving one JSON result per transcript")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (defaults to the CPU count)")
+    parser.add_argument("-s", "--sentences", type=int, default=1, help="key sentences extracted per chunk")
+    parser.add_argument("--sentiment-workers", type=int, default=1,
+                        help="processes scoring the turns of each long transcript, 0 for one per CPU (default: 1)")
+    parser.add_argument("--no-cache", action="store_true", help="recompute every result instead of using the result cache")
+    args = parser.parse_args()
+
+    results = run_batch(args.directory, args.output, workers=args.workers, sentences_count=args.sentences, use_cache=not args.no_cache,
+                        sentiment_workers=args.sentiment_workers)
+    failed = [path for path, output in results.items() if output is None]
+    print(f"{len(results) - len(failed)} transcripts processed, {len(failed)} failed")
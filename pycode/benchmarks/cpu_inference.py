@@ -0,0 +1,88 @@
+"""
+Compare the abstractive summarization presets of packages.summaries on CPU: model load time, latency per
+chunk and ROUGE of the summaries against those of the fp32 BART-large-cnn baseline.
+
+Run from the pycode directory:
+    python -m benchmarks.cpu_inference --threads 4
+"""
+import json
+import time
+import argparse
+import dataclasses
+from benchmarks.rouge import rouge_scores
+
+
+def run_config(name, config, chunks, batch_size, num_beams, max_length, min_length):
+    """
+    Load the model of a preset, then time the summaries of every chunk.
+
+    Returns:
+        dict: Load time, total and per-chunk latency and the summaries.
+    """
+    from packages.models import get_summarization_model, get_tokenizer
+    from packages.summaries import abstractive_summarize_batch
+
+    start = time.perf_counter()
+    get_tokenizer(config.model_name)
+    get_summarization_model(config.model_name, config.quantize)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    summaries = abstractive_summarize_batch(chunks, batch_size=batch_size, num_beams=num_beams,
+                                            max_length=max_length, min_length=min_length, config=config)
+    seconds = time.perf_counter() - start
+
+    print(f"{name}: {seconds:.1f}s for {len(chunks)} chunks")
+    return {
+        "config": dataclasses.asdict(config),
+        "load_seconds": load_seconds,
+        "seconds": seconds,
+        "seconds_per_chunk": seconds / max(len(chunks), 1),
+        "summaries": summaries,
+    }
+
+
+def main():
+    from packages.summaries import INFERENCE_CONFIGS
+    from packages.chunk_splitter import split_text_into_chunks
+
+    parser = argparse.ArgumentParser(description="Benchmark the CPU inference presets against the fp32 baseline.")
+    parser.add_argument("--input", default="data/test.txt", help="transcript summarized (default: %(default)s)")
+    parser.add_argument("--configs", default=",".join(INFERENCE_CONFIGS),
+                        help="comma-separated presets, the baseline is always run (default: %(default)s)")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads for every preset")
+    parser.add_argument("--chunks", type=int, default=None, help="only summarize the first chunks of the input")
+    parser.add_argument("--batch-size", type=int, default=8, help="chunks per generate call")
+    parser.add_argument("--num-beams", type=int, default=4, help="beams used by beam search")
+    parser.add_argument("--max-length", type=int, default=60, help="maximum summary length in tokens")
+    parser.add_argument("--min-length", type=int, default=20, help="minimum summary length in tokens")
+    parser.add_argument("--output", default=None, help="JSON file receiving the full results")
+    args = parser.parse_args()
+
+    with open(args.input, encoding="utf-8") as file:
+        chunks = split_text_into_chunks(file.read())[:args.chunks]
+
+    names = ["baseline"] + [name for name in args.configs.split(",") if name and name != "baseline"]
+    results = {}
+    for name in names:
+        config = INFERENCE_CONFIGS[name]
+        if args.threads:
+            config = dataclasses.replace(config, intra_op_threads=args.threads)
+        results[name] = run_config(name, config, chunks, args.batch_size, args.num_beams,
+                                   args.max_length, args.min_length)
+
+    baseline = results["baseline"]
+    print(f"\n{'preset':<16}{'load s':>8}{'s/chunk':>9}{'speedup':>9}{'R-1':>7}{'R-2':>7}{'R-L':>7}")
+    for name, result in results.items():
+        result["rouge"] = rouge_scores(result["summaries"], baseline["summaries"])
+        result["speedup"] = baseline["seconds"] / max(result["seconds"], 1e-9)
+        print(f"{name:<16}{result['load_seconds']:>8.1f}{result['seconds_per_chunk']:>9.2f}{result['speedup']:>9.2f}"
+              f"{result['rouge']['rouge1']:>7.3f}{result['rouge']['rouge2']:>7.3f}{result['rouge']['rougeL']:>7.3f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import re
+from collections import Counter
+
+# Words compared by ROUGE, lowercased beforehand
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """
+    Lowercased words of a text, punctuation dropped.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        List[str]: The words.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _f1(overlap, candidate_count, reference_count):
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / candidate_count, overlap / reference_count
+    return 2 * precision * recall / (precision + recall)
+
+
+def rouge_n(candidate, reference, n=1):
+    """
+    ROUGE-N F1 score: overlap of the n-grams of a candidate and a reference summary.
+
+    Args:
+        candidate (str): The summary evaluated.
+        reference (str): The reference summary.
+        n (int, optional): Length of the n-grams. Defaults to 1.
+
+    Returns:
+        float: The F1 score, between 0 and 1.
+    """
+    def ngrams(words):
+        return Counter(zip(*(words[i:] for i in range(n))))
+
+    candidate, reference = ngrams(tokenize(candidate)), ngrams(tokenize(reference))
+    overlap = sum((candidate & reference).values())
+    return _f1(overlap, sum(candidate.values()), sum(reference.values()))
+
+
+def rouge_l(candidate, reference):
+    """
+    ROUGE-L F1 score, from the longest common subsequence of words.
+
+    Args:
+        candidate (str): The summary evaluated.
+        reference (str): The reference summary.
+
+    Returns:
+        float: The F1 score, between 0 and 1.
+    """
+    candidate, reference = tokenize(candidate), tokenize(reference)
+    # One row of the dynamic programming table at a time
+    previous = [0] * (len(reference) + 1)
+    for word in candidate:
+        current = [0]
+        for j, other in enumerate(reference):
+            current.append(previous[j] + 1 if word == other else max(previous[j + 1], current[j]))
+        previous = current
+    return _f1(previous[-1], len(candidate), len(reference))
+
+
+def rouge_scores(candidates, references):
+    """
+    Mean ROUGE-1, ROUGE-2 and ROUGE-L F1 scores of paired summaries.
+
+    Args:
+        candidates (List[str]): The summaries evaluated.
+        references (List[str]): The reference summary of each candidate.
+
+    Returns:
+        dict: 'rouge1', 'rouge2' and 'rougeL' means.
+    """
+    pairs = list(zip(candidates, references))
+    if not pairs:
+        return {"rouge1": 0.0, "rouge2": 0.0, "rougeL": 0.0}
+    return {
+        "rouge1": sum(rouge_n(c, r, 1) for c, r in pairs) / len(pairs),
+        "rouge2": sum(rouge_n(c, r, 2) for c, r in pairs) / len(pairs),
+        "rougeL": sum(rouge_l(c, r) for c, r in pairs) / len(pairs),
+    }
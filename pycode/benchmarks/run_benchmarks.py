@@ -0,0 +1,343 @@
+"""
+End-to-end benchmarks of the analysis stages over the sample VTT, the AMI corpus and synthetic meetings, at
+several input sizes.
+Every stage runs in a fresh process, so that its peak RSS is its own, and is timed over a few repeats.
+Results can be saved as a baseline and later runs compared against it to catch regressions.
+
+Run from the pycode directory:
+    python -m benchmarks.run_benchmarks --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import dataclasses
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+# Imported once per worker when the measure is unpickled, so that import time is never part of a measure
+from packages.vtt_formatting import format_VTT, format_TXT, parse_VTT, format_milliseconds
+from packages.chunk_splitter import split_text_into_chunks
+from packages.summaries import extractive_summarize_chunks, abstractive_summarize_chunks
+from packages.extractive import extract_key_cues
+from packages.sentiment import sentiment
+from packages.stats_generator import create_stats_figure
+from packages.timeline_generator import create_timeline_figure
+
+SAMPLE_VTT = "data/example_transcripts.vtt"
+AMI_DIRECTORY = "data/ami-transcripts"
+
+# Relative slowdown, or growth of the peak RSS, reported as a regression
+DEFAULT_THRESHOLD = 1.25
+
+
+def load(path):
+    """Parse a transcript with the reader matching its extension, as the GUI and the batch engine do."""
+    return format_VTT(path) if path.endswith(".vtt") else format_TXT(path)
+
+
+def _words(text):
+    return len(text.split())
+
+
+# Each stage: (untimed setup(path, options) -> state, timed run(state) -> units processed, unit, VTT only)
+
+def setup_path(path, options):
+    return path
+
+
+def run_format_vtt(path):
+    return len(load(path)[0])
+
+
+def setup_content(path, options):
+    return load(path)[1]
+
+
+def run_split(content):
+    split_text_into_chunks(content)
+    return _words(content)
+
+
+def setup_chunks(path, options):
+    return split_text_into_chunks(load(path)[1])
+
+
+def run_extractive_chunks(chunks):
+    extractive_summarize_chunks(chunks)
+    return sum(map(_words, chunks))
+
+
+def setup_frame(path, options):
+    return load(path)[0]
+
+
+def run_extract_key_cues(df):
+    extract_key_cues(df)
+    return len(df)
+
+
+def setup_abstractive(path, options):
+    from packages.models import get_summarization_model, get_tokenizer
+    chunks = setup_chunks(path, options)[:options["abstractive_chunks"]]
+    # Model loading is not part of the measure
+    get_tokenizer()
+    get_summarization_model()
+    return chunks
+
+
+def run_abstractive(chunks):
+    abstractive_summarize_chunks(chunks)
+    return sum(map(_words, chunks))
+
+
+def run_sentiment(df):
+    sentiment(df)
+    return len(df)
+
+
+def run_stats_figure(df):
+    plt.close(create_stats_figure(df))
+    return len(df)
+
+
+def run_timeline_figure(df):
+    plt.close(create_timeline_figure(df))
+    return len(df)
+
+
+STAGES = {
+    "format_VTT": (setup_path, run_format_vtt, "cues", True),
+    "split_text_into_chunks": (setup_content, run_split, "words", False),
+    "extractive_summarize_chunks": (setup_chunks, run_extractive_chunks, "words", False),
+    "extract_key_cues": (setup_frame, run_extract_key_cues, "cues", False),
+    "abstractive_summarize_chunks": (setup_abstractive, run_abstractive, "words", False),
+    "sentiment": (setup_frame, run_sentiment, "cues", False),
+    "create_stats_figure": (setup_frame, run_stats_figure, "cues", True),
+    "create_timeline_figure": (setup_frame, run_timeline_figure, "cues", True),
+}
+
+# Stages left out unless requested: they need the BART weights and take minutes on CPU
+OPTIONAL_STAGES = ("abstractive_summarize_chunks",)
+
+
+def peak_rss_bytes():
+    """Peak resident set size of the current process, in bytes."""
+    # ru_maxrss survives the fork and exec starting a worker, so it would report the peak of the parent
+    # when that is higher; the high-water mark of /proc is reset by exec
+    try:
+        with open("/proc/self/status", encoding="ascii") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure(stage, path, repeat, options):
+    """
+    Set a stage up and time it `repeat` times. Runs in a dedicated worker process.
+
+    Returns:
+        dict: Median and best wall time, units processed, throughput and peak RSS, or the error raised.
+    """
+    setup, run, unit, _ = STAGES[stage]
+    try:
+        state = setup(path, options)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            units = run(state)
+            times.append(time.perf_counter() - start)
+    except Exception as error:
+        return {"error": f"{type(error).__name__}: {error}".splitlines()[0]}
+
+    seconds = statistics.median(times)
+    return {
+        "seconds": seconds,
+        "best_seconds": min(times),
+        "units": units,
+        "unit": unit,
+        "throughput": units / seconds if seconds else None,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def scaled_vtt(path, factor, directory):
+    """
+    Write a VTT made of `factor` back-to-back copies of a transcript, each shifted after the previous one.
+
+    Returns:
+        str: Path of the file written.
+    """
+    df = parse_VTT(path)
+    span = int(df["EndMs"].max()) + 1000
+    target = os.path.join(directory, f"{os.path.splitext(os.path.basename(path))[0]}-x{factor}.vtt")
+    with open(target, "w", encoding="utf-8") as file:
+        file.write("WEBVTT\n\n")
+        for copy in range(factor):
+            offset = copy * span
+            for start, end, speaker, text in zip(df["StartMs"], df["EndMs"], df["Speaker"], df["Text"]):
+                voice = f"<v {speaker}>" if isinstance(speaker, str) else ""
+                file.write(f"{format_milliseconds(start + offset)} --> {format_milliseconds(end + offset)}\n"
+                           f"{voice}{text}{'</v>' if voice else ''}\n\n")
+    return target
+
+
+def concatenated_ami(count, directory):
+    """
+    Write the first `count` AMI transcripts as one plain-text transcript.
+
+    Returns:
+        str: Path of the file written.
+    """
+    names = sorted(name for name in os.listdir(AMI_DIRECTORY) if name.endswith(".txt"))[:count]
+    target = os.path.join(directory, f"ami-{len(names)}.txt")
+    with open(target, "w", encoding="utf-8") as file:
+        for name in names:
+            with open(os.path.join(AMI_DIRECTORY, name), encoding="utf-8") as source:
+                file.write(source.read().strip() + "\n\n")
+    return target
+
+
+def synthetic_vtt(name, config, directory):
+    """
+    Write a synthetic meeting, unless the same one was already generated.
+
+    Returns:
+        str: Path of the file written.
+    """
+    from packages.synthetic import generate_vtt
+
+    target = os.path.join(directory, f"{name}-{config.seed}.vtt")
+    if not os.path.exists(target):
+        generate_vtt(target, config)
+    return target
+
+
+def build_inputs(directory, vtt_scales=(1, 10, 100), ami_counts=(1, 10, 171), synthetic_scales=(10, 100)):
+    """
+    Build the benchmark inputs, at several sizes, in a work directory. Synthetic meetings have the shape of
+    the sample VTT, scaled up, plus a full-day workshop; their texts are cut from the AMI transcripts.
+
+    Returns:
+        dict: Input name -> path of the transcript.
+    """
+    from packages.synthetic import PRESETS
+
+    os.makedirs(directory, exist_ok=True)
+    inputs = {}
+    for factor in vtt_scales:
+        inputs[f"vtt-x{factor}"] = SAMPLE_VTT if factor == 1 else scaled_vtt(SAMPLE_VTT, factor, directory)
+    for count in ami_counts:
+        inputs[f"ami-{count}"] = concatenated_ami(count, directory)
+
+    synthetic = {f"synthetic-x{factor}": PRESETS["example"].scaled(factor) for factor in synthetic_scales}
+    synthetic["synthetic-workshop"] = PRESETS["workshop"]
+    for name, config in synthetic.items():
+        inputs[name] = synthetic_vtt(name, dataclasses.replace(config, source=AMI_DIRECTORY), directory)
+    return inputs
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare results with a baseline, measure by measure.
+
+    Returns:
+        List[str]: One line per regression: a stage slower, or with a peak RSS larger, than `threshold` times the baseline.
+    """
+    regressions = []
+    for key, result in results["measures"].items():
+        reference = baseline.get("measures", {}).get(key)
+        if reference is None or "error" in result or "error" in reference:
+            continue
+        for field in ("seconds", "peak_rss_bytes"):
+            ratio = result[field] / max(reference[field], 1e-9)
+            if ratio > threshold:
+                regressions.append(f"{key}: {field} {reference[field]:.4g} -> {result[field]:.4g} ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis stages across input sizes.")
+    parser.add_argument("--stages", default=",".join(name for name in STAGES if name not in OPTIONAL_STAGES),
+                        help=f"comma-separated stages among {', '.join(STAGES)} (default: %(default)s)")
+    parser.add_argument("--inputs", default=None,
+                        help="comma-separated input names, e.g. vtt-x1,ami-10,synthetic-x100 (default: all)")
+    parser.add_argument("--synthetic-scales", default="10,100",
+                        help="sizes of the synthetic meetings, in multiples of the sample VTT (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per measure, the median is kept")
+    parser.add_argument("--abstractive-chunks", type=int, default=2, help="chunks summarized by the abstractive stage")
+    parser.add_argument("--work-dir", default="data/benchmark_inputs", help="directory receiving the generated inputs")
+    parser.add_argument("--output", default=None, help="JSON file receiving the results")
+    parser.add_argument("--baseline", default=None, help="baseline JSON to compare the results against")
+    parser.add_argument("--save-baseline", default=None, help="also save the results as a baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="ratio to the baseline reported as a regression (default: %(default)s)")
+    args = parser.parse_args()
+
+    stages = [stage for stage in args.stages.split(",") if stage]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    inputs = build_inputs(args.work_dir, synthetic_scales=[int(scale) for scale in args.synthetic_scales.split(",") if scale])
+    if args.inputs:
+        inputs = {name: inputs[name] for name in args.inputs.split(",")}
+    options = {"abstractive_chunks": args.abstractive_chunks}
+
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpus": os.cpu_count(),
+        },
+        "measures": {},
+    }
+
+    # A fresh process per measure, so that peak RSS and warm caches do not leak from one to the next
+    context = multiprocessing.get_context("spawn")
+    print(f"{'measure':<52}{'median s':>10}{'throughput':>18}{'peak RSS MB':>13}")
+    for input_name, path in inputs.items():
+        for stage in stages:
+            if STAGES[stage][3] and not path.endswith(".vtt"):
+                continue
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(measure, stage, path, args.repeat, options).result()
+
+            key = f"{stage}/{input_name}"
+            results["measures"][key] = result
+            if "error" in result:
+                print(f"{key:<52}{'failed: ' + result['error']}")
+            else:
+                throughput = f"{result['throughput']:.0f} {result['unit']}/s" if result["throughput"] else "-"
+                print(f"{key:<52}{result['seconds']:>10.4f}{throughput:>18}{result['peak_rss_bytes'] / 2 ** 20:>13.1f}")
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions against {args.baseline}:")
+            print("\n".join(regressions))
+            sys.exit(1)
+        print(f"\nNo regression against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
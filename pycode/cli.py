@@ -0,0 +1,57 @@
+import sys
+import argparse
+from packages.pipeline import STAGES, DEFAULT_STAGES, run_pipeline, write_jsonl, write_parquet
+from packages import instrumentation
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run MeetInsight stages on transcripts without a display and write one record per transcript.")
+    parser.add_argument("paths", nargs="+", help=".vtt or .txt transcripts, or directories holding them")
+    parser.add_argument("-s", "--stages", default=",".join(DEFAULT_STAGES),
+                        help=f"comma-separated stages among {', '.join(STAGES)} (default: %(default)s)")
+    parser.add_argument("-o", "--output", default="-", help="output file, or - for JSON lines on stdout (default)")
+    parser.add_argument("-f", "--format", choices=("jsonl", "parquet"), default=None,
+                        help="output format (defaults to parquet for .parquet outputs, JSON lines otherwise)")
+    parser.add_argument("-d", "--output-dir", default="data/cli_output", help="directory receiving timeline images")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="number of worker processes (default: 1)")
+    parser.add_argument("--words", type=int, default=100, help="length of the abstractive summary in words")
+    parser.add_argument("--method", choices=("luhn", "textrank"), default="luhn", help="scoring of the key cues")
+    parser.add_argument("--key-cues", type=int, default=None, help="number of key cues (defaults to one per 600 words)")
+    parser.add_argument("--sentiment-workers", type=int, default=1,
+                        help="processes scoring the turns of each long transcript, 0 for one per CPU (default: 1)")
+    parser.add_argument("--no-cache", action="store_true", help="recompute every result instead of using the result cache")
+    parser.add_argument("--trace", default=None, help="JSON lines file receiving the duration of every stage, - for stderr")
+    parser.add_argument("--metrics", default=None, help="OpenMetrics file receiving the per-stage totals of this process; "
+                                                        "worker processes write NAME-PID next to it")
+    args = parser.parse_args()
+
+    if args.trace or args.metrics:
+        instrumentation.enable(args.trace, args.metrics)
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    output_format = args.format or ("parquet" if args.output.endswith(".parquet") else "jsonl")
+    if output_format == "parquet":
+        if args.output == "-":
+            parser.error("Parquet output needs an output file")
+        try:
+            # Checked before any transcript is processed
+            import pyarrow
+        except ImportError:
+            parser.error("Parquet output requires pyarrow: pip install pyarrow")
+
+    options = {"words": args.words, "method": args.method, "key_cues": args.key_cues,
+               "sentiment_workers": args.sentiment_workers}
+    records = run_pipeline(args.paths, stages, args.output_dir, options, use_cache=not args.no_cache, workers=args.workers)
+
+    if output_format == "parquet":
+        count = write_parquet(records, args.output)
+    elif args.output == "-":
+        count = write_jsonl(records, sys.stdout)
+    else:
+        with open(args.output, "w", encoding="utf-8") as file:
+            count = write_jsonl(records, file)
+
+    print(f"{count} transcripts processed", file=sys.stderr)
@@ -0,0 +1,15 @@
+import argparse
+from packages.transcript_store import convert_directory, DEFAULT_STORE_DIR
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert every transcript of a directory to the binary transcript store.")
+    parser.add_argument("directory", help="directory holding .vtt or .txt transcripts")
+    parser.add_argument("-o", "--store-dir", default=DEFAULT_STORE_DIR,
+                        help="directory receiving the store files, read back through MEETINSIGHT_STORE_DIR (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes (defaults to the CPU count)")
+    parser.add_argument("-f", "--force", action="store_true", help="convert transcripts whose store is already up to date")
+    args = parser.parse_args()
+
+    results = convert_directory(args.directory, args.store_dir, workers=args.workers, force=args.force)
+    failed = [path for path, output in results.items() if output is None]
+    print(f"{len(results) - len(failed)} transcripts converted, {len(failed)} failed")
@@ -0,0 +1,146 @@
+import os
+import json
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from packages.instrumentation import span, labelled, worker_task
+
+# Transcript formats accepted by the batch engine
+TRANSCRIPT_EXTENSIONS = (".vtt", ".txt")
+
+
+def find_transcripts(directory):
+    """
+    List the transcripts of a directory, in a stable order.
+
+    Args:
+        directory (str): Directory holding .vtt exports or plain-text transcripts.
+
+    Returns:
+        List[str]: Sorted paths of the transcript files found in the directory.
+    """
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(TRANSCRIPT_EXTENSIONS)
+    )
+
+
+def load_transcript(file_path):
+    """
+    Load a transcript through its binary store, so a corpus analyzed repeatedly is parsed only once.
+
+    Args:
+        file_path (str): Path to a .vtt or .txt transcript.
+
+    Returns:
+        tuple: A DataFrame with the turns of the transcript, shaped like format_VTT or format_TXT, and its content as a string.
+    """
+    from packages.transcript_store import load_or_convert
+
+    transcript, content = load_or_convert(file_path)
+    return transcript.to_frame(timestamps=True), content
+
+
+@worker_task
+def analyze_file(file_path, output_dir, sentences_count=1, use_cache=True, sentiment_workers=1):
+    """
+    Run parsing, speaker statistics, chunking, extractive summary and sentiment analysis on one transcript
+    and write the results to a JSON file named after it. This is the unit of work handed to each pool worker.
+
+    Args:
+        file_path (str): Path to a .vtt or .txt transcript.
+        output_dir (str): Directory receiving the result file.
+        sentences_count (int, optional): Number of key sentences extracted per 1024-token chunk of transcript. Defaults to 1.
+        use_cache (bool, optional): Read and store results in the shared result cache. Defaults to True.
+        sentiment_workers (int, optional): Processes scoring the turns of the transcript, see sentiment_scores. Defaults to 1.
+
+    Returns:
+        str: Path of the JSON file written.
+    """
+    # Imported here so the models are loaded by the worker processes only
+    from packages.inference_client import split_chunks, sentiment_scores
+    from packages.extractive import extract_key_cues, format_key_cues, WORDS_PER_KEY_CUE
+    from packages.sentiment import sentiment, boundary_score
+    from packages.models import MODEL_NAME
+    from packages.cache import default_cache, content_hash
+    from packages.speaker_stats import compute_speaker_stats
+    from packages.search_index import auto_index_suspended
+
+    name = os.path.basename(file_path)
+    # A worker only converts the transcript; run_batch indexes the whole batch in one commit
+    with labelled(meeting=name), span("batch.load") as trace, auto_index_suspended():
+        df, content = load_transcript(file_path)
+        trace.size = len(df)
+    digest = content_hash(content)
+
+    def cached(kind, compute, model=None, **params):
+        # Go through the result cache shared with the GUI, unless disabled; every stage is traced
+        with labelled(meeting=name), span(f"batch.{kind}", size=len(df)):
+            if not use_cache:
+                return compute()
+            return default_cache().get_or_compute(digest, kind, compute, model=model, **params)
+
+    chunks = cached('chunks', lambda: split_chunks(content), model=MODEL_NAME, max_tokens=1024)
+
+    # Key cues are scored on the parsed turns, so VTT speakers and timestamps are kept as they are
+    # An int, keyed like the GUI keys the same result
+    words_per_cue = max(1, WORDS_PER_KEY_CUE // sentences_count)
+    extractive = cached('extractive', lambda: format_key_cues(extract_key_cues(df, words_per_cue=words_per_cue)),
+                        model='luhn-cues', words_per_cue=words_per_cue)
+
+    result = {
+        "file": name,
+        "turns": len(df),
+        # Plain-text transcripts carry no speakers or timings
+        "stats": cached('stats', lambda: compute_speaker_stats(df)).to_dict() if "Speaker" in df else None,
+        "chunks": len(chunks),
+        "extractive_summary": extractive,
+        "sentiment": cached('sentiment', lambda: sentiment(df, sentiment_scores(df['Text'], workers=sentiment_workers)), model='vader', boundary_score=boundary_score),
+    }
+
+    output_path = os.path.join(output_dir, os.path.splitext(os.path.basename(file_path))[0] + ".json")
+    with open(output_path, "w", encoding="utf-8") as file:
+        json.dump(result, file, indent=2)
+    return output_path
+
+
+def run_batch(directory, output_dir, workers=None, sentences_count=1, use_cache=True, sentiment_workers=1):
+    """
+    Analyze every transcript of a directory across a pool of worker processes, writing one result
+    file per transcript. A failing transcript is reported and does not stop the batch.
+
+    Args:
+        directory (str): Directory holding the transcripts, e.g. data/ami-transcripts.
+        output_dir (str): Directory receiving the result files. Created if missing.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        sentences_count (int, optional): Number of key sentences extracted per 1024-token chunk of transcript. Defaults to 1.
+        use_cache (bool, optional): Read and store results in the shared result cache. Defaults to True.
+        sentiment_workers (int, optional): Processes scoring the turns of each long transcript, on top of `workers`;
+            useful when a few long transcripts would keep a large host mostly idle. Defaults to 1.
+
+    Returns:
+        dict: Maps each transcript path to the result file written, or to None if it failed.
+    """
+    from packages.search_index import index_converted
+
+    os.makedirs(output_dir, exist_ok=True)
+    files = find_transcripts(directory)
+    results = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(analyze_file, path, output_dir, sentences_count, use_cache, sentiment_workers): path for path in files}
+
+        for done, future in enumerate(as_completed(futures), start=1):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+                print(f"[{done}/{len(files)}] {os.path.basename(path)} processed")
+            except Exception:
+                # Keep going with the rest of the corpus
+                results[path] = None
+                print(f"[{done}/{len(files)}] {os.path.basename(path)} failed")
+                print(traceback.format_exc())
+
+    # A transcript whose analysis failed may still have been converted
+    index_converted(files)
+    return results
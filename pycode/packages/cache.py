@@ -0,0 +1,197 @@
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+import threading
+
+# Location and size of the shared cache, overridable through the environment
+DEFAULT_CACHE_DIR = os.environ.get("MEETINSIGHT_CACHE_DIR",
+                                   os.path.join(os.path.expanduser("~"), ".cache", "meetinsight"))
+DEFAULT_MAX_BYTES = int(os.environ.get("MEETINSIGHT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Suffix of the cache entries, anything else in the directory is left alone
+ENTRY_SUFFIX = ".pkl"
+
+
+def content_hash(content: str) -> str:
+    """
+    Hash the content of a transcript, which identifies it in the cache whatever its file name.
+
+    Args:
+        content (str): The transcript content.
+
+    Returns:
+        str: The SHA-256 hex digest of the content.
+    """
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk cache of analysis results, keyed by transcript content hash, model name and parameters.
+    Entries are written atomically, so several processes (the GUI and batch workers) can share one
+    directory. When the cache grows past `max_bytes`, the least recently used entries are evicted.
+
+    Args:
+        directory (str, optional): Directory holding the entries. Defaults to DEFAULT_CACHE_DIR.
+        max_bytes (int, optional): Size above which entries are evicted. Defaults to DEFAULT_MAX_BYTES.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None  # Running estimate of the cache size, computed on first write
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, digest, kind, model=None, **params):
+        """
+        Build the key of a result.
+
+        Args:
+            digest (str): Content hash of the transcript, see content_hash.
+            kind (str): Kind of result, e.g. 'abstractive' or 'sentiment'.
+            model (str, optional): Name of the model producing the result.
+            **params: Parameters the result depends on, e.g. chunk size or beam count.
+
+        Returns:
+            str: The key of the entry.
+        """
+        description = json.dumps([digest, kind, model, params], sort_keys=True, default=str)
+        return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def get(self, key, default=None):
+        """
+        Read an entry, marking it as recently used.
+
+        Args:
+            key (str): Key of the entry.
+            default (Any, optional): Returned when the entry is missing or unreadable.
+
+        Returns:
+            Any: The cached value, or `default`.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                value = pickle.load(file)
+            # The modification time orders the entries for LRU eviction
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            return default
+        except Exception:
+            # A corrupt or truncated entry is treated as a miss
+            return default
+
+    def set(self, key, value):
+        """
+        Write an entry, then evict old entries if the cache has grown too large.
+
+        Args:
+            key (str): Key of the entry.
+            value (Any): Picklable value to store.
+        """
+        # Write to a temporary file and rename it, so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        size = os.path.getsize(temp_path)
+        os.replace(temp_path, self._path(key))
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def get_or_compute(self, digest, kind, compute, model=None, **params):
+        """
+        Return a cached result, computing and storing it on a miss. A None result means the computation
+        failed (e.g. an API error) and is not stored.
+
+        Args:
+            digest (str): Content hash of the transcript, see content_hash.
+            kind (str): Kind of result, e.g. 'abstractive' or 'sentiment'.
+            compute (Callable[[], Any]): Function computing the result on a miss.
+            model (str, optional): Name of the model producing the result.
+            **params: Parameters the result depends on.
+
+        Returns:
+            Any: The cached or freshly computed result.
+        """
+        key = self.key(digest, kind, model, **params)
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def clear(self):
+        """
+        Delete every entry of the cache.
+        """
+        with self._lock:
+            for path, _, _ in self._entries():
+                _remove(path)
+            self._size = 0
+
+    def _entries(self):
+        # (path, last use, size) of every entry
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(ENTRY_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # Evicted by another process meanwhile
+                entries.append((entry.path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, _, size in self._entries())
+
+    def _evict(self):
+        # Delete the least recently used entries until the cache is back under 80% of its budget,
+        # so that eviction does not run again on the very next write
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        for path, _, size in entries:
+            if total <= self.max_bytes * 0.8:
+                break
+            _remove(path)
+            total -= size
+        self._size = total
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """
+    The cache shared by the GUI and the batch tools, created on first use.
+
+    Returns:
+        ResultCache: The shared cache.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache()
+    return _default_cache
@@ -1,10 +1,32 @@
 import nltk
-from transformers import BartTokenizer
-from typing import List
+import numpy as np
+from typing import List, Tuple
+from packages.models import get_tokenizer, tokenizer_lock
+from packages.instrumentation import span
 
 
-# Load the BART-large-cnn tokenizer
-tokenizer = BartTokenizer.from_pretrained('facebook/bart-large-cnn')
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    Locate the sentences of a text as character spans, so that they can be sliced back out of the
+    original string.
+
+    Args:
+        text (str): The input text.
+
+    Returns:
+        List[Tuple[int, int]]: (start, end) character offsets of each sentence, in order.
+    """
+    spans = []
+    position = 0
+    for sentence in nltk.sent_tokenize(text):
+        # Punkt returns substrings of the input, found again from the end of the previous sentence
+        start = text.find(sentence, position)
+        if start < 0:
+            continue
+        position = start + len(sentence)
+        spans.append((start, position))
+    return spans
+
 
 def split_text_into_chunks(text: str, max_tokens: int = 1024) -> List[str]:
     """
@@ -12,6 +34,10 @@ def split_text_into_chunks(text: str, max_tokens: int = 1024) -> List[str]:
     sentence boundaries. This ensures that sentences are not cut off abruptly in the middle, 
     which is crucial for tasks like summarization or translation where context is important.
 
+    All sentences are tokenized in a single batched call of the fast tokenizer, chunk boundaries are
+    found on the prefix sum of the sentence lengths, and each chunk is sliced from the original text,
+    so no token is ever decoded back into text.
+
     Args:
         text (str): The input text to be split.
         max_tokens (int, optional): The maximum number of tokens per chunk. Defaults to 1024.
@@ -19,44 +45,47 @@ def split_text_into_chunks(text: str, max_tokens: int = 1024) -> List[str]:
     Returns:
         List[str]: A list of text chunks, each having a maximum of `max_tokens` tokens.
     """
-    
-    tokens_chunks = []  # Stores the final chunks of tokens
-    current_chunk = []  # Temporarily stores tokens until they reach `max_tokens`
+    tokenizer = get_tokenizer()  # Shared BART-large-cnn tokenizer, loaded on first use
 
     # Tokenize the text into sentences to respect sentence boundaries
-    sentences = nltk.sent_tokenize(text)
-    
-    for sentence in sentences:
-        # Tokenize the sentence to count tokens without special tokens
-        sentence_tokens = tokenizer.encode(sentence, add_special_tokens=False)
-        
-        # If a single sentence is longer than `max_tokens`, split it further
-        if len(sentence_tokens) > max_tokens:
-            part_size = max_tokens // 2  # Split into parts smaller than max_tokens
-            parts = [sentence[i:i + part_size] for i in range(0, len(sentence), part_size)]
-            for part in parts:
-                part_tokens = tokenizer.encode(part, add_special_tokens=False)
-                if len(part_tokens) > max_tokens:
-                    continue  # Skip parts still exceeding `max_tokens`
-                if len(current_chunk) + len(part_tokens) > max_tokens:
-                    # Save the current chunk and start a new one
-                    tokens_chunks.append(tokenizer.decode(current_chunk))
-                    current_chunk = part_tokens
-                else:
-                    current_chunk.extend(part_tokens)
-        else:
-            # Add sentence tokens to current chunk or save the chunk if it exceeds the limit
-            if len(current_chunk) + len(sentence_tokens) > max_tokens:
-                tokens_chunks.append(tokenizer.decode(current_chunk))
-                current_chunk = sentence_tokens
-            else:
-                current_chunk.extend(sentence_tokens)
-    
-    # Add the last chunk if it contains any tokens
-    if current_chunk:
-        tokens_chunks.append(tokenizer.decode(current_chunk))
-    
-    return tokens_chunks
+    spans = sentence_spans(text)
+    if not spans:
+        return []
+
+    # Count the tokens of every sentence in one batched encode, without special tokens
+    with tokenizer_lock(), span("tokenizer.encode", size=len(spans)):
+        encoding = tokenizer([text[start:end] for start, end in spans], add_special_tokens=False,
+                             return_offsets_mapping=True)
+
+    # Units packed into chunks: (start, end, tokens). Sentences longer than `max_tokens`
+    # are cut into pieces of `max_tokens` tokens along their token offsets
+    starts, ends, lengths = [], [], []
+    for (start, end), offsets in zip(spans, encoding["offset_mapping"]):
+        if len(offsets) <= max_tokens:
+            starts.append(start)
+            ends.append(end)
+            lengths.append(len(offsets))
+            continue
+        for first in range(0, len(offsets), max_tokens):
+            piece = offsets[first:first + max_tokens]
+            starts.append(start + piece[0][0])
+            ends.append(start + piece[-1][1])
+            lengths.append(len(piece))
+
+    # Prefix sum of the unit lengths: tokens before unit i are cumulative[i]
+    cumulative = np.concatenate(([0], np.cumsum(lengths)))
+
+    chunks = []
+    first = 0
+    while first < len(lengths):
+        # Last unit that still fits in the chunk opened at `first`, at least one unit per chunk
+        stop = int(np.searchsorted(cumulative, cumulative[first] + max_tokens, side="right")) - 1
+        stop = max(stop, first + 1)
+        # Slice the chunk straight from the original text
+        chunks.append(text[starts[first]:ends[stop - 1]])
+        first = stop
+
+    return chunks
 
 # FOR DEBUGGING ONLY #################################################################
 # Example usage
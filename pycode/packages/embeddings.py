@@ -0,0 +1,527 @@
+import os
+import json
+import tempfile
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+from packages.cache import DEFAULT_CACHE_DIR
+from packages.models import get_embedding_model, EMBEDDING_MODEL_NAME
+from packages.instrumentation import span
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: only the threads of one process are kept from writing the index at the same time
+    fcntl = None
+
+# Location of the index, overridable through the environment
+DEFAULT_EMBEDDING_DIR = os.environ.get("MEETINSIGHT_EMBEDDING_DIR", os.path.join(DEFAULT_CACHE_DIR, "embeddings"))
+
+# Format version of the manifest and the files, bumped whenever the layout changes
+VERSION = 2
+
+# Consecutive cues are embedded together until a passage holds this many words; most cues are too short
+# ("Yeah.", "Okay.") to carry a topic on their own
+PASSAGE_WORDS = 60
+
+# Longest passage seen by the model, in tokens
+MAX_TOKENS = 256
+
+# IVF: the vectors are clustered once there are this many, into about sqrt(count) lists, and clustered
+# again once the index has grown this many times over since
+TRAIN_MIN_ROWS = 2048
+RETRAIN_GROWTH = 4
+KMEANS_ITERATIONS = 10
+
+# Rows sampled per list to compute the centroids; every row is then assigned to its closest one
+TRAIN_SAMPLE_PER_LIST = 256
+
+# Blocks of inverted lists appended since the last clustering before they are merged into one
+MAX_LIST_BLOCKS = 64
+
+# Lists searched by default, out of about sqrt(count)
+DEFAULT_N_PROBE = 8
+
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = "index.lock"
+VECTORS_NAME = "vectors.f16"  # float16 matrix, one row per passage, appended
+ROWS_NAME = "rows.bin"  # ROW_DTYPE records, one per passage, appended
+CENTROIDS_NAME = "centroids.npy"  # float32 centroids of the IVF lists
+LISTS_NAME = "lists.bin"  # int32 row ids, by block, grouped by IVF list within a block
+LIST_OFFSETS_NAME = "list_offsets.bin"  # int64, n_lists + 1 positions in LISTS_NAME per block, where each list starts
+
+# Where every passage comes from, and the IVF list it belongs to (-1 until the index is first clustered)
+ROW_DTYPE = np.dtype([("transcript", "<i4"), ("first_cue", "<i4"), ("last_cue", "<i4"),
+                      ("list", "<i4"), ("start_ms", "<i8")])
+
+
+@dataclass(frozen=True)
+class EmbeddingHit:
+    """
+    A passage similar to a query.
+
+    Attributes:
+        path (str): Absolute path of the transcript.
+        first_cue (int): Index of the first cue of the passage.
+        last_cue (int): Index of the last cue of the passage.
+        start_ms (int, optional): Start of the passage in milliseconds, None for untimed transcripts.
+        score (float): Cosine similarity to the query.
+        text (str, optional): Text of the passage, when it was loaded.
+    """
+    path: str
+    first_cue: int
+    last_cue: int
+    start_ms: Optional[int]
+    score: float
+    text: Optional[str] = None
+
+
+def embed_texts(texts, batch_size=32, name=EMBEDDING_MODEL_NAME):
+    """
+    Embed texts on CPU in padded batches: mean of the token embeddings, L2-normalized. Texts are sorted
+    by length before batching so that each batch holds inputs of similar length, and the embeddings are
+    put back in the original order.
+
+    Args:
+        texts (List[str]): The texts.
+        batch_size (int, optional): Texts per forward pass. Defaults to 32.
+        name (str, optional): Checkpoint of the model. Defaults to EMBEDDING_MODEL_NAME.
+
+    Returns:
+        np.ndarray: One unit-length float32 row per text.
+    """
+    import torch
+
+    tokenizer, model = get_embedding_model(name)
+    texts = [str(text) for text in texts]
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+    embeddings = np.zeros((len(texts), model.config.hidden_size), dtype=np.float32)
+
+    with torch.no_grad():
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            with span("tokenizer.encode", size=len(batch)):
+                inputs = tokenizer([texts[i] for i in batch], return_tensors="pt", padding=True,
+                                   max_length=MAX_TOKENS, truncation=True)
+            with span("model.embed", size=int(inputs["input_ids"].numel()), model=name):
+                hidden = model(**inputs).last_hidden_state
+            # Mean over the real tokens only
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+            embeddings[batch] = torch.nn.functional.normalize(pooled, dim=1).numpy()
+    return embeddings
+
+
+def passages(transcript, words=PASSAGE_WORDS):
+    """
+    Group the consecutive cues of a transcript into passages of at least `words` words.
+
+    Args:
+        transcript (Transcript): The transcript.
+        words (int, optional): Words per passage; the last passage may be shorter. Defaults to PASSAGE_WORDS.
+
+    Returns:
+        List[tuple]: (first cue, last cue, text) of every passage.
+    """
+    result = []
+    first, count, parts = 0, 0, []
+    for cue, text in enumerate(transcript.texts()):
+        parts.append(text)
+        count += len(text.split())
+        if count >= words:
+            result.append((first, cue, " ".join(parts)))
+            first, count, parts = cue + 1, 0, []
+    if parts:
+        result.append((first, len(transcript) - 1, " ".join(parts)))
+    return result
+
+
+def spherical_kmeans(vectors, k, iterations=KMEANS_ITERATIONS, seed=0):
+    """
+    Cluster unit vectors by cosine similarity.
+
+    Args:
+        vectors (np.ndarray): The unit vectors, one per row, e.g. a sample of the index held in memory.
+        k (int): Number of clusters.
+        iterations (int, optional): Assignment and update rounds. Defaults to KMEANS_ITERATIONS.
+        seed (int, optional): Seed of the initial centroids. Defaults to 0.
+
+    Returns:
+        np.ndarray: The unit-length float32 centroids.
+    """
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = nearest_lists(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # An empty cluster keeps its centroid
+        empty = norms[:, 0] == 0
+        sums[empty], norms[empty] = centroids[empty], 1
+        centroids = sums / norms
+    return centroids
+
+
+def nearest_lists(vectors, centroids, block=65536):
+    """
+    Index of the closest centroid of every vector, computed by blocks to bound memory.
+
+    Returns:
+        np.ndarray: One int32 list index per vector.
+    """
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block):
+        labels[start:start + block] = np.argmax(np.asarray(vectors[start:start + block], dtype=np.float32) @ centroids.T, axis=1)
+    return labels
+
+
+def _list_starts(labels, n_lists):
+    """
+    Where each list starts among rows grouped by list, followed by the number of rows.
+
+    Returns:
+        np.ndarray: n_lists + 1 int64 positions.
+    """
+    starts = np.zeros(n_lists + 1, dtype=np.int64)
+    np.cumsum(np.bincount(labels, minlength=n_lists), out=starts[1:])
+    return starts
+
+
+class EmbeddingIndex:
+    """
+    On-disk semantic index of the passages of every transcript. Embeddings are appended to a memory-mapped
+    float16 matrix, and an inverted-file (IVF) index groups them into lists around k-means centroids: a query
+    only reads and compares the passages of the few lists closest to it. Passages appended after the last
+    clustering are assigned to their closest list as they arrive, in a new block of lists. Writers take a lock
+    file, so several processes can share one index.
+
+    Args:
+        directory (str, optional): Directory of the index. Defaults to DEFAULT_EMBEDDING_DIR.
+        encode (Callable[[List[str]], np.ndarray], optional): Embeds texts as unit-length rows. Defaults to embed_texts.
+        model_name (str, optional): Name of the embedding model recorded in the index; an index built with
+            another model is rejected. Defaults to EMBEDDING_MODEL_NAME.
+    """
+
+    def __init__(self, directory=DEFAULT_EMBEDDING_DIR, encode=None, model_name=EMBEDDING_MODEL_NAME):
+        self.directory = directory
+        self.encode = encode or embed_texts
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __len__(self):
+        return self._read_manifest()["count"]
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _locked(self):
+        with self._lock, open(self._path(LOCK_NAME), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_manifest(self):
+        try:
+            with open(self._path(MANIFEST_NAME), encoding="utf-8") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return {"version": VERSION, "model": self.model_name, "dim": None, "count": 0, "trained_count": 0,
+                    "n_lists": 0, "list_blocks": 0, "sources": [], "transcripts": {}}
+        if manifest.get("version") != VERSION or manifest.get("model") != self.model_name:
+            raise ValueError(f"{self.directory} holds embeddings of {manifest.get('model')}, "
+                             f"version {manifest.get('version')}; expected {self.model_name}, version {VERSION}")
+        return manifest
+
+    def _write_manifest(self, manifest):
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(handle, "w", encoding="utf-8") as file:
+            json.dump(manifest, file)
+        os.replace(temporary, self._path(MANIFEST_NAME))
+
+    def _arrays(self, manifest):
+        # Read-only views of the committed rows; anything past them was left by an interrupted writer
+        count, dim = manifest["count"], manifest["dim"]
+        if not count:
+            return np.zeros((0, dim or 0), dtype=np.float16), np.zeros(0, dtype=ROW_DTYPE)
+        vectors = np.memmap(self._path(VECTORS_NAME), dtype=np.float16, mode="r", shape=(count, dim))
+        rows = np.memmap(self._path(ROWS_NAME), dtype=ROW_DTYPE, mode="r", shape=(count,))
+        return vectors, rows
+
+    def _lists(self, manifest):
+        # Read-only views of the inverted lists: the row ids, and where each list starts in every block
+        lists = np.memmap(self._path(LISTS_NAME), dtype=np.int32, mode="r", shape=(manifest["count"],))
+        offsets = np.memmap(self._path(LIST_OFFSETS_NAME), dtype=np.int64, mode="r",
+                            shape=(manifest["list_blocks"], manifest["n_lists"] + 1))
+        return lists, offsets
+
+    def _append_file(self, name, data, committed):
+        # Drop whatever an interrupted writer left past the committed bytes, then append
+        with open(self._path(name), "ab") as file:
+            file.truncate(committed)
+            file.write(data.tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _replace_file(self, name, data):
+        # Written aside and swapped in, so a reader sees either the old or the new file
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(handle, "wb") as file:
+            file.write(data.tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self._path(name))
+
+    def _centroids(self):
+        path = self._path(CENTROIDS_NAME)
+        return np.load(path) if os.path.exists(path) else None
+
+    def is_indexed(self, source, source_stat=None):
+        """
+        Whether the current version of a transcript file is in the index.
+
+        Returns:
+            bool: True if the file was embedded with its current size and modification time.
+        """
+        source_stat = source_stat or os.stat(source)
+        entry = self._read_manifest()["transcripts"].get(os.path.abspath(source))
+        return entry is not None and entry["size"] == source_stat.st_size and entry["mtime_ns"] == source_stat.st_mtime_ns
+
+    def add(self, source, transcript, source_stat=None):
+        """
+        Embed the passages of a transcript and append them; an earlier version of the transcript is replaced.
+
+        Args:
+            source (str): Path to the transcript file.
+            transcript (Transcript): The parsed transcript.
+            source_stat (os.stat_result, optional): Stat of the file the transcript was parsed from.
+
+        Returns:
+            int: Number of passages appended.
+        """
+        source = os.path.abspath(source)
+        source_stat = source_stat or os.stat(source)
+        units = passages(transcript)
+        # Embedded before taking the lock
+        embeddings = self.encode([text for _, _, text in units]) if units else None
+
+        with self._locked():
+            manifest = self._read_manifest()
+            transcript_id = len(manifest["sources"])
+            manifest["sources"].append(source)
+            manifest["transcripts"][source] = {"id": transcript_id, "size": source_stat.st_size,
+                                               "mtime_ns": source_stat.st_mtime_ns}
+            if units:
+                self._append(manifest, transcript_id, transcript, units, embeddings)
+            self._write_manifest(manifest)
+        return len(units)
+
+    def _append(self, manifest, transcript_id, transcript, units, embeddings):
+        # Called with the lock held
+        if manifest["dim"] is None:
+            manifest["dim"] = int(embeddings.shape[1])
+        elif embeddings.shape[1] != manifest["dim"]:
+            raise ValueError(f"Embeddings of {embeddings.shape[1]} dimensions, the index holds {manifest['dim']}")
+
+        records = np.zeros(len(units), dtype=ROW_DTYPE)
+        records["transcript"] = transcript_id
+        records["first_cue"] = [first for first, _, _ in units]
+        records["last_cue"] = [last for _, last, _ in units]
+        records["start_ms"] = np.asarray(transcript.start_ms)[records["first_cue"]] if transcript.timed else -1
+        centroids = self._centroids()
+        records["list"] = nearest_lists(embeddings, centroids) if centroids is not None else -1
+
+        count = manifest["count"]
+        self._append_file(VECTORS_NAME, embeddings.astype(np.float16), count * 2 * manifest["dim"])
+        self._append_file(ROWS_NAME, records, count * ROW_DTYPE.itemsize)
+        if centroids is not None:
+            # The new rows make a block of their own: their ids grouped by list, and where each list starts
+            labels = records["list"]
+            n_lists = manifest["n_lists"]
+            self._append_file(LISTS_NAME, (count + np.argsort(labels, kind="stable")).astype(np.int32), count * 4)
+            self._append_file(LIST_OFFSETS_NAME, count + _list_starts(labels, n_lists),
+                              manifest["list_blocks"] * (n_lists + 1) * 8)
+            manifest["list_blocks"] += 1
+        manifest["count"] = count + len(units)
+
+        if manifest["count"] >= TRAIN_MIN_ROWS and manifest["count"] >= RETRAIN_GROWTH * max(manifest["trained_count"], TRAIN_MIN_ROWS // RETRAIN_GROWTH):
+            self._train(manifest)
+        elif manifest["list_blocks"] > MAX_LIST_BLOCKS:
+            _, rows = self._arrays(manifest)
+            self._write_lists(manifest, np.asarray(rows["list"]))
+
+    def _train(self, manifest, n_lists=None):
+        # Called with the lock held: cluster a sample of the rows, then rewrite the list of every row by blocks
+        vectors, _ = self._arrays(manifest)
+        count = manifest["count"]
+        n_lists = min(n_lists or max(1, int(np.sqrt(count))), count)
+        sample = np.random.default_rng(0).choice(count, size=min(count, TRAIN_SAMPLE_PER_LIST * n_lists), replace=False)
+        centroids = spherical_kmeans(vectors[np.sort(sample)], n_lists)
+        labels = nearest_lists(vectors, centroids)
+
+        rows = np.memmap(self._path(ROWS_NAME), dtype=ROW_DTYPE, mode="r+", shape=(count,))
+        rows["list"] = labels
+        rows.flush()
+        del rows
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(handle, "wb") as file:
+            np.save(file, centroids)
+        os.replace(temporary, self._path(CENTROIDS_NAME))
+        manifest["n_lists"] = n_lists
+        self._write_lists(manifest, labels)
+        manifest["trained_count"] = count
+
+    def _write_lists(self, manifest, labels):
+        # Called with the lock held: rewrite the inverted lists of every row as a single block
+        self._replace_file(LISTS_NAME, np.argsort(labels, kind="stable").astype(np.int32))
+        self._replace_file(LIST_OFFSETS_NAME, _list_starts(labels, manifest["n_lists"]))
+        manifest["list_blocks"] = 1
+
+    def train(self, n_lists=None):
+        """
+        Cluster every passage again, e.g. after a large import.
+
+        Args:
+            n_lists (int, optional): Number of IVF lists. Defaults to about the square root of the passage count.
+        """
+        with self._locked():
+            manifest = self._read_manifest()
+            if manifest["count"]:
+                self._train(manifest, n_lists)
+                self._write_manifest(manifest)
+
+    def index_files(self, paths, force=False):
+        """
+        Embed the transcript files that are new or changed since they were embedded.
+
+        Args:
+            paths (Iterable[str]): Paths to .vtt or .txt transcripts.
+            force (bool, optional): Embed the files that are up to date too. Defaults to False.
+
+        Returns:
+            int: Number of transcripts embedded.
+        """
+        from packages.transcript_store import load_or_convert
+        from packages.search_index import auto_index_suspended, index_converted
+
+        # Transcripts converted on the way go to the search index in one commit, not one segment each
+        added = []
+        with auto_index_suspended():
+            for path in paths:
+                source_stat = os.stat(path)
+                if force or not self.is_indexed(path, source_stat):
+                    self.add(path, load_or_convert(path)[0], source_stat)
+                    added.append(path)
+        index_converted(added)
+        return len(added)
+
+    def search(self, query, limit=10, n_probe=DEFAULT_N_PROBE, with_text=True):
+        """
+        Find the passages closest in meaning to a query across every indexed transcript,
+        e.g. "discussions about the budget of the remote control".
+
+        Args:
+            query (str): What to look for, in plain words.
+            limit (int, optional): Number of hits returned. Defaults to 10.
+            n_probe (int, optional): IVF lists searched; more is slower and closer to an exhaustive search.
+                Defaults to DEFAULT_N_PROBE.
+            with_text (bool, optional): Load the text of every hit from its transcript. Defaults to True.
+
+        Returns:
+            List[EmbeddingHit]: The hits, most similar first.
+        """
+        manifest = self._read_manifest()
+        if not manifest["count"]:
+            return []
+        vectors, rows = self._arrays(manifest)
+        vector = np.asarray(self.encode([query])[0], dtype=np.float32)
+
+        # Rows of the probed lists, read from every block; every row until the index is first clustered
+        if manifest["list_blocks"]:
+            centroids = self._centroids()
+            lists, offsets = self._lists(manifest)
+            probed = np.argsort(-(centroids @ vector))[:n_probe]
+            starts = np.asarray(offsets[:, probed]).ravel()
+            lengths = np.asarray(offsets[:, probed + 1]).ravel() - starts
+            positions = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+            candidates = np.sort(lists[positions])
+        else:
+            candidates = np.arange(manifest["count"])
+
+        # Only the current version of every transcript
+        live = np.zeros(len(manifest["sources"]), dtype=bool)
+        live[[entry["id"] for entry in manifest["transcripts"].values()]] = True
+        candidates = candidates[live[rows["transcript"][candidates]]]
+        if not len(candidates):
+            return []
+
+        with span("embeddings.scan", size=len(candidates)):
+            scores = np.asarray(vectors[candidates], dtype=np.float32) @ vector
+        best = np.argsort(-scores, kind="stable")[:limit]
+
+        hits = []
+        for row, score in zip(candidates[best].tolist(), scores[best].tolist()):
+            record = rows[row]
+            start_ms = int(record["start_ms"])
+            hits.append(EmbeddingHit(path=manifest["sources"][int(record["transcript"])], first_cue=int(record["first_cue"]),
+                                     last_cue=int(record["last_cue"]), start_ms=start_ms if start_ms >= 0 else None,
+                                     score=score))
+        return with_texts(hits) if with_text else hits
+
+
+def with_texts(hits):
+    """
+    Fill in the text of embedding hits from the stores of their transcripts.
+    Hits whose transcript is gone are returned as they are.
+
+    Args:
+        hits (List[EmbeddingHit]): The hits.
+
+    Returns:
+        List[EmbeddingHit]: The hits with their text.
+    """
+    from dataclasses import replace
+    from packages.transcript_store import load_or_convert
+
+    transcripts = {}
+    filled = []
+    for hit in hits:
+        if hit.path not in transcripts:
+            try:
+                transcripts[hit.path] = load_or_convert(hit.path)[0]
+            except OSError:
+                transcripts[hit.path] = None
+        transcript = transcripts[hit.path]
+        if transcript is None or hit.last_cue >= len(transcript):
+            filled.append(hit)
+        else:
+            text = " ".join(transcript.text(cue) for cue in range(hit.first_cue, hit.last_cue + 1))
+            filled.append(replace(hit, text=text))
+    return filled
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def default_embedding_index():
+    """
+    The embedding index shared by the GUI and the command line tools, created on first use.
+
+    Returns:
+        EmbeddingIndex: The shared index.
+    """
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = EmbeddingIndex()
+    return _default_index
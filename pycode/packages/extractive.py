@@ -0,0 +1,304 @@
+import re
+import math
+from array import array
+from itertools import chain
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from packages.vtt_formatting import cue_times_ms, format_milliseconds
+
+# Words of an utterance, lowercased beforehand. Contractions stay whole ("don't", "we're")
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# Luhn: significant words further apart than this many other words belong to different chunks, as in sumy
+MAX_GAP_SIZE = 4
+
+# TextRank: damping factor of the random walk, convergence threshold and iteration cap
+DAMPING = 0.85
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 100
+
+# About one key cue per 1024-token chunk of formatted VTT, the density extractive_summarize_chunks had
+WORDS_PER_KEY_CUE = 600
+
+
+@dataclass(frozen=True)
+class CueTokens:
+    """
+    Every word of a transcript, tokenized and stemmed once, as flat arrays with one entry per word.
+
+    Attributes:
+        cue (np.ndarray): Index of the cue each word belongs to.
+        position (np.ndarray): Position of each word within its cue.
+        term (np.ndarray): Id of the stem of each word in `terms`.
+        stop (np.ndarray): True for stop words.
+        terms (tuple): The distinct stems.
+        cue_count (int): Number of cues, including cues without any word.
+    """
+    cue: np.ndarray
+    position: np.ndarray
+    term: np.ndarray
+    stop: np.ndarray
+    terms: tuple
+    cue_count: int
+
+
+def tokenize_cues(texts):
+    """
+    Tokenize and stem the utterances of a transcript in one pass. Each distinct word is stemmed only once,
+    however many times it is said.
+
+    Args:
+        texts (Iterable[str]): The text of every cue.
+
+    Returns:
+        CueTokens: The words of all the cues.
+    """
+    # Imported here so that sumy is only needed once key cues are requested
+    from sumy.nlp.stemmers import Stemmer
+    from sumy.utils import get_stop_words
+
+    words_per_cue = [WORD_PATTERN.findall(str(text).lower()) for text in texts]
+    lengths = np.fromiter(map(len, words_per_cue), dtype=np.int64, count=len(words_per_cue))
+    flat = np.array(list(chain.from_iterable(words_per_cue)), dtype=object)
+
+    # Distinct words, then distinct stems of those words
+    word_ids, words = pd.factorize(flat)
+    stem = Stemmer("english")
+    stem_ids, terms = pd.factorize(np.array([stem(word) for word in words], dtype=object))
+    stop_words = np.isin(words, list(get_stop_words("english")))
+
+    cue = np.repeat(np.arange(len(lengths)), lengths)
+    starts = np.cumsum(lengths) - lengths
+    return CueTokens(
+        cue=cue,
+        position=np.arange(len(flat)) - starts[cue],
+        term=stem_ids[word_ids],
+        stop=stop_words[word_ids],
+        terms=tuple(terms),
+        cue_count=len(lengths),
+    )
+
+
+class CueTokenizer:
+    """
+    Tokenize and stem cues as they arrive, e.g. during a live meeting. The vocabulary is kept between calls,
+    so every cue is tokenized once and every distinct word stemmed once, whatever the number of calls.
+    Produces the same tokens as tokenize_cues.
+    """
+
+    def __init__(self):
+        # Imported here so that sumy is only needed once key cues are requested
+        from sumy.nlp.stemmers import Stemmer
+        from sumy.utils import get_stop_words
+
+        self._stem = Stemmer("english")
+        self._stop_words = frozenset(get_stop_words("english"))
+        self._words = {}  # Word -> (term id, stop word)
+        self._terms = {}  # Stem -> term id, in order of first appearance
+        self._cue = array("q")
+        self._position = array("q")
+        self._term = array("q")
+        self._stop = array("b")
+        self.cue_count = 0
+
+    def add(self, texts):
+        """
+        Tokenize new cues, appended after the ones already added.
+
+        Args:
+            texts (Iterable[str]): The text of every new cue.
+        """
+        for text in texts:
+            for position, word in enumerate(WORD_PATTERN.findall(str(text).lower())):
+                entry = self._words.get(word)
+                if entry is None:
+                    entry = self._words[word] = (self._terms.setdefault(self._stem(word), len(self._terms)),
+                                                 word in self._stop_words)
+                self._cue.append(self.cue_count)
+                self._position.append(position)
+                self._term.append(entry[0])
+                self._stop.append(entry[1])
+            self.cue_count += 1
+
+    def tokens(self):
+        """
+        The words of all the cues added so far.
+
+        Returns:
+            CueTokens: A snapshot of the tokens, unaffected by later calls to add.
+        """
+        return CueTokens(
+            cue=np.array(self._cue, dtype=np.int64),
+            position=np.array(self._position, dtype=np.int64),
+            term=np.array(self._term, dtype=np.int64),
+            stop=np.array(self._stop, dtype=bool),
+            terms=tuple(self._terms),
+            cue_count=self.cue_count,
+        )
+
+
+def luhn_scores(tokens):
+    """
+    Score every cue with the Luhn heuristic of sumy's LuhnSummarizer, vectorized over the whole transcript.
+    Stems said more than once are significant; significant words are grouped into chunks separated by
+    at least MAX_GAP_SIZE other words, and a cue scores the best (significant words)² / (chunk length)
+    of its chunks.
+
+    Args:
+        tokens (CueTokens): The words of the transcript.
+
+    Returns:
+        np.ndarray: The score of each cue.
+    """
+    scores = np.zeros(tokens.cue_count)
+    frequency = np.bincount(tokens.term[~tokens.stop], minlength=len(tokens.terms))
+    significant = np.flatnonzero((frequency[tokens.term] > 1) & ~tokens.stop)
+    if not len(significant):
+        return scores
+
+    cue, position = tokens.cue[significant], tokens.position[significant]
+
+    # A chunk starts at the first significant word of a cue or after a long enough gap
+    new_chunk = np.ones(len(significant), dtype=bool)
+    new_chunk[1:] = (cue[1:] != cue[:-1]) | (position[1:] - position[:-1] - 1 >= MAX_GAP_SIZE)
+    starts = np.flatnonzero(new_chunk)
+    ends = np.append(starts[1:], len(significant)) - 1
+
+    counts = ends - starts + 1
+    lengths = position[ends] - position[starts] + 1
+    ratings = np.where(counts > 1, counts ** 2 / lengths, 0.0)
+
+    np.maximum.at(scores, cue[starts], ratings)
+    return scores
+
+
+def textrank_scores(tokens):
+    """
+    Score every cue with TextRank: PageRank over the graph of cues weighted by the cosine similarity of
+    their TF-IDF vectors. The similarity matrix is never materialized; each iteration multiplies by the
+    sparse cue-term matrix and its transpose with np.bincount.
+
+    Args:
+        tokens (CueTokens): The words of the transcript.
+
+    Returns:
+        np.ndarray: The score of each cue.
+    """
+    n, vocabulary = tokens.cue_count, len(tokens.terms)
+    if not n:
+        return np.zeros(0)
+
+    # Sparse cue-term matrix in coordinate form, stop words left out
+    keys, counts = np.unique(tokens.cue[~tokens.stop] * vocabulary + tokens.term[~tokens.stop], return_counts=True)
+    rows, cols = keys // vocabulary, keys % vocabulary
+    document_frequency = np.bincount(cols, minlength=vocabulary)
+    values = counts * np.log(n / np.maximum(document_frequency, 1)[cols] + 1)
+
+    # Normalize the rows so that dot products are cosine similarities
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=n))
+    values = values / norms[rows]
+    self_similarity = np.bincount(rows, weights=values ** 2, minlength=n)
+
+    def similarity_dot(vector):
+        # (X Xᵀ - diag) @ vector, i.e. the similarity of each cue to all the others
+        per_term = np.bincount(cols, weights=values * vector[rows], minlength=vocabulary)
+        return np.bincount(rows, weights=values * per_term[cols], minlength=n) - self_similarity * vector
+
+    degree = similarity_dot(np.ones(n))
+    dangling = degree <= 1e-12
+    degree[dangling] = 1.0
+
+    scores = np.full(n, 1.0 / n)
+    for _ in range(MAX_ITERATIONS):
+        # Cues similar to no other cue spread their score evenly
+        shared = np.where(dangling, 0.0, scores / degree)
+        updated = (1 - DAMPING) / n + DAMPING * (similarity_dot(shared) + scores[dangling].sum() / n)
+        converged = np.abs(updated - scores).sum() < TOLERANCE
+        scores = updated
+        if converged:
+            break
+
+    # Cues without any content word carry no information
+    scores[norms == 0] = 0.0
+    return scores
+
+
+# Scoring methods selectable by name
+METHODS = {
+    "luhn": luhn_scores,
+    "textrank": textrank_scores,
+}
+
+
+def select_key_cues(scores, word_count, count=None, words_per_cue=WORDS_PER_KEY_CUE):
+    """
+    Pick the best scoring cues.
+
+    Args:
+        scores (np.ndarray): The score of each cue.
+        word_count (int): Number of words of the transcript, which sets the default number of cues.
+        count (int, optional): Number of cues to keep. Defaults to one per `words_per_cue` words.
+        words_per_cue (int, optional): Words of transcript per key cue when `count` is not given. Defaults to 600.
+
+    Returns:
+        np.ndarray: Indices of the cues kept, in transcript order. Cues scoring 0 are never kept.
+    """
+    if count is None:
+        count = max(1, math.ceil(word_count / words_per_cue))
+
+    # Best scores first, earlier cues first among equal scores, then back to transcript order
+    ranked = np.argsort(-scores, kind="stable")
+    return np.sort(ranked[scores[ranked] > 0][:count])
+
+
+def extract_key_cues(df, count=None, method="luhn", words_per_cue=WORDS_PER_KEY_CUE):
+    """
+    Select the key cues of a transcript straight from its cue table. The utterances are tokenized once, so the
+    speakers and timestamps of the cues kept are never lost.
+
+    Args:
+        df (pd.DataFrame): Cue table with a 'Text' column, e.g. from format_VTT or format_TXT.
+        count (int, optional): Number of cues to keep. Defaults to one per `words_per_cue` words of the transcript.
+        method (str, optional): Scoring method, a key of METHODS. Defaults to "luhn".
+        words_per_cue (int, optional): Words of transcript per key cue when `count` is not given. Defaults to 600.
+
+    Returns:
+        pd.DataFrame: The rows of the key cues in transcript order, with their position in `df` in a 'Cue'
+            column, 'StartMs'/'EndMs' when the cues are timed and their 'Score'.
+    """
+    tokens = tokenize_cues(df["Text"])
+    scores = METHODS[method](tokens)
+    selected = select_key_cues(scores, len(tokens.term), count, words_per_cue)
+
+    key_cues = df.iloc[selected].copy()
+    key_cues.insert(0, "Cue", selected)
+    if "StartMs" not in df and "StartTime" in df:
+        start_ms, end_ms = cue_times_ms(df)
+        key_cues["StartMs"], key_cues["EndMs"] = start_ms[selected], end_ms[selected]
+    key_cues["Score"] = scores[selected]
+    return key_cues
+
+
+def format_key_cues(key_cues):
+    """
+    Format key cues as a readable dialogue, in the layout of format_vtt_as_dialogue. Cues without speaker or
+    timestamps, e.g. from a plain-text transcript, are listed as they are.
+
+    Args:
+        key_cues (pd.DataFrame): Key cues returned by extract_key_cues.
+
+    Returns:
+        str: One paragraph per cue.
+    """
+    if "StartMs" not in key_cues:
+        return '\n'.join(key_cues["Text"])
+
+    speakers = key_cues["Speaker"] if "Speaker" in key_cues else [None] * len(key_cues)
+    formatted_text = []
+    for speaker, start, end, text in zip(speakers, key_cues["StartMs"], key_cues["EndMs"], key_cues["Text"]):
+        timing = f"({format_milliseconds(start, 3)} to {format_milliseconds(end, 3)})"
+        heading = f"{speaker} {timing}" if isinstance(speaker, str) else timing
+        formatted_text.append(f"{heading}:\n{str(text).strip()}\n")
+
+    return '\n'.join(formatted_text)
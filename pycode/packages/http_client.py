@@ -0,0 +1,249 @@
+import time
+import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from packages.instrumentation import span
+
+# Responses worth retrying: rate limiting and server-side failures
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class APIError(Exception):
+    """
+    Raised when a request fails for good, after the retries allowed by the client.
+
+    Args:
+        status (int or None): HTTP status of the last response, None if no response was received.
+        message (str): Error message, taken from the response body when available.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}" if status is not None else message)
+        self.status = status
+        self.message = message
+
+
+class RateLimiter:
+    """
+    Token bucket limiting the rate of requests sent from asyncio code, combined with a cap on the
+    number of requests in flight.
+
+    Args:
+        rate (float, optional): Requests allowed per second. None disables the rate limit.
+        max_concurrency (int, optional): Requests allowed in flight at once. Defaults to 4.
+    """
+
+    def __init__(self, rate=None, max_concurrency=4):
+        self.rate = rate
+        self.capacity = max(1.0, rate or 1.0)  # Burst allowed after an idle period
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._lock = asyncio.Lock()
+
+    async def _take_token(self):
+        if self.rate is None:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                # Refill the bucket for the time elapsed since the last request
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        try:
+            await self._take_token()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._semaphore.release()
+
+
+class HTTPClient:
+    """
+    JSON-over-HTTP client sharing a pool of keep-alive connections, with timeouts and exponential
+    backoff on rate limiting (429) and server errors (5xx). Calls are thread-safe, so one client can be
+    shared by the whole application, and the asyncio methods send many requests concurrently.
+
+    Args:
+        base_url (str): URL prefix of every request, e.g. "https://api.openai.com/v1". Pointing it at
+            a local stub server is enough to test the callers.
+        headers (dict, optional): Headers sent with every request.
+        timeout (float or tuple, optional): Connect and read timeouts in seconds. Defaults to (10, 120).
+        max_retries (int, optional): Retries after a retryable failure. Defaults to 5.
+        backoff (float, optional): Base delay in seconds, doubled after every retry. Defaults to 1.
+        max_backoff (float, optional): Upper bound of the delay between two attempts. Defaults to 60.
+        pool_size (int, optional): Connections kept open per host. Defaults to 10.
+    """
+
+    def __init__(self, base_url, headers=None, timeout=(10, 120), max_retries=5, backoff=1.0,
+                 max_backoff=60.0, pool_size=10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_size = pool_size
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _delay(self, attempt, response=None):
+        # Honour the delay requested by the server, if any
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after is not None:
+                try:
+                    return min(self.max_backoff, float(retry_after))
+                except ValueError:
+                    pass
+        # Exponential backoff with jitter, so that concurrent callers do not retry in lockstep
+        return min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def post_json(self, path, payload):
+        """
+        POST a JSON payload and return the decoded JSON response, retrying on 429, 5xx, timeouts and
+        connection errors.
+
+        Args:
+            path (str): Path appended to the base URL, e.g. "/chat/completions".
+            payload (dict): JSON body of the request.
+
+        Returns:
+            dict: The decoded response.
+
+        Raises:
+            APIError: If the request still fails after the allowed retries, or fails with a non-retryable status.
+        """
+        return self._request("post", path, json=payload)
+
+    def get_json(self, path):
+        """
+        GET a path and return the decoded JSON response, retried like post_json.
+
+        Args:
+            path (str): Path appended to the base URL, e.g. "/health".
+
+        Returns:
+            dict: The decoded response.
+
+        Raises:
+            APIError: If the request still fails after the allowed retries, or fails with a non-retryable status.
+        """
+        return self._request("get", path)
+
+    def _request(self, method, path, **kwargs):
+        url = self.base_url + path
+        # One event per call, retries and backoff included; the size is the number of attempts
+        with span(f"http.{method}", url=url) as trace:
+            for attempt in range(self.max_retries + 1):
+                trace.size = attempt + 1
+                try:
+                    response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as error:
+                    if attempt == self.max_retries:
+                        raise APIError(None, str(error)) from error
+                    time.sleep(self._delay(attempt))
+                    continue
+
+                if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                    time.sleep(self._delay(attempt, response))
+                    continue
+                if not response.ok:
+                    raise APIError(response.status_code, _error_message(response))
+                return response.json()
+
+    async def post_json_async(self, path, payload, limiter=None):
+        """
+        Asyncio version of post_json. The request runs on a worker thread, over the same connection pool.
+
+        Args:
+            path (str): Path appended to the base URL.
+            payload (dict): JSON body of the request.
+            limiter (RateLimiter, optional): Limiter the request has to go through.
+
+        Returns:
+            dict: The decoded response.
+        """
+        if limiter is None:
+            return await asyncio.to_thread(self.post_json, path, payload)
+        async with limiter:
+            return await asyncio.to_thread(self.post_json, path, payload)
+
+    async def post_many_async(self, path, payloads, rate=None, max_concurrency=None):
+        """
+        Send many requests concurrently under a rate limiter.
+
+        Args:
+            path (str): Path appended to the base URL.
+            payloads (List[dict]): JSON bodies of the requests.
+            rate (float, optional): Requests allowed per second. Unlimited by default.
+            max_concurrency (int, optional): Requests in flight at once. Defaults to the pool size.
+
+        Returns:
+            List[dict]: The decoded responses, in the order of `payloads`.
+        """
+        limiter = RateLimiter(rate, max_concurrency or self.pool_size)
+        return await asyncio.gather(*(self.post_json_async(path, payload, limiter) for payload in payloads))
+
+    def post_many(self, path, payloads, rate=None, max_concurrency=None):
+        """
+        Synchronous entry point of post_many_async, usable from plain code, worker threads and notebooks.
+
+        Args:
+            path (str): Path appended to the base URL.
+            payloads (List[dict]): JSON bodies of the requests.
+            rate (float, optional): Requests allowed per second. Unlimited by default.
+            max_concurrency (int, optional): Requests in flight at once. Defaults to the pool size.
+
+        Returns:
+            List[dict]: The decoded responses, in the order of `payloads`.
+        """
+        return run_coroutine(self.post_many_async(path, payloads, rate, max_concurrency))
+
+    def close(self):
+        """
+        Close the pooled connections.
+        """
+        self.session.close()
+
+
+def _error_message(response):
+    # OpenAI-style error bodies carry the message under error.message
+    try:
+        return response.json()["error"]["message"]
+    except Exception:
+        return response.text or response.reason
+
+
+def run_coroutine(coroutine):
+    """
+    Run a coroutine to completion from synchronous code. When the calling thread already runs an event
+    loop (e.g. in a notebook), the coroutine runs on its own loop in a helper thread.
+
+    Args:
+        coroutine (Coroutine): The coroutine to run.
+
+    Returns:
+        Any: The result of the coroutine.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
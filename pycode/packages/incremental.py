@@ -0,0 +1,293 @@
+import os
+import re
+import time
+from array import array
+import numpy as np
+import pandas as pd
+from packages.vtt_formatting import iter_vtt_cues, format_milliseconds
+from packages.speaker_stats import SpeakerStats
+from packages.transcript import Transcript
+
+# End of the last complete cue in the bytes read from a growing VTT file: a blank line
+BLANK_LINE_PATTERN = re.compile(rb"\n[ \t\r]*\n")
+
+
+class LiveMeeting:
+    """
+    Analysis of a meeting that is still going on. Cues are appended as they arrive, and speaker statistics,
+    sentiment flags and key cue tokens are updated from the new cues only. Chunks for the abstractive summary
+    are recomputed from the last chunk onwards, and only the chunks that changed are summarized again.
+
+    Args:
+        method (str, optional): Scoring method of the key cues, a key of packages.extractive.METHODS. Defaults to "luhn".
+    """
+
+    def __init__(self, method="luhn"):
+        from packages.extractive import CueTokenizer
+
+        self.method = method
+        self.start_ms = array("q")
+        self.end_ms = array("q")
+        self.speaker_ids = array("i")
+        self.speakers = {}  # Speaker name -> id, in order of first appearance
+        self.texts = []
+
+        # Running statistics, indexed by speaker id
+        self._talk_ms = []
+        self._turns = []
+        self._longest_ms = []
+
+        # Sentiment of every cue and the cues flagged as potential conflicts
+        self.compound = array("d")
+        self.conflicts = []
+
+        self._tokenizer = CueTokenizer()
+
+        # Formatted content not chunked yet, the chunks and the summaries of the chunks, by chunk text
+        self._pending_lines = []
+        self._chunks = []
+        self._summaries = {}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add_cues(self, cues, formatted_lines=None):
+        """
+        Append new cues to the meeting and update the running analyses with them.
+
+        Args:
+            cues (Iterable[tuple]): (start_ms, end_ms, speaker, text) of every new cue, as yielded by iter_vtt_cues.
+            formatted_lines (List[str], optional): Formatted VTT lines of the new cues, as collected by iter_vtt_cues.
+                Rebuilt from the cues when not given.
+
+        Returns:
+            int: Number of cues added.
+        """
+        from packages.sentiment import addresses_other_person, boundary_score
+        from packages.inference_client import sentiment_scores
+
+        cues = list(cues)
+        if not cues:
+            return 0
+
+        first = len(self.texts)
+        new_texts = []
+        for start_ms, end_ms, speaker, text in cues:
+            self.start_ms.append(start_ms)
+            self.end_ms.append(end_ms)
+            self.texts.append(text)
+            new_texts.append(text)
+
+            if speaker is None:
+                self.speaker_ids.append(-1)
+                continue
+            speaker_id = self.speakers.setdefault(speaker, len(self.speakers))
+            if speaker_id == len(self._talk_ms):
+                self._talk_ms.append(0)
+                self._turns.append(0)
+                self._longest_ms.append(0)
+            self.speaker_ids.append(speaker_id)
+            duration = end_ms - start_ms
+            self._talk_ms[speaker_id] += duration
+            self._turns[speaker_id] += 1
+            self._longest_ms[speaker_id] = max(self._longest_ms[speaker_id], duration)
+
+        # Sentiment of the new cues only
+        compound = sentiment_scores(new_texts)
+        self.compound.extend(compound)
+        flagged = np.flatnonzero(addresses_other_person(new_texts) & (compound < boundary_score))
+        self.conflicts.extend((first + flagged).tolist())
+
+        self._tokenizer.add(new_texts)
+
+        if formatted_lines is None:
+            formatted_lines = [line for cue in cues for line in _format_cue(*cue)]
+        self._pending_lines.extend(formatted_lines)
+        return len(cues)
+
+    def transcript(self):
+        """
+        Snapshot of the meeting so far.
+
+        Returns:
+            Transcript: The cues received so far.
+        """
+        return Transcript.from_columns(self.start_ms, self.end_ms, self.speaker_ids, self.speakers, self.texts)
+
+    def stats(self):
+        """
+        Speaker statistics of the meeting so far, from the running totals.
+
+        Returns:
+            SpeakerStats: The per-speaker statistics.
+        """
+        names = list(self.speakers)
+        order = sorted(range(len(names)), key=names.__getitem__)
+        return SpeakerStats(
+            speakers=tuple(names[i] for i in order),
+            talk_ms=np.array(self._talk_ms, dtype=np.int64)[order],
+            turns=np.array(self._turns, dtype=np.int64)[order],
+            longest_ms=np.array(self._longest_ms, dtype=np.int64)[order],
+        )
+
+    def sentiment(self):
+        """
+        Turns flagged as potential conflicts so far, formatted like packages.sentiment.sentiment.
+
+        Returns:
+            List[str]: The flagged turns.
+        """
+        return [f"!!!: {self.texts[cue]}" + "\n" + "\n" for cue in self.conflicts]
+
+    def key_cues(self, count=None):
+        """
+        Key cues of the meeting so far. Tokens are kept from earlier calls; only the vectorized scoring runs
+        over the whole meeting, since the significance of a word changes as the meeting goes on.
+
+        Args:
+            count (int, optional): Number of cues to keep. Defaults to one per 600 words.
+
+        Returns:
+            pd.DataFrame: The key cues, in the layout of extract_key_cues.
+        """
+        from packages.extractive import METHODS, select_key_cues
+
+        tokens = self._tokenizer.tokens()
+        scores = METHODS[self.method](tokens)
+        selected = select_key_cues(scores, len(tokens.term), count)
+
+        names = list(self.speakers)
+        speaker_ids = np.frombuffer(self.speaker_ids, dtype=np.int32)[selected]
+        return pd.DataFrame({
+            "Cue": selected,
+            "Speaker": [names[i] if i >= 0 else None for i in speaker_ids.tolist()],
+            "StartMs": np.frombuffer(self.start_ms, dtype=np.int64)[selected],
+            "EndMs": np.frombuffer(self.end_ms, dtype=np.int64)[selected],
+            "Text": [self.texts[i] for i in selected.tolist()],
+            "Score": scores[selected],
+        })
+
+    def chunks(self, max_tokens=1024):
+        """
+        Chunks of the formatted content so far. Only the last chunk and the content received since the
+        previous call are split again; the earlier chunks are complete and kept as they are.
+
+        Args:
+            max_tokens (int, optional): Maximum number of tokens per chunk. Defaults to 1024.
+
+        Returns:
+            List[str]: The chunks.
+        """
+        from packages.inference_client import split_chunks
+
+        if self._pending_lines:
+            tail = [self._chunks.pop()] if self._chunks else []
+            self._chunks.extend(split_chunks("\n".join(tail + self._pending_lines), max_tokens))
+            self._pending_lines = []
+        return list(self._chunks)
+
+    def abstractive_summary(self, progress=None):
+        """
+        Abstractive summary of the meeting so far, one BART summary per chunk as in
+        batch_abstractive_summarize_chunks. Only new or changed chunks, usually the last one, are summarized.
+
+        Args:
+            progress (Callable[[int, int], None], optional): Called with (chunks done, chunks to summarize).
+
+        Returns:
+            str: The concatenated chunk summaries.
+        """
+        from packages.inference_client import summarize_batch
+
+        chunks = self.chunks()
+        changed = [chunk for chunk in dict.fromkeys(chunks) if chunk not in self._summaries]
+        if changed:
+            self._summaries.update(zip(changed, summarize_batch(changed, progress=progress)))
+        # Forget the summaries of chunks that were split again
+        self._summaries = {chunk: self._summaries[chunk] for chunk in chunks}
+        return " ".join(self._summaries[chunk] for chunk in chunks)
+
+
+def _format_cue(start_ms, end_ms, speaker, text):
+    """
+    Formatted VTT lines of a cue received without its source lines.
+
+    Returns:
+        List[str]: The timing line, the text line and the blank line closing the cue.
+    """
+    text = text if speaker is None else f"<v {speaker}>{text}</v>"
+    return [f"{format_milliseconds(start_ms, 3)} --> {format_milliseconds(end_ms, 3)}", text, ""]
+
+
+class VTTFollower:
+    """
+    Follow a VTT file while it is being written, e.g. by a live captioning tool, and feed the complete cues
+    to a LiveMeeting. Each poll reads only the bytes appended since the previous one; a cue is taken once
+    the blank line closing it has been written. A file that is truncated or replaced, e.g. by log rotation, is
+    read again from the start into a new meeting.
+
+    Args:
+        file_path (str): Path to the growing VTT file.
+        meeting (LiveMeeting, optional): Meeting receiving the cues. A new one is created by default.
+    """
+
+    def __init__(self, file_path, meeting=None):
+        self.file_path = file_path
+        self.meeting = meeting if meeting is not None else LiveMeeting()
+        self.offset = 0  # Bytes of the file already consumed
+        self.inode = None  # Inode of the file the offset refers to
+
+    def poll(self, final=False):
+        """
+        Read the cues completed since the previous poll.
+
+        Args:
+            final (bool, optional): The file is complete; also read a last cue not followed by a blank line.
+                Defaults to False.
+
+        Returns:
+            int: Number of new cues.
+        """
+        if not os.path.exists(self.file_path):
+            return 0
+
+        with open(self.file_path, "rb") as file:
+            # A shorter or different file: the consumed cues are gone, start over
+            stat = os.fstat(file.fileno())
+            if stat.st_size < self.offset or (self.inode is not None and stat.st_ino != self.inode):
+                self.meeting = LiveMeeting(self.meeting.method)
+                self.offset = 0
+            self.inode = stat.st_ino
+            file.seek(self.offset)
+            data = file.read()
+
+        # Stop at the last blank line; a cue still being written is read at a later poll
+        end = len(data) if final else 0
+        for match in BLANK_LINE_PATTERN.finditer(data):
+            end = max(end, match.end())
+        if not end:
+            return 0
+        complete = data[:end]
+        self.offset += len(complete)
+
+        formatted_lines = []
+        lines = complete.decode("utf-8-sig" if self.offset == len(complete) else "utf-8").splitlines()
+        cues = list(iter_vtt_cues(lines, formatted_lines))
+        return self.meeting.add_cues(cues, formatted_lines)
+
+    def follow(self, interval=5.0, stop=None):
+        """
+        Poll the file until `stop` returns True, yielding the meeting after every update.
+
+        Args:
+            interval (float, optional): Seconds between two polls. Defaults to 5.
+            stop (Callable[[], bool], optional): Checked before every poll. Follows forever by default.
+
+        Yields:
+            LiveMeeting: The meeting, each time new cues were added.
+        """
+        while stop is None or not stop():
+            if self.poll():
+                yield self.meeting
+            else:
+                time.sleep(interval)
@@ -0,0 +1,161 @@
+import os
+import numpy as np
+from packages.models import get_or_load
+
+# URL of a running inference service, e.g. "http://127.0.0.1:8765". Models are loaded in-process when unset
+SERVICE_URL = os.environ.get("MEETINSIGHT_SERVICE_URL")
+
+
+class InferenceClient:
+    """
+    Client of the inference service started by server.py, over a pooled HTTPClient.
+
+    Args:
+        base_url (str): URL of the service.
+        timeout (float or tuple, optional): Connect and read timeouts in seconds. Generation on CPU is slow,
+            so the read timeout is long. Defaults to (10, 600).
+    """
+
+    def __init__(self, base_url, timeout=(10, 600)):
+        from packages.http_client import HTTPClient
+        self.http = HTTPClient(base_url, timeout=timeout)
+
+    def summarize(self, texts, max_length=20, min_length=10, num_beams=4):
+        """
+        Summarize texts with the BART model of the service.
+
+        Returns:
+            List[str]: The summaries, in the order of `texts`.
+        """
+        response = self.http.post_json("/summarize", {"texts": list(texts), "max_length": max_length,
+                                                      "min_length": min_length, "num_beams": num_beams})
+        return response["summaries"]
+
+    def model_name(self):
+        """
+        Cache name of the summarization model of the service, which depends on the preset it was started with.
+
+        Returns:
+            str: The name, e.g. "facebook/bart-large-cnn-int8".
+        """
+        return self.http.get_json("/health")["model"]
+
+    def score_turns(self, texts):
+        """
+        Compute the VADER compound score of every turn.
+
+        Returns:
+            np.ndarray: The compound score of each turn.
+        """
+        response = self.http.post_json("/sentiment", {"texts": [str(text) for text in texts]})
+        return np.asarray(response["scores"], dtype=np.float64)
+
+    def split_text_into_chunks(self, text, max_tokens=1024):
+        """
+        Split a text into chunks of at most `max_tokens` BART tokens.
+
+        Returns:
+            List[str]: The chunks.
+        """
+        return self.http.post_json("/chunk", {"text": text, "max_tokens": max_tokens})["chunks"]
+
+
+def get_service():
+    """
+    Shared client of the service set by MEETINSIGHT_SERVICE_URL.
+
+    Returns:
+        InferenceClient or None: The client, None when no service is configured.
+    """
+    if not SERVICE_URL:
+        return None
+    return get_or_load('inference_service', lambda: InferenceClient(SERVICE_URL))
+
+
+def summarize_batch(chunks, batch_size=8, num_beams=4, max_length=20, min_length=10, progress=None, config=None):
+    """
+    Summarize chunks with abstractive_summarize_batch, run by the inference service when one is configured.
+
+    Args:
+        chunks (List[str]): List of text chunks to be summarized.
+        batch_size (int, optional): Chunks per generate call when running locally. Defaults to 8.
+        num_beams (int, optional): Number of beams used by beam search. Defaults to 4.
+        max_length (int, optional): Maximum length of each summary in tokens. Defaults to 20.
+        min_length (int, optional): Minimum length of each summary in tokens. Defaults to 10.
+        progress (Callable[[int, int], None], optional): Called with (chunks done, total chunks).
+        config (InferenceConfig, optional): Inference settings when running locally; the service uses its own.
+
+    Returns:
+        List[str]: The summary of each chunk, in the order of `chunks`.
+    """
+    service = get_service()
+    if service is None:
+        from packages.summaries import abstractive_summarize_batch
+        return abstractive_summarize_batch(chunks, batch_size=batch_size, num_beams=num_beams,
+                                           max_length=max_length, min_length=min_length, progress=progress,
+                                           config=config)
+
+    # The service batches the chunks itself, with those of the other clients
+    summaries = service.summarize(chunks, max_length=max_length, min_length=min_length, num_beams=num_beams)
+    if progress is not None:
+        progress(len(chunks), len(chunks))
+    return summaries
+
+
+def summary_model_name(config=None):
+    """
+    Name of the model summarize_batch runs, to put in the cache keys of the summaries: the one of the inference
+    service when one is configured, since the service runs its own preset.
+
+    Args:
+        config (InferenceConfig, optional): Inference settings when running locally. Defaults to the preset
+            selected by MEETINSIGHT_INFERENCE.
+
+    Returns:
+        str: The cache name of the model.
+    """
+    service = get_service()
+    if service is None:
+        from packages.summaries import default_config
+        return (config or default_config()).cache_name
+    return service.model_name()
+
+
+def split_chunks(text, max_tokens=1024):
+    """
+    Split a text with split_text_into_chunks, run by the inference service when one is configured.
+
+    Args:
+        text (str): The input text.
+        max_tokens (int, optional): Maximum number of tokens per chunk. Defaults to 1024.
+
+    Returns:
+        List[str]: The chunks.
+    """
+    service = get_service()
+    if service is None:
+        from packages.chunk_splitter import split_text_into_chunks
+        return split_text_into_chunks(text, max_tokens)
+    return service.split_text_into_chunks(text, max_tokens)
+
+
+def sentiment_scores(texts, workers=1):
+    """
+    Score turns with score_turns, run by the inference service when one is configured. Otherwise, with
+    several workers, long transcripts are sharded across a pool of processes by score_turns_parallel.
+
+    Args:
+        texts (Iterable[str]): The turns of the conversation.
+        workers (int, optional): Worker processes scoring the turns locally; 0 uses every CPU. Defaults to 1.
+
+    Returns:
+        np.ndarray: The compound score of each turn.
+    """
+    service = get_service()
+    if service is None:
+        from packages.sentiment import score_turns, score_turns_parallel, PARALLEL_MIN_TURNS
+        texts = list(texts)
+        if workers != 1 and len(texts) >= PARALLEL_MIN_TURNS:
+            return score_turns_parallel(texts, workers=workers or None)
+        return score_turns(texts)
+    return service.score_turns(texts)
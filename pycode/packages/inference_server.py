@@ -0,0 +1,243 @@
+import json
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Address the service listens on by default; local only, the service has no authentication
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class DynamicBatcher:
+    """
+    Group the items submitted concurrently by many threads into batched calls run by a single worker thread.
+    The worker waits at most `max_delay` seconds after the first item for others to join it, so a lone request
+    is barely delayed while concurrent requests share one call. Items are only batched with items submitted
+    with the same key, e.g. the same generation settings.
+
+    Args:
+        function (Callable[[list, ...], list]): Processes a list of items, called as function(items, *key), and
+            returns one result per item.
+        max_batch_size (int, optional): Largest number of items per call. Defaults to 8.
+        max_delay (float, optional): Seconds waited for more items once one has arrived. Defaults to 0.05.
+    """
+
+    def __init__(self, function, max_batch_size=8, max_delay=0.05):
+        self.function = function
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.batches = 0  # Calls made so far
+        self.items = 0  # Items processed so far
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, items, key=()):
+        """
+        Process items, batched with the items of other callers, and wait for their results.
+
+        Args:
+            items (list): The items.
+            key (tuple, optional): Extra arguments of the function; only items with equal keys are batched together.
+
+        Returns:
+            list: The result of each item.
+
+        Raises:
+            Exception: Any error raised by the function for the batch holding the items.
+        """
+        futures = [Future() for _ in items]
+        for item, future in zip(items, futures):
+            self._queue.put((key, item, future))
+        return [future.result() for future in futures]
+
+    def close(self):
+        """
+        Stop the worker thread once the items already submitted are processed.
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first):
+        # Take the items arriving within max_delay of the first one, up to a full batch
+        entries = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(entries) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if entry is None:
+                # Leave the stop signal for the main loop
+                self._queue.put(None)
+                break
+            entries.append(entry)
+        return entries
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            groups = {}
+            for key, item, future in self._collect(first):
+                groups.setdefault(key, []).append((item, future))
+
+            for key, group in groups.items():
+                try:
+                    results = self.function([item for item, _ in group], *key)
+                except Exception as error:
+                    for _, future in group:
+                        future.set_exception(error)
+                    continue
+                self.batches += 1
+                self.items += len(group)
+                for (_, future), result in zip(group, results):
+                    future.set_result(result)
+
+
+class InferenceServer(ThreadingHTTPServer):
+    """
+    HTTP service owning the models once for every client on the machine. Each request is handled on its
+    own thread; summarization requests meet in a DynamicBatcher, so concurrent clients share generate calls.
+
+    Endpoints (JSON in, JSON out):
+        POST /summarize: {"texts", "max_length", "min_length", "num_beams"} -> {"summaries", "model"}
+        POST /sentiment: {"texts"} -> {"scores"}
+        POST /chunk: {"text", "max_tokens"} -> {"chunks"}
+        GET /health: {"status", "batches", "items", "model"}
+
+    "model" is the cache name of the summarization model, which clients put in the keys of the summaries.
+
+    Args:
+        address (tuple): Host and port to listen on.
+        batch_size (int, optional): Largest number of texts per generate call. Defaults to 8.
+        max_delay (float, optional): Seconds a request waits for others to share its batch. Defaults to 0.05.
+        config (InferenceConfig, optional): Model, quantization and threads. Defaults to the preset selected by
+            MEETINSIGHT_INFERENCE.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, batch_size=8, max_delay=0.05, config=None):
+        from packages.summaries import default_config
+
+        super().__init__(address, InferenceRequestHandler)
+        self.config = config or default_config()
+        self.batcher = DynamicBatcher(self._summarize, batch_size, max_delay)
+
+    def _summarize(self, texts, max_length, min_length, num_beams):
+        from packages.summaries import abstractive_summarize_batch
+        return abstractive_summarize_batch(texts, batch_size=len(texts), num_beams=num_beams,
+                                           max_length=max_length, min_length=min_length, config=self.config)
+
+    def summarize(self, payload):
+        key = (int(payload.get("max_length", 20)), int(payload.get("min_length", 10)), int(payload.get("num_beams", 4)))
+        return {"summaries": self.batcher.submit(list(payload["texts"]), key), "model": self.config.cache_name}
+
+    def sentiment(self, payload):
+        from packages.sentiment import score_turns
+        return {"scores": score_turns(payload["texts"]).tolist()}
+
+    def chunk(self, payload):
+        from packages.chunk_splitter import split_text_into_chunks
+        # The chunker and the batcher thread share the fast tokenizer; both take its lock around every call
+        return {"chunks": split_text_into_chunks(payload["text"], int(payload.get("max_tokens", 1024)))}
+
+    def health(self):
+        return {"status": "ok", "batches": self.batcher.batches, "items": self.batcher.items,
+                "model": self.config.cache_name}
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """
+    Route the requests of an InferenceServer. Errors are answered with an OpenAI-style {"error": {"message"}} body.
+    """
+    routes = {
+        "/summarize": "summarize",
+        "/sentiment": "sentiment",
+        "/chunk": "chunk",
+    }
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._reply(200, self.server.health())
+        else:
+            self._error(404, f"Unknown path {self.path}")
+
+    def do_POST(self):
+        route = self.routes.get(self.path)
+        if route is None:
+            self._error(404, f"Unknown path {self.path}")
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as error:
+            self._error(400, f"Invalid JSON body: {error}")
+            return
+
+        try:
+            self._reply(200, getattr(self.server, route)(payload))
+        except (KeyError, TypeError) as error:
+            self._error(400, f"Invalid request: {error!r}")
+        except Exception as error:
+            self._error(500, f"{type(error).__name__}: {error}")
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status, message):
+        self._reply(status, {"error": {"message": message}})
+
+    def log_message(self, format, *args):
+        # Requests are too frequent to be logged one by one
+        pass
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, batch_size=8, max_delay=0.05, preload=True, config=None):
+    """
+    Run the inference service until interrupted.
+
+    Args:
+        host (str, optional): Interface to listen on. Defaults to 127.0.0.1.
+        port (int, optional): Port to listen on. Defaults to 8765.
+        batch_size (int, optional): Largest number of texts per generate call. Defaults to 8.
+        max_delay (float, optional): Seconds a request waits for others to share its batch. Defaults to 0.05.
+        preload (bool, optional): Load the models before accepting requests. Defaults to True.
+        config (InferenceConfig, optional): Model, quantization and threads. Defaults to the preset selected by
+            MEETINSIGHT_INFERENCE.
+    """
+    from packages.summaries import default_config
+
+    config = config or default_config()
+    if preload:
+        from packages.models import get_summarization_model, get_tokenizer, get_sentiment_analyzer
+        get_tokenizer()
+        get_tokenizer(config.model_name)
+        get_summarization_model(config.model_name, config.quantize)
+        get_sentiment_analyzer()
+
+    server = InferenceServer((host, port), batch_size, max_delay, config)
+    print(f"Inference service listening on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,339 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import contextvars
+from functools import wraps
+from contextlib import contextmanager
+
+# JSON lines file receiving one event per traced stage, "-" for stderr. Tracing is off when neither this
+# nor MEETINSIGHT_METRICS is set
+TRACE_PATH = os.environ.get("MEETINSIGHT_TRACE")
+
+# OpenMetrics text file receiving the per-stage totals when the process exits, and after every task of a worker
+# process (see write_metrics). "{pid}" in the path is replaced by the process id, so that the worker processes of
+# the batch engine each write their own file
+METRICS_PATH = os.environ.get("MEETINSIGHT_METRICS")
+
+# Prefix of the metric names
+METRIC_PREFIX = "meetinsight_stage"
+
+# Labels added to every event of the current context, e.g. the meeting being processed
+_labels = contextvars.ContextVar("instrumentation_labels", default={})
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes():
+    """
+    Current resident set size of the process. Read from /proc on Linux; elsewhere the peak RSS is used,
+    so memory deltas only show growth past the previous peak.
+
+    Returns:
+        int: The RSS in bytes.
+    """
+    try:
+        with open("/proc/self/statm", "rb") as file:
+            return int(file.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Recorder:
+    """
+    Collect the events of the traced stages: each event is appended to the trace file as a JSON line, and
+    per-stage totals are kept for the OpenMetrics export. Thread-safe.
+
+    Args:
+        trace_path (str, optional): JSON lines file receiving the events, "-" for stderr. No trace when None.
+        metrics_path (str, optional): File receiving the OpenMetrics totals on write_metrics().
+    """
+
+    def __init__(self, trace_path=None, metrics_path=None):
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.totals = {}  # Stage -> [count, seconds, max seconds, input size, RSS delta]
+        self._lock = threading.Lock()
+        self._file = None
+        if trace_path == "-":
+            self._file = sys.stderr
+        elif trace_path:
+            os.makedirs(os.path.dirname(os.path.abspath(trace_path)), exist_ok=True)
+            self._file = open(trace_path, "a", encoding="utf-8", buffering=1)
+
+    def record(self, event):
+        """
+        Record the event of a finished stage.
+
+        Args:
+            event (dict): Holds at least 'stage', 'seconds', 'size' and 'rss_delta_bytes'.
+        """
+        line = json.dumps(event, default=str) if self._file is not None else None
+        with self._lock:
+            totals = self.totals.setdefault(event["stage"], [0, 0.0, 0.0, 0, 0])
+            totals[0] += 1
+            totals[1] += event["seconds"]
+            totals[2] = max(totals[2], event["seconds"])
+            totals[3] += event["size"] or 0
+            totals[4] += event["rss_delta_bytes"]
+            if line is not None:
+                self._file.write(line + "\n")
+
+    def metrics(self):
+        """
+        Per-stage totals in the OpenMetrics text format.
+
+        Returns:
+            str: The exposition, ending with '# EOF'.
+        """
+        with self._lock:
+            totals = {stage: list(values) for stage, values in sorted(self.totals.items())}
+
+        families = [
+            ("seconds", "summary", "Wall time of the stage", lambda values: [("_count", values[0]), ("_sum", values[1])]),
+            ("max_seconds", "gauge", "Longest run of the stage", lambda values: [("", values[2])]),
+            ("input_size", "counter", "Items processed by the stage: cues, texts, tokens or bytes", lambda values: [("_total", values[3])]),
+            ("rss_delta_bytes", "gauge", "Net change of the resident set size over every run of the stage", lambda values: [("", values[4])]),
+        ]
+        lines = []
+        for name, kind, help_text, samples in families:
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {metric} {help_text}.")
+            lines.append(f"# TYPE {metric} {kind}")
+            for stage, values in totals.items():
+                label = stage.replace("\\", "\\\\").replace('"', '\\"')
+                for suffix, value in samples(values):
+                    lines.append(f'{metric}{suffix}{{stage="{label}"}} {value}')
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path=None):
+        """
+        Write the OpenMetrics totals, replacing the previous export.
+
+        Args:
+            path (str, optional): Target file. Defaults to the metrics path of the recorder.
+        """
+        path = path or self.metrics_path
+        if not path:
+            return
+        path = path.replace("{pid}", str(os.getpid()))
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.write(self.metrics())
+        os.replace(temporary, path)
+
+    def close(self):
+        """
+        Write the metrics and close the trace file.
+        """
+        self.write_metrics()
+        if self._file is not None and self._file is not sys.stderr:
+            self._file.close()
+        self._file = None
+
+
+# Active recorder, None when tracing is disabled
+_recorder = None
+
+
+def enable(trace_path=None, metrics_path=None):
+    """
+    Start recording the traced stages. The previous recorder, if any, is closed first.
+
+    Args:
+        trace_path (str, optional): JSON lines file receiving the events, "-" for stderr.
+        metrics_path (str, optional): File receiving the OpenMetrics totals when tracing stops or the process exits.
+
+    Returns:
+        Recorder: The active recorder.
+    """
+    global _recorder
+    disable()
+    _recorder = Recorder(trace_path, metrics_path)
+    return _recorder
+
+
+def disable():
+    """
+    Stop recording; the metrics of the active recorder are written and its trace file closed.
+    """
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is not None:
+        recorder.close()
+
+
+def enabled():
+    """Whether the traced stages are being recorded."""
+    return _recorder is not None
+
+
+def write_metrics():
+    """
+    Write the OpenMetrics totals of the active recorder now, if any.
+    """
+    recorder = _recorder
+    if recorder is not None:
+        recorder.write_metrics()
+
+
+def worker_task(function):
+    """
+    Decorator for the functions run as tasks of a process pool, e.g. by the batch engine: the metrics are
+    written when each task ends. Pool workers exit through os._exit, which skips atexit, so their totals
+    would otherwise never be written.
+
+    Returns:
+        Callable: The decorated function.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        try:
+            return function(*args, **kwargs)
+        finally:
+            write_metrics()
+    return wrapper
+
+
+def _after_fork():
+    # A forked worker starts with the totals of its parent, already counted in the parent's file, and writes
+    # its own file: "{pid}" is added to a metrics path without it, so the parent's file is not overwritten
+    recorder = _recorder
+    if recorder is not None:
+        recorder.totals = {}
+        recorder._lock = threading.Lock()
+        if recorder.metrics_path and "{pid}" not in recorder.metrics_path:
+            root, extension = os.path.splitext(recorder.metrics_path)
+            recorder.metrics_path = f"{root}-{{pid}}{extension}"
+
+
+class _Span:
+    __slots__ = ("stage", "size", "labels", "start", "rss")
+
+    def __init__(self, stage, size, labels):
+        self.stage = stage
+        self.size = size
+        self.labels = labels
+
+    def __enter__(self):
+        self.rss = rss_bytes()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        seconds = time.perf_counter() - self.start
+        recorder = _recorder
+        if recorder is None:
+            return False
+        rss = rss_bytes()
+        event = {
+            "time": time.time(),
+            "stage": self.stage,
+            "seconds": seconds,
+            "size": self.size,
+            "rss_bytes": rss,
+            "rss_delta_bytes": rss - self.rss,
+            "thread": threading.current_thread().name,
+            **_labels.get(),
+            **self.labels,
+        }
+        if exc_type is not None:
+            event["error"] = exc_type.__name__
+        recorder.record(event)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+    size = None
+
+    def __setattr__(self, name, value):
+        # Sizes set on a disabled span are dropped
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(stage, size=None, **labels):
+    """
+    Context manager timing a stage, with the input size and the change in RSS. When tracing is disabled,
+    a shared no-op context is returned, so instrumented code only pays for this call.
+    The size can also be set on the returned span once it is known, e.g. `with span("parse") as s: ... s.size = n`.
+
+    Args:
+        stage (str): Name of the stage, e.g. "model.generate".
+        size (int, optional): Items processed: cues, texts, tokens or bytes.
+        **labels: Extra fields of the event.
+
+    Returns:
+        A context manager.
+    """
+    if _recorder is None:
+        return _NULL_SPAN
+    return _Span(stage, size, labels)
+
+
+def traced(stage=None, size=None):
+    """
+    Decorator tracing every call of a function as a span.
+
+    Args:
+        stage (str, optional): Name of the stage. Defaults to the qualified name of the function.
+        size (Callable, optional): Computes the input size from the arguments of the call, e.g. `lambda chunks, **_: len(chunks)`.
+
+    Returns:
+        Callable: The decorator.
+    """
+    def decorator(function):
+        name = stage or f"{function.__module__}.{function.__qualname__}"
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return function(*args, **kwargs)
+            with _Span(name, size(*args, **kwargs) if size is not None else None, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def labelled(**values):
+    """
+    Add labels, such as the meeting being processed, to every event recorded inside the block on the
+    current thread.
+
+    Args:
+        **values: The labels, e.g. meeting="standup.vtt".
+    """
+    if _recorder is None:
+        yield
+        return
+    token = _labels.set({**_labels.get(), **values})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+if TRACE_PATH or METRICS_PATH:
+    enable(TRACE_PATH, METRICS_PATH)
+
+# Flush the metrics of whatever recorder is active at exit
+atexit.register(disable)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
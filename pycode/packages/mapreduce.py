@@ -0,0 +1,212 @@
+from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from packages.inference_client import split_chunks
+from packages.openai import PROMPT_TOKENS
+
+
+class SummaryBackend:
+    """
+    Summarization engine plugged into MapReduceSummarizer. Subclasses implement summarize_one, or
+    summarize_many when the engine can process several texts at once more efficiently.
+
+    Attributes:
+        name (str): Name of the backend, also used in cache keys.
+        max_input_tokens (int): Longest input, in BART tokens, the backend accepts in one call.
+        max_workers (int): Texts summarized concurrently by the default summarize_many.
+    """
+    name = "backend"
+    max_input_tokens = 1024
+    max_workers = 4
+
+    def summarize_one(self, text: str, words: int, partial: bool = False) -> str:
+        """
+        Summarize a single text.
+
+        Args:
+            text (str): Text to summarize, at most `max_input_tokens` long.
+            words (int): Target length of the summary in words.
+            partial (bool, optional): True when the text is made of summaries of consecutive parts of a meeting.
+
+        Returns:
+            str: The summary.
+        """
+        raise NotImplementedError
+
+    def summarize_many(self, texts: List[str], words: int, partial: bool = False, progress=None) -> List[str]:
+        """
+        Summarize several texts in parallel on a thread pool.
+
+        Args:
+            texts (List[str]): Texts to summarize.
+            words (int): Target length of each summary in words.
+            partial (bool, optional): True when the texts are made of partial summaries.
+            progress (Callable[[int, int], None], optional): Called with (texts done, total texts).
+
+        Returns:
+            List[str]: The summaries, in the order of `texts`.
+        """
+        summaries = [None] * len(texts)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.summarize_one, text, words, partial) for text in texts]
+            for i, future in enumerate(futures):
+                summaries[i] = future.result()
+                if progress is not None:
+                    progress(i + 1, len(texts))
+        return summaries
+
+
+class BartBackend(SummaryBackend):
+    """
+    BART-large-cnn summaries. Each map level runs as padded batches of generate calls, in this process or in
+    the inference service set by MEETINSIGHT_SERVICE_URL.
+
+    Args:
+        batch_size (int, optional): Texts per generate call. Defaults to 8.
+        num_beams (int, optional): Number of beams used by beam search. Defaults to 4.
+        config (InferenceConfig, optional): Model, quantization and threads used in this process. Defaults to
+            the preset selected by MEETINSIGHT_INFERENCE.
+    """
+    name = "bart"
+    max_input_tokens = 1024
+
+    def __init__(self, batch_size=8, num_beams=4, config=None):
+        self.batch_size = batch_size
+        self.num_beams = num_beams
+        self.config = config
+
+    def summarize_many(self, texts, words, partial=False, progress=None):
+        from packages.inference_client import summarize_batch
+
+        # Roughly 4 tokens for 3 words, bounded by what BART can generate
+        max_length = min(1024, int(words * 4 / 3) + 10)
+        return summarize_batch(texts, batch_size=self.batch_size, num_beams=self.num_beams,
+                               max_length=max_length, min_length=min(max_length, max(10, words // 2)),
+                               progress=progress, config=self.config)
+
+    def summarize_one(self, text, words, partial=False):
+        return self.summarize_many([text], words, partial)[0]
+
+
+class LuhnBackend(SummaryBackend):
+    """
+    Extractive summaries with the Luhn heuristic: the highest scoring sentences are kept until the
+    word budget is reached.
+    """
+    name = "luhn"
+    max_input_tokens = 4096
+
+    def summarize_one(self, text, words, partial=False):
+        from sumy.parsers.plaintext import PlaintextParser
+        from sumy.nlp.tokenizers import Tokenizer
+        from sumy.summarizers.luhn import LuhnSummarizer
+
+        document = PlaintextParser.from_string(text, Tokenizer("english")).document
+        if not document.sentences:
+            return ""
+
+        # Ask for as many sentences as the word budget allows at the average sentence length
+        average_words = max(1, len(text.split()) / len(document.sentences))
+        sentences_count = max(1, round(words / average_words))
+        summary = LuhnSummarizer()(document, sentences_count)
+        return ' '.join(sentence._text for sentence in summary)
+
+
+class OpenAIBackend(SummaryBackend):
+    """
+    Summaries from the OpenAI chat API. Each map level is sent as concurrent requests.
+    """
+    name = "openai"
+    max_input_tokens = PROMPT_TOKENS
+
+    def summarize_many(self, texts, words, partial=False, progress=None):
+        from packages.openai import get_client, chat_payload, chat_content, MAX_CONCURRENCY
+
+        if partial:
+            prompt = "These are summaries of consecutive parts of one meeting. Combine them into a single summary of the meeting in {words} words:\n\n{text}"
+        else:
+            prompt = "Summarize this meeting in {words} words:\n\n{text}"
+
+        payloads = [chat_payload(prompt.format(words=words, text=text)) for text in texts]
+        responses = get_client().post_many("/chat/completions", payloads, max_concurrency=MAX_CONCURRENCY)
+        if progress is not None:
+            progress(len(texts), len(texts))
+        return [chat_content(response) for response in responses]
+
+    def summarize_one(self, text, words, partial=False):
+        return self.summarize_many([text], words, partial)[0]
+
+
+# Backends selectable by name
+BACKENDS = {
+    "bart": BartBackend,
+    "luhn": LuhnBackend,
+    "openai": OpenAIBackend,
+}
+
+
+class MapReduceSummarizer:
+    """
+    Hierarchical summarizer for transcripts longer than the context of the model. The map step
+    summarizes every chunk in parallel; the reduce step groups the partial summaries into chunks that
+    fit the model and summarizes them again, level after level, until the summary fits the target length.
+    Only one level of summaries is held at a time, so memory stays bounded whatever the meeting length.
+
+    Args:
+        backend (SummaryBackend or str): Engine producing the summaries, or the name of one in BACKENDS.
+        target_words (int, optional): Length of the final summary in words, e.g. the GUI slider value. Defaults to 100.
+        min_chunk_words (int, optional): Smallest summary requested for a chunk. Defaults to 30.
+        max_levels (int, optional): Maximum number of reduce levels. Defaults to 6.
+    """
+
+    def __init__(self, backend="bart", target_words=100, min_chunk_words=30, max_levels=6):
+        self.backend = BACKENDS[backend]() if isinstance(backend, str) else backend
+        self.target_words = int(target_words)
+        self.min_chunk_words = min_chunk_words
+        self.max_levels = max_levels
+
+    def summarize(self, text: str, progress=None) -> str:
+        """
+        Summarize a transcript of any length.
+
+        Args:
+            text (str): The transcript.
+            progress (Callable[[int, int], None], optional): Called with (texts done, total texts) within each level.
+
+        Returns:
+            str: The summary.
+        """
+        return self.summarize_chunks(split_chunks(text, self.backend.max_input_tokens), progress)
+
+    def summarize_chunks(self, chunks: List[str], progress=None) -> str:
+        """
+        Summarize a transcript already split into chunks that fit the backend.
+
+        Args:
+            chunks (List[str]): Chunks of the transcript, e.g. from split_text_into_chunks.
+            progress (Callable[[int, int], None], optional): Called with (texts done, total texts) within each level.
+
+        Returns:
+            str: The summary.
+        """
+        if not chunks:
+            return ""
+
+        texts = chunks
+        for level in range(self.max_levels + 1):
+            # A single text is summarized straight to the target length
+            if len(texts) == 1:
+                return self.backend.summarize_many(texts, self.target_words, level > 0, progress)[0]
+
+            # Map: share the word budget between the texts of this level
+            words = max(self.min_chunk_words, self.target_words // len(texts))
+            summaries = self.backend.summarize_many(texts, words, level > 0, progress)
+            combined = "\n".join(summaries)
+
+            if len(combined.split()) <= self.target_words:
+                return combined
+
+            # Reduce: group the partial summaries into inputs that fit the backend
+            texts = split_chunks(combined, self.backend.max_input_tokens)
+
+        # Out of levels: return the last level as it is
+        return combined
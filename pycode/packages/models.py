@@ -0,0 +1,144 @@
+import threading
+
+# Checkpoint used for tokenization and abstractive summarization
+MODEL_NAME = 'facebook/bart-large-cnn'
+
+# Distilled BART-large-cnn (12 encoder, 6 decoder layers), faster on CPU with the same tokenizer
+DISTILLED_MODEL_NAME = 'sshleifer/distilbart-cnn-12-6'
+
+# Sentence embedding model: small (6 layers, 384 dimensions) and fast enough to embed an archive on CPU
+EMBEDDING_MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+
+_registry = {}  # Loaded objects, keyed by name
+_locks = {}  # One lock per key, so loading a model does not block loading another
+_registry_lock = threading.Lock()  # Guards the creation of the per-key locks
+
+
+def get_or_load(key, loader):
+    """
+    Return the object registered under `key`, loading it with `loader` on first use. Loading happens
+    once even if several threads ask for the same key at the same time.
+
+    Args:
+        key (Hashable): Name of the object in the registry.
+        loader (Callable[[], Any]): Function building the object.
+
+    Returns:
+        Any: The shared instance.
+    """
+    # Fast path once the object is loaded
+    if key in _registry:
+        return _registry[key]
+
+    with _registry_lock:
+        lock = _locks.setdefault(key, threading.Lock())
+
+    with lock:
+        # Another thread may have loaded it while we were waiting
+        if key not in _registry:
+            _registry[key] = loader()
+    return _registry[key]
+
+
+def clear(key=None):
+    """
+    Drop one or all loaded objects from the registry, releasing their memory once no caller holds them.
+
+    Args:
+        key (Hashable, optional): Name of the object to drop. Drops everything when omitted.
+    """
+    with _registry_lock:
+        if key is None:
+            _registry.clear()
+        else:
+            _registry.pop(key, None)
+
+
+def get_tokenizer(name: str = MODEL_NAME):
+    """
+    Shared fast (Rust-backed) BART tokenizer, loaded on first use.
+
+    Args:
+        name (str, optional): Checkpoint of the tokenizer. Defaults to MODEL_NAME.
+
+    Returns:
+        transformers.BartTokenizerFast: The tokenizer instance shared by every module.
+    """
+    def load():
+        from transformers import BartTokenizerFast
+        return BartTokenizerFast.from_pretrained(name)
+
+    return get_or_load(('tokenizer', name), load)
+
+
+def tokenizer_lock(name: str = MODEL_NAME):
+    """
+    Lock shared by every user of the tokenizer of `name`. A fast tokenizer sets its truncation and padding
+    state on each call and raises "Already borrowed" when two threads call it at once, so calls from threads
+    that may run concurrently, such as those of the inference service, are made while holding it.
+
+    Args:
+        name (str, optional): Checkpoint of the tokenizer. Defaults to MODEL_NAME.
+
+    Returns:
+        threading.Lock: The lock of the tokenizer.
+    """
+    return get_or_load(('tokenizer_lock', name), threading.Lock)
+
+
+def get_summarization_model(name: str = MODEL_NAME, quantized: bool = False):
+    """
+    Shared BART summarization model, loaded on first use.
+
+    Args:
+        name (str, optional): Checkpoint of the model. Defaults to MODEL_NAME.
+        quantized (bool, optional): Apply dynamic int8 quantization to the linear layers. Quantized models
+            run on CPU only. Defaults to False.
+
+    Returns:
+        transformers.BartForConditionalGeneration: The model instance shared by every module.
+    """
+    def load():
+        from transformers import BartForConditionalGeneration
+        model = BartForConditionalGeneration.from_pretrained(name)
+        model.eval()
+        if quantized:
+            import torch
+            # int8 weights for the linear layers, activations quantized on the fly at each call
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    return get_or_load(('model', name, 'int8') if quantized else ('model', name), load)
+
+
+def get_embedding_model(name: str = EMBEDDING_MODEL_NAME):
+    """
+    Shared sentence embedding model and its fast tokenizer, loaded on first use.
+
+    Args:
+        name (str, optional): Checkpoint of the model. Defaults to EMBEDDING_MODEL_NAME.
+
+    Returns:
+        tuple: The transformers tokenizer and model (AutoTokenizer, AutoModel), the model in eval mode.
+    """
+    def load():
+        from transformers import AutoTokenizer, AutoModel
+        model = AutoModel.from_pretrained(name)
+        model.eval()
+        return AutoTokenizer.from_pretrained(name), model
+
+    return get_or_load(('embedding', name), load)
+
+
+def get_sentiment_analyzer():
+    """
+    Shared VADER sentiment analyzer, loaded on first use.
+
+    Returns:
+        nltk.sentiment.SentimentIntensityAnalyzer: The analyzer instance.
+    """
+    def load():
+        from nltk.sentiment import SentimentIntensityAnalyzer
+        return SentimentIntensityAnalyzer()
+
+    return get_or_load('sentiment', load)
@@ -1,98 +1,170 @@
 import os
-import requests
+from packages.http_client import HTTPClient, APIError
+from packages.models import get_or_load
 
 # Load your API key from an environment variable or config file
-API_KEY = os.environ["OPENAI_API_KEY"]
+API_KEY = os.environ.get("OPENAI_API_KEY")
 
-import requests
+# Endpoint of the API, overridable to go through a proxy or a local stub server
+BASE_URL = os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1")
 
-def summarize_text(text, tokens = 100):
-    """
-    Utilize the OpenAI API to generate a summary of the provided text. This function makes an HTTP POST request
-    to the OpenAI API endpoint to process the text summarization task.
+# Chat model used for summaries and key points
+MODEL = "gpt-3.5-turbo"
 
-    Args:
-        text (str): The text to be summarized, typically extracted from a VTT file or similar content.
+# Transcript tokens sent in a single prompt. Longer transcripts are processed chunk by chunk
+PROMPT_TOKENS = 3000
+
+# Chunk prompts sent to the API at the same time
+MAX_CONCURRENCY = 4
+
+
+def get_client():
+    """
+    Shared HTTP client for the OpenAI API, created on first use so that importing this module
+    does not require an API key.
 
     Returns:
-        str: The summarized text as returned by the OpenAI model, or None if an error occurs.
+        HTTPClient: The client, pooling its connections across calls.
     """
-    # Define the API endpoint and authorization headers
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {API_KEY}"
-    }
-    # print(int(tokens))d
+    def load():
+        if not API_KEY:
+            raise RuntimeError("The OPENAI_API_KEY environment variable is not set.")
+        return HTTPClient(BASE_URL, headers={"Authorization": f"Bearer {API_KEY}"})
+
+    return get_or_load('openai_client', load)
+
+
+def chat_payload(prompt):
     # Construct the data payload for the API request
-    data = {
-        "model": "gpt-3.5-turbo",
-        "messages": [{"role": "user", "content": f"Summarize this meeting in {str(int(tokens))} words:\n\n{text}"}],
+    return {
+        "model": MODEL,
+        "messages": [{"role": "user", "content": prompt}],
         # "max_tokens": int(tokens),  # Set the maximum length of the summary
         "n": 1,  # Number of responses to generate
         "stop": None,  # Optional stopping character or sequence
         "temperature": 0.5,  # Sampling temperature
     }
 
-    # Execute the POST request with the prepared headers and data
-    response = requests.post(url, headers=headers, json=data)
 
-    # Handle the response
-    if response.status_code == 200:
-        # Parse the JSON response to extract the summary
-        summary = response.json()["choices"][0]["message"]["content"].strip()
-        return summary
-    else:
+def chat_content(response):
+    # Parse the JSON response to extract the generated text
+    return response["choices"][0]["message"]["content"].strip()
+
+
+def chat(prompt):
+    """
+    Send a single prompt to the chat completions endpoint.
+
+    Args:
+        prompt (str): The prompt.
+
+    Returns:
+        str: The answer of the model, or None if an error occurs.
+    """
+    try:
+        return chat_content(get_client().post_json("/chat/completions", chat_payload(prompt)))
+    except APIError as error:
         # Log the error and return None if the request failed
-        print(f"Error: {response.json()['error']['message']}")
+        print(f"Error: {error.message}")
         return None
 
 
+def chat_many(prompts):
+    """
+    Send several prompts concurrently, under the MAX_CONCURRENCY limit.
 
-def utility_text(text):
+    Args:
+        prompts (List[str]): The prompts.
+
+    Returns:
+        List[str]: The answers in the order of `prompts`, or None if any request failed.
+    """
+    try:
+        responses = get_client().post_many("/chat/completions", [chat_payload(prompt) for prompt in prompts],
+                                           max_concurrency=MAX_CONCURRENCY)
+        return [chat_content(response) for response in responses]
+    except APIError as error:
+        print(f"Error: {error.message}")
+        return None
+
+
+def _map_reduce(text, map_prompt, reduce_prompt):
+    """
+    Answer a prompt over a text that may not fit in a single request, in a single map-reduce level. Short texts are sent as they are;
+    long ones are split into chunks answered concurrently, and the partial answers are combined by a
+    final request.
+
+    Args:
+        text (str): The transcript.
+        map_prompt (Callable[[str], str]): Builds the prompt of one chunk.
+        reduce_prompt (Callable[[str, bool], str]): Builds the final prompt from the text, or from the
+            partial answers when the second argument is True.
+
+    Returns:
+        str: The final answer, or None if an error occurs.
+    """
+    from packages.chunk_splitter import split_text_into_chunks
+
+    # BART uses the GPT-2 byte-level BPE, a close enough measure of the prompt size
+    chunks = split_text_into_chunks(text, max_tokens=PROMPT_TOKENS)
+    if len(chunks) <= 1:
+        return chat(reduce_prompt(text, False))
+
+    partials = chat_many([map_prompt(chunk) for chunk in chunks])
+    if partials is None:
+        return None
+    return chat(reduce_prompt("\n\n".join(partials), True))
+
+
+def summarize_text(text, tokens = 100):
     """
-    Utilize the OpenAI API to generate a summary of the provided text. This function makes an HTTP POST request
-    to the OpenAI API endpoint to process the text summarization task.
+    Utilize the OpenAI API to generate a summary of the provided text. Transcripts too long for a single
+    prompt are summarized hierarchically: chunks are summarized concurrently, and the partial summaries are
+    combined level after level until they fit the requested length.
 
     Args:
         text (str): The text to be summarized, typically extracted from a VTT file or similar content.
+        tokens (int, optional): Target length of the summary in words. Defaults to 100.
 
     Returns:
         str: The summarized text as returned by the OpenAI model, or None if an error occurs.
     """
-    # Define the API endpoint and authorization headers
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {API_KEY}"
-    }
-    # print(int(tokens))
-    # Construct the data payload for the API request
-    data = {
-        "model": "gpt-3.5-turbo",
-        "messages": [{"role": "user", "content": f"Identify all key points and key decisions made in this transcript:\n\n{text}"}],
-        # "max_tokens": int(tokens),  # Set the maximum length of the summary
-        "n": 1,  # Number of responses to generate
-        "stop": None,  # Optional stopping character or sequence
-        "temperature": 0.5,  # Sampling temperature
-    }
+    from packages.mapreduce import MapReduceSummarizer, OpenAIBackend
 
-    # Execute the POST request with the prepared headers and data
-    response = requests.post(url, headers=headers, json=data)
-
-    # Handle the response
-    if response.status_code == 200:
-        # Parse the JSON response to extract the summary
-        summary = response.json()["choices"][0]["message"]["content"].strip()
-        return summary
-    else:
+    try:
+        return MapReduceSummarizer(OpenAIBackend(), target_words=tokens).summarize(text)
+    except APIError as error:
         # Log the error and return None if the request failed
-        print(f"Error: {response.json()['error']['message']}")
+        print(f"Error: {error.message}")
         return None
 
 
+
+def utility_text(text):
+    """
+    Utilize the OpenAI API to identify the key points and key decisions of the provided text. Transcripts
+    too long for a single prompt are processed chunk by chunk, concurrently, before the partial lists
+    are merged.
+
+    Args:
+        text (str): The text to be analyzed, typically extracted from a VTT file or similar content.
+
+    Returns:
+        str: The key points as returned by the OpenAI model, or None if an error occurs.
+    """
+    def map_prompt(chunk):
+        return f"Identify all key points and key decisions made in this part of a transcript:\n\n{chunk}"
+
+    def reduce_prompt(content, partial):
+        if partial:
+            return f"These are the key points and key decisions of consecutive parts of one transcript. Merge them into a single list without duplicates:\n\n{content}"
+        return f"Identify all key points and key decisions made in this transcript:\n\n{content}"
+
+    return _map_reduce(text, map_prompt, reduce_prompt)
+
+
 # # Example usage
 # text = "This is a long text that needs to be summarized."
 # summary = summarize_text(text)
 # if summary:
-#     print(f"Summary: {summary}")
\ No newline at end of file
+#     print(f"Summary: {summary}")
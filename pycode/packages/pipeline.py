@@ -0,0 +1,336 @@
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+from packages.instrumentation import span, labelled, worker_task
+
+# Stages run when none are requested: the ones that need neither a model download nor an API key
+DEFAULT_STAGES = ("parse", "stats", "extractive", "sentiment")
+
+
+class PipelineJob:
+    """
+    One transcript going through the pipeline. The transcript is loaded through its binary store, and the
+    results go through the result cache shared with the GUI and the batch engine, under the same keys.
+
+    Args:
+        file_path (str): Path to a .vtt or .txt transcript.
+        output_dir (str, optional): Directory receiving the files written by the stages, e.g. timeline images.
+        options (dict, optional): Stage options: 'words' (summary length), 'method' (key cue scoring), 'key_cues' (count)
+            and 'sentiment_workers' (processes scoring the turns of one transcript, see sentiment_scores).
+        use_cache (bool, optional): Read and store results in the shared result cache. Defaults to True.
+    """
+
+    def __init__(self, file_path, output_dir=None, options=None, use_cache=True):
+        from packages.transcript_store import load_or_convert
+        from packages.cache import content_hash
+
+        self.file_path = file_path
+        self.name = os.path.splitext(os.path.basename(file_path))[0]
+        self.output_dir = output_dir or os.getcwd()
+        self.options = options or {}
+        self.use_cache = use_cache
+        self.transcript, self.content = load_or_convert(file_path)
+        self.digest = content_hash(self.content)
+        self._frame = None
+
+    @property
+    def frame(self):
+        """The transcript as a cue table, built on first use."""
+        if self._frame is None:
+            self._frame = self.transcript.to_frame(timestamps=True)
+        return self._frame
+
+    def cached(self, kind, compute, model=None, **params):
+        """
+        Compute a result through the shared result cache, unless the cache is disabled.
+
+        Args:
+            kind (str): Kind of result, e.g. 'stats'.
+            compute (Callable[[], Any]): Computes the result on a cache miss.
+            model (str, optional): Model producing the result.
+            **params: Parameters the result depends on.
+
+        Returns:
+            Any: The result.
+        """
+        if not self.use_cache:
+            return compute()
+        from packages.cache import default_cache
+        return default_cache().get_or_compute(self.digest, kind, compute, model=model, **params)
+
+
+def stage_parse(job):
+    """Number of cues, speakers and duration of the meeting."""
+    transcript = job.transcript
+    return {
+        "cues": len(transcript),
+        "speakers": list(transcript.speakers),
+        "duration_ms": int(transcript.end_ms.max() - transcript.start_ms.min()) if transcript.timed and len(transcript) else None,
+    }
+
+
+def stage_stats(job):
+    """Per-speaker statistics, durations in milliseconds. None for transcripts without speakers."""
+    from packages.speaker_stats import compute_speaker_stats
+
+    # Plain-text transcripts carry no speakers or timings
+    if not job.transcript.speakers:
+        return None
+    return job.cached('stats', lambda: compute_speaker_stats(job.transcript)).to_dict()
+
+
+def stage_timeline(job):
+    """Timeline image written to the output directory, returns its path. None for untimed transcripts."""
+    if not job.transcript.timed:
+        return None
+
+    # Only this stage needs matplotlib, and never a display
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from packages.timeline_generator import create_timeline_figure
+
+    os.makedirs(job.output_dir, exist_ok=True)
+    path = os.path.join(job.output_dir, f"{job.name}-timeline.png")
+    fig = create_timeline_figure(job.transcript)
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+    return path
+
+
+def stage_extractive(job):
+    """Key cues with their speaker, timestamps and score."""
+    from packages.extractive import extract_key_cues, WORDS_PER_KEY_CUE
+
+    method, count = job.options.get("method", "luhn"), job.options.get("key_cues")
+
+    def compute():
+        key_cues = extract_key_cues(job.frame, count=count, method=method)
+        speakers = key_cues["Speaker"].tolist() if "Speaker" in key_cues else [None] * len(key_cues)
+        timed = "StartMs" in key_cues
+        return [
+            {
+                "cue": int(key_cues["Cue"].iat[i]),
+                "speaker": speakers[i] if isinstance(speakers[i], str) else None,
+                "start_ms": int(key_cues["StartMs"].iat[i]) if timed else None,
+                "end_ms": int(key_cues["EndMs"].iat[i]) if timed else None,
+                "text": key_cues["Text"].iat[i],
+                "score": float(key_cues["Score"].iat[i]),
+            }
+            for i in range(len(key_cues))
+        ]
+
+    return job.cached('key_cues', compute, model=method, count=count, words_per_cue=WORDS_PER_KEY_CUE)
+
+
+def stage_abstractive(job):
+    """BART map-reduce summary of `words` words."""
+    from packages.inference_client import split_chunks, summary_model_name
+    from packages.mapreduce import MapReduceSummarizer
+    from packages.models import MODEL_NAME
+
+    words = job.options.get("words", 100)
+    chunks = job.cached('chunks', lambda: split_chunks(job.content), model=MODEL_NAME, max_tokens=1024)
+    return job.cached('abstractive', lambda: MapReduceSummarizer('bart', target_words=words).summarize_chunks(chunks),
+                      model=summary_model_name(), max_tokens=1024, num_beams=4, words=words)
+
+
+def stage_sentiment(job):
+    """Mean compound score and the turns flagged as potential conflicts."""
+    from packages.sentiment import sentiment_table, boundary_score
+    from packages.inference_client import sentiment_scores
+
+    workers = job.options.get("sentiment_workers", 1)
+
+    def compute():
+        table = sentiment_table(job.frame, sentiment_scores(job.frame["Text"], workers=workers))
+        flagged = table[table["Conflict"]]
+        texts = job.frame["Text"].to_numpy()
+        return {
+            "mean_compound": float(table["Compound"].mean()) if len(table) else None,
+            "conflicts": [
+                {
+                    "cue": int(turn),
+                    "speaker": speaker if isinstance(speaker, str) else None,
+                    "compound": float(compound),
+                    "text": texts[turn],
+                }
+                for turn, speaker, compound in zip(flagged["Turn"], flagged["Speaker"], flagged["Compound"])
+            ],
+        }
+
+    return job.cached('sentiment_flags', compute, model='vader', boundary_score=boundary_score)
+
+
+def stage_keypoints(job):
+    """Key points and decisions from the OpenAI API."""
+    from packages.openai import utility_text, MODEL
+
+    return job.cached('openai_utility', lambda: utility_text(job.content), model=MODEL)
+
+
+# Stages selectable by name, in the order they run
+STAGES = {
+    "parse": stage_parse,
+    "stats": stage_stats,
+    "timeline": stage_timeline,
+    "extractive": stage_extractive,
+    "abstractive": stage_abstractive,
+    "sentiment": stage_sentiment,
+    "keypoints": stage_keypoints,
+}
+
+
+@worker_task
+def run_file(file_path, stages=DEFAULT_STAGES, output_dir=None, options=None, use_cache=True):
+    """
+    Run the requested stages on one transcript. A failing stage is reported in the record and does not
+    stop the others.
+
+    Args:
+        file_path (str): Path to a .vtt or .txt transcript.
+        stages (Iterable[str], optional): Names of the stages to run, keys of STAGES. Defaults to DEFAULT_STAGES.
+        output_dir (str, optional): Directory receiving the files written by the stages.
+        options (dict, optional): Stage options, see PipelineJob.
+        use_cache (bool, optional): Read and store results in the shared result cache. Defaults to True.
+
+    Returns:
+        dict: The file name, then one entry per stage, and an 'errors' entry mapping failed stages to their error.
+    """
+    from packages.search_index import auto_index_suspended
+
+    record = {"file": os.path.basename(file_path)}
+    with labelled(meeting=record["file"]):
+        try:
+            # Only converted here; run_pipeline indexes every transcript in one commit
+            with span("pipeline.load") as trace, auto_index_suspended():
+                job = PipelineJob(file_path, output_dir, options, use_cache)
+                trace.size = len(job.transcript)
+        except Exception as error:
+            record["errors"] = {"load": f"{type(error).__name__}: {error}"}
+            return record
+
+        errors = {}
+        for name in STAGES:
+            if name not in stages:
+                continue
+            try:
+                with span(f"pipeline.{name}", size=len(job.transcript)):
+                    record[name] = STAGES[name](job)
+            except Exception as error:
+                record[name] = None
+                errors[name] = f"{type(error).__name__}: {error}"
+    if errors:
+        record["errors"] = errors
+    return record
+
+
+def expand_paths(paths):
+    """
+    Expand directories into the transcripts they hold, keeping files as they are.
+
+    Args:
+        paths (Iterable[str]): Transcript files and directories.
+
+    Returns:
+        List[str]: The transcript files, in the order given, directories expanded in sorted order.
+    """
+    from packages.batch import find_transcripts
+
+    files = []
+    for path in paths:
+        files.extend(find_transcripts(path) if os.path.isdir(path) else [path])
+    return files
+
+
+def run_pipeline(paths, stages=DEFAULT_STAGES, output_dir=None, options=None, use_cache=True, workers=1):
+    """
+    Run the requested stages on transcripts and yield one record per transcript, in the order of `paths`,
+    as soon as it is ready.
+
+    Args:
+        paths (Iterable[str]): Transcript files and directories.
+        stages (Iterable[str], optional): Names of the stages to run. Defaults to DEFAULT_STAGES.
+        output_dir (str, optional): Directory receiving the files written by the stages.
+        options (dict, optional): Stage options, see PipelineJob.
+        use_cache (bool, optional): Read and store results in the shared result cache. Defaults to True.
+        workers (int, optional): Number of worker processes; 1 runs everything in this process. Defaults to 1.
+
+    Yields:
+        dict: The record of each transcript, see run_file.
+    """
+    from packages.search_index import index_converted
+
+    files = expand_paths(paths)
+    loaded = []
+    try:
+        for path, record in zip(files, _run_files(files, tuple(stages), output_dir, options, use_cache, workers)):
+            if "load" not in record.get("errors", {}):
+                loaded.append(path)
+            yield record
+    finally:
+        index_converted(loaded)
+
+
+def _run_files(files, stages, output_dir, options, use_cache, workers):
+    # Records of run_file in the order of `files`, from this process or a pool
+    if workers == 1:
+        for path in files:
+            yield run_file(path, stages, output_dir, options, use_cache)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_file, path, stages, output_dir, options, use_cache) for path in files]
+        for future in futures:
+            yield future.result()
+
+
+def write_jsonl(records, file):
+    """
+    Write records as JSON lines, flushing after each one so that consumers see them as they come.
+
+    Args:
+        records (Iterable[dict]): The records.
+        file (TextIO): Destination, e.g. sys.stdout.
+
+    Returns:
+        int: Number of records written.
+    """
+    count = 0
+    for record in records:
+        file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        file.flush()
+        count += 1
+    return count
+
+
+def write_parquet(records, path):
+    """
+    Write records to a Parquet file, one row per transcript. Stage results with a nested structure are
+    stored as JSON strings, since their shape differs from one transcript to the next.
+
+    Args:
+        records (Iterable[dict]): The records.
+        path (str): Path of the Parquet file.
+
+    Returns:
+        int: Number of records written.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as error:
+        raise ImportError("Writing Parquet requires pyarrow: pip install pyarrow") from error
+
+    rows = [
+        {key: json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+         for key, value in record.items()}
+        for record in records
+    ]
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    table = pa.table({column: [row.get(column) for row in rows] for column in columns})
+    pq.write_table(table, path)
+    return len(rows)
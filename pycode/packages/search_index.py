@@ -0,0 +1,600 @@
+import os
+import json
+import math
+import shutil
+import tempfile
+import threading
+import warnings
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+from packages.cache import DEFAULT_CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: only the threads of one process are kept from writing the index at the same time
+    fcntl = None
+
+# Location of the index, overridable through the environment
+DEFAULT_INDEX_DIR = os.environ.get("MEETINSIGHT_INDEX_DIR", os.path.join(DEFAULT_CACHE_DIR, "search_index"))
+
+# Index every transcript converted to the binary store; MEETINSIGHT_AUTO_INDEX=0 disables it
+AUTO_INDEX = os.environ.get("MEETINSIGHT_AUTO_INDEX", "1") != "0"
+
+# Cleared while a caller indexes the transcripts it converts itself, in one commit (see auto_index_suspended)
+_auto_index = contextvars.ContextVar("search_auto_index", default=True)
+
+# Format version of the manifest and the segments, bumped whenever the layout changes
+VERSION = 1
+
+# BM25: saturation of the term frequency and strength of the cue length normalization
+K1 = 1.2
+B = 0.75
+
+# Segments are merged into one once there are more than this many
+MAX_SEGMENTS = 16
+
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = "index.lock"
+
+# Arrays of a segment, each saved as <name>.npy in the segment directory:
+# the sorted terms, where the postings of each term start, the postings (cue, term frequency) sorted by
+# term then cue, and for every cue its transcript, index, start time (-1 if untimed) and length in terms
+SEGMENT_ARRAYS = ("terms", "term_offsets", "posting_docs", "posting_tfs",
+                  "doc_transcripts", "doc_cues", "doc_start_ms", "doc_lengths")
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    """
+    A cue matching a query.
+
+    Attributes:
+        path (str): Absolute path of the transcript.
+        cue (int): Index of the cue in the transcript.
+        start_ms (int, optional): Start of the cue in milliseconds, None for untimed transcripts.
+        score (float): BM25 score of the cue.
+        speaker (str, optional): Speaker of the cue, when the text was loaded.
+        text (str, optional): Text of the cue, when it was loaded.
+    """
+    path: str
+    cue: int
+    start_ms: Optional[int]
+    score: float
+    speaker: Optional[str] = None
+    text: Optional[str] = None
+
+
+class Segment:
+    """
+    An immutable part of the index, written once and memory-mapped for reading.
+
+    Args:
+        directory (str): Directory of the segment.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        for name in SEGMENT_ARRAYS:
+            setattr(self, name, np.load(os.path.join(directory, name + ".npy"), mmap_mode="r"))
+        with open(os.path.join(directory, "transcripts.json"), encoding="utf-8") as file:
+            self.transcripts = json.load(file)  # Source path of every transcript of the segment
+
+    def postings(self, term):
+        """
+        Postings of a term.
+
+        Returns:
+            tuple: The cues holding the term and the term frequency in each, empty if the term is unknown.
+        """
+        i = int(np.searchsorted(self.terms, term))
+        if i == len(self.terms) or self.terms[i] != term:
+            return self.posting_docs[:0], self.posting_tfs[:0]
+        start, end = int(self.term_offsets[i]), int(self.term_offsets[i + 1])
+        return self.posting_docs[start:end], self.posting_tfs[start:end]
+
+    def live_transcripts(self, name, manifest):
+        """
+        Transcripts of the segment that are still current, i.e. not indexed again or removed since.
+
+        Returns:
+            np.ndarray: One flag per transcript of the segment.
+        """
+        entries = manifest["transcripts"]
+        return np.array([entries.get(path, {}).get("segment") == name and entries[path]["id"] == i
+                         for i, path in enumerate(self.transcripts)], dtype=bool)
+
+
+def transcript_postings(transcript):
+    """
+    Postings of one transcript, with every cue as a document. Words are stemmed and stop words dropped,
+    as for the key cues.
+
+    Args:
+        transcript (Transcript): The transcript.
+
+    Returns:
+        tuple: The term, cue and term frequency of every posting, and the length in terms of every cue.
+    """
+    from packages.extractive import tokenize_cues
+
+    tokens = tokenize_cues(transcript.texts())
+    if not tokens.cue_count:
+        return np.array([], dtype=object), np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.int64)
+
+    keep = ~tokens.stop
+    cues, term_ids = tokens.cue[keep], tokens.term[keep]
+    # One posting per distinct (term, cue) pair, counted
+    pairs, tfs = np.unique(term_ids * tokens.cue_count + cues, return_counts=True)
+    terms = np.array(tokens.terms, dtype=object)
+    return terms[pairs // tokens.cue_count], pairs % tokens.cue_count, tfs, np.bincount(cues, minlength=tokens.cue_count)
+
+
+class SegmentBuilder:
+    """
+    Accumulate transcripts, or the live part of existing segments, into a new segment.
+    """
+
+    def __init__(self):
+        self.transcripts = []
+        self._parts = []  # (terms, docs, tfs) of the postings
+        self._docs = {name: [] for name in ("doc_transcripts", "doc_cues", "doc_start_ms", "doc_lengths")}
+        self.doc_count = 0
+
+    def add_transcript(self, path, transcript):
+        """
+        Add every cue of a transcript.
+
+        Returns:
+            int: Id of the transcript in the segment.
+        """
+        terms, cues, tfs, lengths = transcript_postings(transcript)
+        transcript_id = len(self.transcripts)
+        self.transcripts.append(path)
+        self._parts.append((terms, cues + self.doc_count, tfs))
+        self._docs["doc_transcripts"].append(np.full(len(lengths), transcript_id))
+        self._docs["doc_cues"].append(np.arange(len(lengths)))
+        self._docs["doc_start_ms"].append(np.asarray(transcript.start_ms) if transcript.timed else np.full(len(lengths), -1))
+        self._docs["doc_lengths"].append(lengths)
+        self.doc_count += len(lengths)
+        return transcript_id
+
+    def add_segment(self, segment, live):
+        """
+        Add the live transcripts of an existing segment, without tokenizing them again.
+
+        Args:
+            segment (Segment): The segment.
+            live (np.ndarray): Flags of the transcripts to keep, see Segment.live_transcripts.
+
+        Returns:
+            dict: Source path -> id in the new segment, for every transcript kept.
+        """
+        transcript_ids = np.cumsum(live) - 1 + len(self.transcripts)
+        live_docs = live[np.asarray(segment.doc_transcripts)]
+        doc_ids = np.cumsum(live_docs) - 1 + self.doc_count
+
+        term_of_posting = np.repeat(np.arange(len(segment.terms)), np.diff(segment.term_offsets))
+        keep = live_docs[np.asarray(segment.posting_docs)]
+        self._parts.append((np.asarray(segment.terms)[term_of_posting[keep]],
+                            doc_ids[np.asarray(segment.posting_docs)[keep]], np.asarray(segment.posting_tfs)[keep]))
+
+        self._docs["doc_transcripts"].append(transcript_ids[np.asarray(segment.doc_transcripts)[live_docs]])
+        for name in ("doc_cues", "doc_start_ms", "doc_lengths"):
+            self._docs[name].append(np.asarray(getattr(segment, name))[live_docs])
+        self.doc_count += int(live_docs.sum())
+
+        kept = {}
+        for i in np.flatnonzero(live).tolist():
+            kept[segment.transcripts[i]] = len(self.transcripts)
+            self.transcripts.append(segment.transcripts[i])
+        return kept
+
+    def write(self, directory):
+        """
+        Write the segment. It is built in a temporary directory and renamed into place.
+        """
+        def joined(parts, dtype):
+            return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype)
+
+        posting_terms = np.concatenate([terms for terms, _, _ in self._parts]) if self._parts else np.zeros(0, object)
+        terms, term_ids = np.unique(posting_terms.astype(str), return_inverse=True)
+        docs = joined([docs for _, docs, _ in self._parts], np.int32)
+        tfs = joined([tfs for _, _, tfs in self._parts], np.int32)
+        order = np.lexsort((docs, term_ids))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(terms)), out=offsets[1:])
+
+        arrays = {
+            "terms": terms,
+            "term_offsets": offsets,
+            "posting_docs": docs[order],
+            "posting_tfs": tfs[order],
+            "doc_transcripts": joined(self._docs["doc_transcripts"], np.int32),
+            "doc_cues": joined(self._docs["doc_cues"], np.int32),
+            "doc_start_ms": joined(self._docs["doc_start_ms"], np.int64),
+            "doc_lengths": joined(self._docs["doc_lengths"], np.int32),
+        }
+        temporary = tempfile.mkdtemp(dir=os.path.dirname(directory), suffix=".tmp")
+        try:
+            for name, values in arrays.items():
+                np.save(os.path.join(temporary, name + ".npy"), values)
+            with open(os.path.join(temporary, "transcripts.json"), "w", encoding="utf-8") as file:
+                json.dump(self.transcripts, file)
+            os.replace(temporary, directory)
+        except BaseException:
+            shutil.rmtree(temporary, ignore_errors=True)
+            raise
+
+
+class SearchIndex:
+    """
+    On-disk inverted index of the cues of every transcript, ranked with BM25. The index grows by immutable
+    segments: each commit writes the transcripts added since the previous one as a new segment, and segments
+    are merged once there are too many. A manifest lists the segments and where the current version of every
+    transcript lives, so a transcript indexed again simply shadows its previous postings. Writers take a lock
+    file, so the GUI and batch workers can share one index.
+
+    Args:
+        directory (str, optional): Directory of the index. Defaults to DEFAULT_INDEX_DIR.
+    """
+
+    def __init__(self, directory=DEFAULT_INDEX_DIR):
+        self.directory = directory
+        self._segments = {}  # Name -> Segment; segments never change once written
+        self._pending = []  # (path, stat, transcript) added since the last commit
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._read_manifest()["transcripts"])
+
+    @contextmanager
+    def _locked(self):
+        with self._lock, open(os.path.join(self.directory, LOCK_NAME), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.directory, MANIFEST_NAME), encoding="utf-8") as file:
+                manifest = json.load(file)
+            if manifest.get("version") == VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {"version": VERSION, "next_segment": 0, "segments": [], "transcripts": {}}
+
+    def _write_manifest(self, manifest):
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(handle, "w", encoding="utf-8") as file:
+            json.dump(manifest, file)
+        os.replace(temporary, os.path.join(self.directory, MANIFEST_NAME))
+
+    def _segment(self, name):
+        segment = self._segments.get(name)
+        if segment is None:
+            segment = self._segments[name] = Segment(os.path.join(self.directory, name))
+        return segment
+
+    def is_indexed(self, source, source_stat=None):
+        """
+        Whether the current version of a transcript file is in the index.
+
+        Args:
+            source (str): Path to the transcript.
+            source_stat (os.stat_result, optional): Stat of the file, taken when not given.
+
+        Returns:
+            bool: True if the file was indexed with its current size and modification time.
+        """
+        source_stat = source_stat or os.stat(source)
+        entry = self._read_manifest()["transcripts"].get(os.path.abspath(source))
+        return entry is not None and entry["size"] == source_stat.st_size and entry["mtime_ns"] == source_stat.st_mtime_ns
+
+    def add(self, source, transcript, source_stat=None):
+        """
+        Queue a transcript for the next commit; an earlier version of it is replaced.
+
+        Args:
+            source (str): Path to the transcript file.
+            transcript (Transcript): The parsed transcript.
+            source_stat (os.stat_result, optional): Stat of the file the transcript was parsed from.
+        """
+        source_stat = source_stat or os.stat(source)
+        self._pending.append((os.path.abspath(source), source_stat, transcript))
+
+    def commit(self):
+        """
+        Write the transcripts added since the last commit as a new segment.
+
+        Returns:
+            int: Number of transcripts written.
+        """
+        pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+
+        # Tokenize before taking the lock
+        builder = SegmentBuilder()
+        ids = {path: builder.add_transcript(path, transcript) for path, _, transcript in pending}
+
+        with self._locked():
+            manifest = self._read_manifest()
+            name = f"segment-{manifest['next_segment']:06d}"
+            manifest["next_segment"] += 1
+            builder.write(os.path.join(self.directory, name))
+            manifest["segments"].append(name)
+            for path, source_stat, _ in pending:
+                manifest["transcripts"][path] = {"segment": name, "id": ids[path], "size": source_stat.st_size,
+                                                 "mtime_ns": source_stat.st_mtime_ns}
+            if len(manifest["segments"]) > MAX_SEGMENTS:
+                self._merge(manifest)
+            self._write_manifest(manifest)
+            self._remove_unused(manifest)
+        return len(pending)
+
+    def remove(self, source):
+        """
+        Drop a transcript from the index. Its postings are skipped by searches and discarded at the next merge.
+
+        Returns:
+            bool: True if the transcript was indexed.
+        """
+        with self._locked():
+            manifest = self._read_manifest()
+            found = manifest["transcripts"].pop(os.path.abspath(source), None) is not None
+            if found:
+                self._write_manifest(manifest)
+        return found
+
+    def compact(self):
+        """
+        Merge every segment into one, discarding the postings of transcripts indexed again or removed.
+        """
+        with self._locked():
+            manifest = self._read_manifest()
+            if manifest["segments"]:
+                self._merge(manifest)
+                self._write_manifest(manifest)
+                self._remove_unused(manifest)
+
+    def _merge(self, manifest):
+        # Called with the lock held: replace every segment of the manifest by one new segment
+        builder = SegmentBuilder()
+        moved = {}
+        for name in manifest["segments"]:
+            segment = self._segment(name)
+            moved.update(builder.add_segment(segment, segment.live_transcripts(name, manifest)))
+
+        name = f"segment-{manifest['next_segment']:06d}"
+        manifest["next_segment"] += 1
+        builder.write(os.path.join(self.directory, name))
+        manifest["segments"] = [name]
+        for path, transcript_id in moved.items():
+            manifest["transcripts"][path].update(segment=name, id=transcript_id)
+
+    def _remove_unused(self, manifest):
+        # Called with the lock held, after the manifest is written
+        used = set(manifest["segments"])
+        for name in os.listdir(self.directory):
+            if name.startswith("segment-") and name not in used:
+                self._segments.pop(name, None)
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def index_files(self, paths, force=False):
+        """
+        Index transcript files that are new or changed since they were indexed, in one commit.
+
+        Args:
+            paths (Iterable[str]): Paths to .vtt or .txt transcripts.
+            force (bool, optional): Index the files that are up to date too. Defaults to False.
+
+        Returns:
+            int: Number of transcripts indexed.
+        """
+        from packages.transcript_store import load_or_convert
+
+        # Transcripts converted on the way are added here, not committed one segment each by the store
+        with auto_index_suspended():
+            for path in paths:
+                source_stat = os.stat(path)
+                if force or not self.is_indexed(path, source_stat):
+                    self.add(path, load_or_convert(path)[0], source_stat)
+        return self.commit()
+
+    def search(self, query, limit=10, with_text=True):
+        """
+        Find the cues best matching a query across every indexed transcript.
+
+        Args:
+            query (str): Words to look for; stemmed like the indexed cues, stop words ignored.
+            limit (int, optional): Number of hits returned. Defaults to 10.
+            with_text (bool, optional): Load the speaker and text of every hit from its transcript. Defaults to True.
+
+        Returns:
+            List[SearchHit]: The hits, best first.
+        """
+        from packages.extractive import tokenize_cues
+
+        tokens = tokenize_cues([query])
+        # Stop words are not indexed, so a query made of stop words only matches nothing
+        term_ids = tokens.term[~tokens.stop]
+        query_terms = [tokens.terms[i] for i in dict.fromkeys(term_ids.tolist())]
+
+        manifest = self._read_manifest()
+        segments = []
+        for name in manifest["segments"]:
+            try:
+                segment = self._segment(name)
+            except FileNotFoundError:
+                # Merged away by another process since the manifest was read
+                continue
+            live_docs = segment.live_transcripts(name, manifest)[np.asarray(segment.doc_transcripts)]
+            segments.append((segment, live_docs))
+
+        doc_count = sum(int(live.sum()) for _, live in segments)
+        if not doc_count or not query_terms:
+            return []
+        average_length = sum(int(np.asarray(segment.doc_lengths)[live].sum()) for segment, live in segments) / doc_count
+
+        keys, scores = [], []
+        for term in query_terms:
+            matches = []
+            for index, (segment, live) in enumerate(segments):
+                docs, tfs = segment.postings(term)
+                keep = live[docs]
+                if keep.any():
+                    docs = np.asarray(docs)[keep]
+                    matches.append((index, docs, np.asarray(tfs)[keep], np.asarray(segment.doc_lengths)[docs]))
+
+            frequency = sum(len(docs) for _, docs, _, _ in matches)
+            idf = math.log(1 + (doc_count - frequency + 0.5) / (frequency + 0.5))
+            for index, docs, tfs, lengths in matches:
+                norm = K1 * (1 - B + B * lengths / average_length)
+                keys.append((index << 32) | docs.astype(np.int64))
+                scores.append(idf * tfs * (K1 + 1) / (tfs + norm))
+
+        if not keys:
+            return []
+        unique_keys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(scores))
+        best = np.argsort(-totals, kind="stable")[:limit]
+
+        hits = []
+        for key, score in zip(unique_keys[best].tolist(), totals[best].tolist()):
+            segment, doc = segments[key >> 32][0], key & 0xFFFFFFFF
+            start_ms = int(segment.doc_start_ms[doc])
+            hits.append(SearchHit(path=segment.transcripts[int(segment.doc_transcripts[doc])], cue=int(segment.doc_cues[doc]),
+                                  start_ms=start_ms if start_ms >= 0 else None, score=score))
+        return with_texts(hits) if with_text else hits
+
+
+def with_texts(hits):
+    """
+    Fill in the speaker and text of search hits from the stores of their transcripts.
+    Hits whose transcript is gone are returned as they are.
+
+    Args:
+        hits (List[SearchHit]): The hits.
+
+    Returns:
+        List[SearchHit]: The hits with their speaker and text.
+    """
+    from dataclasses import replace
+    from packages.transcript_store import load_or_convert
+
+    transcripts = {}
+    filled = []
+    for hit in hits:
+        if hit.path not in transcripts:
+            try:
+                transcripts[hit.path] = load_or_convert(hit.path)[0]
+            except OSError:
+                transcripts[hit.path] = None
+        transcript = transcripts[hit.path]
+        if transcript is None or hit.cue >= len(transcript):
+            filled.append(hit)
+        else:
+            filled.append(replace(hit, speaker=transcript.speaker(hit.cue), text=transcript.text(hit.cue)))
+    return filled
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def default_index():
+    """
+    The index shared by the GUI and the command line tools, created on first use.
+
+    Returns:
+        SearchIndex: The shared index.
+    """
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = SearchIndex()
+    return _default_index
+
+
+@contextmanager
+def auto_index_suspended():
+    """
+    Keep the transcript store from indexing the transcripts converted inside the block, on the current thread,
+    so that the caller can index them itself in one commit.
+    """
+    token = _auto_index.set(False)
+    try:
+        yield
+    finally:
+        _auto_index.reset(token)
+
+
+def auto_indexing():
+    """
+    Whether the transcript store indexes the transcripts it converts, see AUTO_INDEX and auto_index_suspended.
+
+    Returns:
+        bool: True unless disabled through the environment or suspended on the current thread.
+    """
+    return AUTO_INDEX and _auto_index.get()
+
+
+def index_converted(paths):
+    """
+    Add transcripts converted while auto indexing was suspended, e.g. by pool workers, to the shared index in
+    one commit. Transcripts already up to date are skipped, and nothing is done when auto indexing is off.
+    Failures are reported as warnings: a transcript that cannot be loaded does not keep the others out.
+
+    Args:
+        paths (Iterable[str]): Paths to .vtt or .txt transcripts, converted to the default store.
+
+    Returns:
+        int: Number of transcripts indexed.
+    """
+    from packages.transcript_store import load_or_convert
+
+    if not auto_indexing():
+        return 0
+    try:
+        index = default_index()
+        with auto_index_suspended():
+            for path in paths:
+                try:
+                    source_stat = os.stat(path)
+                    if not index.is_indexed(path, source_stat):
+                        index.add(path, load_or_convert(path)[0], source_stat)
+                except Exception as error:
+                    warnings.warn(f"{os.path.basename(path)} could not be indexed: {error}")
+        return index.commit()
+    except Exception as error:
+        warnings.warn(f"The converted transcripts could not be indexed: {error}")
+        return 0
+
+
+def index_transcript(source, transcript, source_stat=None):
+    """
+    Add a freshly parsed transcript to the shared index. Called by the transcript store on every conversion,
+    so the index follows the transcripts as they are ingested. A failure is reported as a warning and never
+    stops the conversion.
+
+    Args:
+        source (str): Path to the transcript file.
+        transcript (Transcript): The parsed transcript.
+        source_stat (os.stat_result, optional): Stat of the file the transcript was parsed from.
+    """
+    try:
+        index = default_index()
+        index.add(source, transcript, source_stat)
+        index.commit()
+    except Exception as error:
+        warnings.warn(f"{os.path.basename(source)} could not be indexed: {error}")
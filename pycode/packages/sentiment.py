@@ -1,6 +1,10 @@
-import spacy
-from nltk.sentiment import SentimentIntensityAnalyzer
-import nltk
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from packages.models import get_sentiment_analyzer
+from packages.instrumentation import span, worker_task
 
 # Download the required NLTK data
 # nltk.download('vader_lexicon')
@@ -8,30 +12,119 @@ import nltk
 # Load the SpaCy model
 # nlp = spacy.load("en_core_web_sm")
 
-# Initialize the sentiment analyzer
-sia = SentimentIntensityAnalyzer()
-
 # Define a list of pronouns referring to the other person
-other_person_pronouns = ["you", "your", "yours", "yourself"]
+other_person_pronouns = ["you", "your", "yours", "yourself", "yourselves"]
+
+# Match the pronouns as whole words only, so that "young" or "youth" are not taken for "you"
+addressee_pattern = re.compile(r"\b(?:" + "|".join(other_person_pronouns) + r")\b", re.IGNORECASE)
 
 # Set the boundary score for potential conflicts
 boundary_score = -0.1
 
-def sentiment(df):
-	# Analyze each turn in the conversation
-	sentiment = []
-	for turn in df.Text:
-		scores = sia.polarity_scores(turn)
+# Shorter transcripts are scored in the calling process: starting a pool would take longer than scoring them
+PARALLEL_MIN_TURNS = 2000
+
+def score_turns(texts):
+	"""
+	Compute the VADER compound score of every turn in one call. Identical turns, frequent in meetings
+	("Yeah.", "Okay."), are scored only once.
+
+	Args:
+		texts (Iterable[str]): The turns of the conversation.
+
+	Returns:
+		np.ndarray: The compound score of each turn, between -1 and 1.
+	"""
+	# Shared sentiment analyzer, initialized on first use
+	polarity_scores = get_sentiment_analyzer().polarity_scores
+
+	texts = list(texts)
+	scored = {}  # Text -> compound score
+	with span("sentiment.score_turns", size=len(texts)):
+		for text in texts:
+			if text not in scored:
+				scored[text] = polarity_scores(text)['compound']
+
+	return np.fromiter((scored[text] for text in texts), dtype=np.float64, count=len(texts))
+
+def addresses_other_person(texts):
+	"""
+	Flag the turns addressing the other person, i.e. containing one of `other_person_pronouns` as a word.
+
+	Args:
+		texts (Iterable[str]): The turns of the conversation.
+
+	Returns:
+		np.ndarray: A boolean per turn.
+	"""
+	return pd.Series(list(texts), dtype=object).str.contains(addressee_pattern, na=False).to_numpy(dtype=bool)
+
+def sentiment_table(df, scores=None):
+	"""
+	Score every turn of a conversation and flag potential conflicts: negative turns addressing
+	the other person.
 
-		# Check for potential conflicts based on the compound score
-		# if scores['compound'] < boundary_score:
-		# 	print(f"Potential conflict detected: {turn}")
+	Args:
+		df (pd.DataFrame): DataFrame with a 'Text' column and, optionally, a 'Speaker' column.
+		scores (np.ndarray, optional): Compound scores already computed for the turns, e.g. by a pool of workers.
 
+	Returns:
+		pd.DataFrame: One row per turn with 'Turn' (row position in `df`), 'Speaker', 'Compound' and 'Conflict'.
+	"""
+	texts = df['Text'].fillna('').astype(str).tolist()
+	compound = score_turns(texts) if scores is None else np.asarray(scores, dtype=np.float64)
+
+	return pd.DataFrame({
+		"Turn": np.arange(len(texts)),
+		"Speaker": df['Speaker'].to_numpy() if 'Speaker' in df else None,
+		"Compound": compound,
 		# Check for negative sentiment towards the other person
-		for pronoun in other_person_pronouns:
-			if pronoun in turn.lower():
-				if scores['compound'] < boundary_score:
-					sentiment.append(f"!!!: {turn}" + "\n" + "\n")
-					break
+		"Conflict": addresses_other_person(texts) & (compound < boundary_score),
+	})
+
+def sentiment(df, scores=None):
+	"""
+	List the turns showing negative sentiment towards the other person, formatted for display.
+
+	Args:
+		df (pd.DataFrame): DataFrame with a 'Text' column.
+		scores (np.ndarray, optional): Compound scores already computed for the turns, e.g. by the inference service.
+
+	Returns:
+		List[str]: The flagged turns.
+	"""
+	table = sentiment_table(df, scores)
+	return [f"!!!: {turn}" + "\n" + "\n" for turn in df['Text'].to_numpy()[table['Conflict'].to_numpy()]]
+
+
+@worker_task
+def _score_shard(texts):
+	# Task of the workers of score_turns_parallel
+	return score_turns(texts)
+
+
+def score_turns_parallel(texts, workers=None, shard_size=None):
+	"""
+	Compute the compound score of every turn across a pool of processes, working around the GIL on
+	large archives. The turns are split into contiguous shards, each worker initializes its analyzer
+	once, and the scores come back in the order of the turns.
+
+	Args:
+		texts (Iterable[str]): The turns, e.g. the concatenated turns of many transcripts.
+		workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+		shard_size (int, optional): Turns per shard. Defaults to about four shards per worker.
+
+	Returns:
+		np.ndarray: The compound score of each turn.
+	"""
+	texts = list(texts)
+	if not texts:
+		return np.zeros(0, dtype=np.float64)
+
+	workers = workers or os.cpu_count() or 1
+	# A few shards per worker keeps every worker busy until the end
+	shard_size = shard_size or max(1, -(-len(texts) // (workers * 4)))
+	shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
 
-	return sentiment
\ No newline at end of file
+	with ProcessPoolExecutor(max_workers=workers, initializer=get_sentiment_analyzer) as executor:
+		return np.concatenate(list(executor.map(_score_shard, shards)))
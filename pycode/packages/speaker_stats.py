@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from packages.transcript import turn_columns
+
+
+@dataclass(frozen=True)
+class SpeakerStats:
+    """
+    Per-speaker participation statistics of a transcript. All arrays are aligned with `speakers`
+    and durations are in milliseconds.
+
+    Attributes:
+        speakers (tuple): Speaker names, sorted.
+        talk_ms (np.ndarray): Total talking time of each speaker.
+        turns (np.ndarray): Number of turns of each speaker.
+        longest_ms (np.ndarray): Longest turn of each speaker.
+    """
+    speakers: tuple
+    talk_ms: np.ndarray
+    turns: np.ndarray
+    longest_ms: np.ndarray
+
+    @property
+    def total_ms(self):
+        """Total talking time of all speakers."""
+        return int(self.talk_ms.sum())
+
+    @property
+    def talk_percent(self):
+        """Share of the total talking time of each speaker, in percent."""
+        return self.talk_ms / max(self.total_ms, 1) * 100
+
+    @property
+    def average_ms(self):
+        """Average length of the turns of each speaker."""
+        return self.talk_ms / np.maximum(self.turns, 1)
+
+    def to_frame(self):
+        """
+        The statistics as a DataFrame indexed by speaker, with durations in seconds.
+
+        Returns:
+            pd.DataFrame: One row per speaker.
+        """
+        return pd.DataFrame({
+            "TalkPercent": self.talk_percent,
+            "Turns": self.turns,
+            "AverageTurn": self.average_ms / 1000,
+            "LongestTurn": self.longest_ms / 1000,
+            "TalkTime": self.talk_ms / 1000,
+        }, index=pd.Index(self.speakers, name="Speaker"))
+
+    def to_dict(self):
+        """
+        The statistics as plain Python types, ready for JSON.
+
+        Returns:
+            dict: Speaker names mapped to their statistics, durations in milliseconds.
+        """
+        return {
+            speaker: {
+                "talk_ms": int(self.talk_ms[i]),
+                "talk_percent": float(self.talk_percent[i]),
+                "turns": int(self.turns[i]),
+                "average_ms": float(self.average_ms[i]),
+                "longest_ms": int(self.longest_ms[i]),
+            }
+            for i, speaker in enumerate(self.speakers)
+        }
+
+
+def compute_speaker_stats(df):
+    """
+    Compute talking time, number of turns, average and longest turn of each speaker with one weighted count
+    per statistic over integer-millisecond arrays. Nothing is plotted and the DataFrame is left unchanged.
+
+    Args:
+        df (pd.DataFrame or Transcript): Cue table with 'Speaker' and either 'StartMs'/'EndMs' or
+            'StartTime'/'EndTime' columns, or a Transcript whose arrays are used as they are.
+
+    Returns:
+        SpeakerStats: The per-speaker statistics.
+    """
+    # Integer code of each turn's speaker into the sorted speaker list, -1 for turns without a speaker
+    start_ms, end_ms, codes, speakers = turn_columns(df)
+    durations = end_ms - start_ms
+    keep = codes >= 0
+    codes, durations = codes[keep], durations[keep]
+
+    if not len(speakers):
+        empty = np.zeros(0, dtype=np.int64)
+        return SpeakerStats((), empty, empty, empty)
+
+    # One weighted count per speaker code; speakers of the table without any turn get zeros
+    talk_ms = np.bincount(codes, weights=durations, minlength=len(speakers)).astype(np.int64)
+    turns = np.bincount(codes, minlength=len(speakers)).astype(np.int64)
+    longest_ms = np.zeros(len(speakers), dtype=np.int64)
+    np.maximum.at(longest_ms, codes, durations)
+
+    return SpeakerStats(
+        speakers=tuple(speakers),
+        talk_ms=talk_ms,
+        turns=turns,
+        longest_ms=longest_ms,
+    )
@@ -1,43 +1,27 @@
 import matplotlib.pyplot as plt
-import pandas as pd
 import numpy as np
+from packages.speaker_stats import SpeakerStats, compute_speaker_stats
 
-def create_stats_figure(df):
+def create_stats_figure(data):
     """
-    Generate a figure containing pie charts for various statistical data about speakers.
+    Generate a figure containing pie charts for various statistical data about speakers. The numbers come
+    from compute_speaker_stats; this function only draws them.
     
     Parameters:
-    - df (pandas.DataFrame): DataFrame containing 'StartTime', 'EndTime', 'Speaker', and 'Text' columns.
+    - data (pandas.DataFrame, Transcript or SpeakerStats): DataFrame containing 'StartTime', 'EndTime', 'Speaker',
+      and 'Text' columns, a Transcript, or statistics already computed by compute_speaker_stats.
     
     Returns:
     - matplotlib.figure.Figure: Figure object containing the plotted data.
     """
 
-    # Convert time columns to datetime objects for easier manipulation
-    df['StartTime'] = pd.to_datetime(df['StartTime'], format='%H:%M:%S.%f')
-    df['EndTime'] = pd.to_datetime(df['EndTime'], format='%H:%M:%S.%f')
+    # Compute the statistics unless they are given
+    speaker_stats = data if isinstance(data, SpeakerStats) else compute_speaker_stats(data)
+    table = speaker_stats.to_frame()
 
-    # Calculate duration for each record in seconds
-    df['Duration'] = (df['EndTime'] - df['StartTime']).dt.total_seconds()
-
-    # Calculate total duration for normalization purposes
-    total_duration = df['Duration'].sum()
-
-    # Compute total duration per speaker and convert to percentage of total
-    speaker_durations = df.groupby('Speaker')['Duration'].sum()
-    speaker_percentages = (speaker_durations / total_duration) * 100
-
-    # Count the number of turns each speaker has
-    speaker_turns = df.groupby('Speaker')['Text'].count()
-
-    # Calculate average duration of turns for each speaker
-    speaker_avg_turns = df.groupby('Speaker')['Duration'].mean()
-    
-    # Find the longest duration of turn per speaker
-    speaker_longest_run = df.groupby('Speaker')['Duration'].max()
-
-    # Compile stats into a list for plotting
-    stats = [speaker_percentages, speaker_turns, speaker_avg_turns, speaker_longest_run]
+    # Compile stats into a list for plotting: talking time in percent, number of turns,
+    # average and longest turn in seconds
+    stats = [table['TalkPercent'], table['Turns'], table['AverageTurn'], table['LongestTurn']]
     
     # Titles for each subplot
     titles = ['Talking Time for Each Speaker (%)',
@@ -51,7 +35,7 @@ def create_stats_figure(df):
 
     # Use a colormap for consistent coloring across the pies
     cmap = plt.get_cmap('Pastel2')
-    colors = cmap(np.linspace(0, 1, len(speaker_durations)))
+    colors = cmap(np.linspace(0, 1, len(table)))
 
     def format(pct, alldata, i):
         """
@@ -95,7 +79,7 @@ def create_stats_figure(df):
     legend_labels = [f'Speaker {j+1}' for j in range(len(stats[0]))]
     fig.legend(legend_labels, loc='lower center', bbox_to_anchor=(0.5, 0), ncol=len(legend_labels), title="Speakers")
 
-    return None
+    return fig
 
 
 # # # Debugging
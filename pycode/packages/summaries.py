@@ -1,16 +1,78 @@
-from typing import List
-from transformers import BartForConditionalGeneration, BartTokenizer
-import torch
+import os
+import warnings
+from typing import List, Optional
+from dataclasses import dataclass
 # from chunk_splitter import split_text_into_chunks
 from sumy.parsers.plaintext import PlaintextParser
 from sumy.nlp.tokenizers import Tokenizer
 from sumy.summarizers.luhn import LuhnSummarizer
-from typing import List
 import re
+from packages.models import get_summarization_model, get_tokenizer, tokenizer_lock, MODEL_NAME, DISTILLED_MODEL_NAME
+from packages.instrumentation import span
 
-# Load the BART-large-cnn model and tokenizer
-model = BartForConditionalGeneration.from_pretrained('facebook/bart-large-cnn')
-tokenizer = BartTokenizer.from_pretrained('facebook/bart-large-cnn')
+# The BART-large-cnn model and tokenizer are loaded on first use through packages.models
+
+
+@dataclass(frozen=True)
+class InferenceConfig:
+    """
+    How abstractive summaries are computed: which checkpoint, whether its linear layers are quantized to int8,
+    and how many threads torch uses. Quantized models always run on CPU.
+
+    Attributes:
+        model_name (str): Checkpoint of the model, e.g. MODEL_NAME or DISTILLED_MODEL_NAME.
+        quantize (bool): Dynamic int8 quantization of the linear layers.
+        intra_op_threads (int, optional): Threads used inside an operation, torch.set_num_threads. None keeps the torch default.
+        inter_op_threads (int, optional): Threads running independent operations, torch.set_interop_threads. It can
+            only be set once per process, before torch runs anything in parallel. None keeps the torch default.
+    """
+    model_name: str = MODEL_NAME
+    quantize: bool = False
+    intra_op_threads: Optional[int] = None
+    inter_op_threads: Optional[int] = None
+
+    @property
+    def cache_name(self):
+        """Name of the model in result cache keys, since quantization changes the summaries slightly."""
+        return self.model_name + ("-int8" if self.quantize else "")
+
+    def device(self):
+        """Device the model runs on: the GPU when there is one and the model is not quantized."""
+        import torch
+        return "cuda" if torch.cuda.is_available() and not self.quantize else "cpu"
+
+    def apply_threads(self):
+        """Apply the thread counts to torch."""
+        import torch
+        if self.intra_op_threads and torch.get_num_threads() != self.intra_op_threads:
+            torch.set_num_threads(self.intra_op_threads)
+        if self.inter_op_threads and torch.get_num_interop_threads() != self.inter_op_threads:
+            try:
+                torch.set_interop_threads(self.inter_op_threads)
+            except RuntimeError:
+                warnings.warn("torch already started its inter-op thread pool; inter_op_threads is ignored.")
+
+
+# Presets, selectable by name
+INFERENCE_CONFIGS = {
+    "baseline": InferenceConfig(),
+    "cpu": InferenceConfig(quantize=True),
+    "distilled": InferenceConfig(model_name=DISTILLED_MODEL_NAME),
+    "distilled-cpu": InferenceConfig(model_name=DISTILLED_MODEL_NAME, quantize=True),
+}
+
+# Preset used when none is given, overridable through the environment, e.g. MEETINSIGHT_INFERENCE=distilled-cpu
+DEFAULT_INFERENCE = os.environ.get("MEETINSIGHT_INFERENCE", "baseline")
+
+
+def default_config() -> InferenceConfig:
+    """
+    The inference preset selected by MEETINSIGHT_INFERENCE, baseline fp32 BART-large-cnn by default.
+
+    Returns:
+        InferenceConfig: The preset.
+    """
+    return INFERENCE_CONFIGS[DEFAULT_INFERENCE]
 
 def abstractive_summarize_chunks(chunks: List[str]) -> str:
     """
@@ -22,6 +84,11 @@ def abstractive_summarize_chunks(chunks: List[str]) -> str:
     Returns:
         str: A concatenated summary of all chunks.
     """
+    # torch is only imported once a summary is actually requested
+    import torch
+
+    model = get_summarization_model()
+    tokenizer = get_tokenizer()
     device = "cuda" if torch.cuda.is_available() else "cpu"
     model.to(device)
     
@@ -29,27 +96,114 @@ def abstractive_summarize_chunks(chunks: List[str]) -> str:
     
     for chunk in chunks:
         # Encode the text for input to BART
-        inputs = tokenizer.encode(chunk, return_tensors="pt", max_length=1024, truncation=True)
+        with tokenizer_lock(), span("tokenizer.encode", size=1):
+            inputs = tokenizer.encode(chunk, return_tensors="pt", max_length=1024, truncation=True)
         inputs = inputs.to(device)
         
         # Generate summary
-        summary_ids = model.generate(inputs, max_length=20, min_length=10, length_penalty=2.0, num_beams=4, early_stopping=True)
+        with span("model.generate", size=1, model=MODEL_NAME):
+            summary_ids = model.generate(inputs, max_length=20, min_length=10, length_penalty=2.0, num_beams=4, early_stopping=True)
         
         # Decode and clean up the summary
-        summary_text = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+        with tokenizer_lock():
+            summary_text = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
         summaries.append(summary_text)
     
     # Combine all summaries into one final text
     final_summary = " ".join(summaries)
     return final_summary
 
-def extractive_summarize_chunks(chunks: List[str], sentences_count: int = 1) -> str:
+def abstractive_summarize_batch(chunks: List[str], batch_size: int = 8, num_beams: int = 4,
+                                max_length: int = 20, min_length: int = 10, progress=None,
+                                config: Optional[InferenceConfig] = None) -> List[str]:
+    """
+    Summarize chunks of text in padded batches. Chunks are sorted by token length before batching so that
+    each batch holds inputs of similar length and little padding is generated, and the summaries are put
+    back in the original chunk order.
+
+    Args:
+        chunks (List[str]): List of text chunks to be summarized.
+        batch_size (int, optional): Number of chunks passed to a single generate call. Defaults to 8.
+        num_beams (int, optional): Number of beams used by beam search. Defaults to 4.
+        max_length (int, optional): Maximum length of each summary in tokens. Defaults to 20.
+        min_length (int, optional): Minimum length of each summary in tokens. Defaults to 10.
+        progress (Callable[[int, int], None], optional): Called with (chunks done, total chunks) after each batch.
+        config (InferenceConfig, optional): Model, quantization and threads. Defaults to default_config().
+
+    Returns:
+        List[str]: The summary of each chunk, in the order of `chunks`.
+    """
+    if not chunks:
+        return []
+
+    import torch
+
+    config = config or default_config()
+    config.apply_threads()
+    model = get_summarization_model(config.model_name, config.quantize)
+    tokenizer = get_tokenizer(config.model_name)
+    device = config.device()
+    model.to(device)
+
+    # Measure every chunk once to group inputs of similar length, longest first
+    with tokenizer_lock(config.model_name), span("tokenizer.encode", size=len(chunks)):
+        lengths = [len(ids) for ids in tokenizer(chunks, max_length=1024, truncation=True)["input_ids"]]
+    order = sorted(range(len(chunks)), key=lambda i: lengths[i], reverse=True)
+
+    summaries = [None] * len(chunks)
+
+    with torch.no_grad():
+        for start in range(0, len(order), batch_size):
+            batch_indices = order[start:start + batch_size]
+
+            # Encode the batch, padding every input to the longest one
+            with tokenizer_lock(config.model_name), span("tokenizer.encode", size=len(batch_indices)):
+                inputs = tokenizer([chunks[i] for i in batch_indices], return_tensors="pt", padding=True,
+                                   max_length=1024, truncation=True)
+            inputs = inputs.to(device)
+
+            # Generate the summaries of the whole batch at once; the size counts the input tokens, padding included
+            with span("model.generate", size=int(inputs["input_ids"].numel()), model=config.cache_name):
+                summary_ids = model.generate(inputs["input_ids"], attention_mask=inputs["attention_mask"],
+                                             max_length=max_length, min_length=min_length, length_penalty=2.0,
+                                             num_beams=num_beams, early_stopping=True)
+
+            # Decode and store each summary at the position of its chunk
+            with tokenizer_lock(config.model_name):
+                decoded = tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+            for i, summary_text in zip(batch_indices, decoded):
+                summaries[i] = summary_text
+
+            if progress is not None:
+                progress(start + len(batch_indices), len(order))
+
+    return summaries
+
+def batch_abstractive_summarize_chunks(chunks: List[str], batch_size: int = 8, num_beams: int = 4, progress=None) -> str:
+    """
+    Summarize chunks of text in padded batches and concatenate all summaries into a final summary text.
+    Produces the same kind of output as abstractive_summarize_chunks with far fewer generate calls.
+
+    Args:
+        chunks (List[str]): List of text chunks to be summarized.
+        batch_size (int, optional): Number of chunks passed to a single generate call. Defaults to 8.
+        num_beams (int, optional): Number of beams used by beam search. Defaults to 4.
+        progress (Callable[[int, int], None], optional): Called with (chunks done, total chunks) after each batch.
+
+    Returns:
+        str: A concatenated summary of all chunks.
+    """
+    # Combine all summaries into one final text, in chunk order
+    return " ".join(abstractive_summarize_batch(chunks, batch_size=batch_size, num_beams=num_beams, progress=progress))
+
+def extractive_summarize_chunks(chunks: List[str], sentences_count: int = 1, progress=None) -> str:
     """
     Summarize each chunk of text using the Luhn heuristic method for extractive summarization and concatenate all summaries into a final summary text.
     
     Args:
         chunks (List[str]): List of text chunks to be summarized.
         sentences_count (int): Number of sentences to include in the summary of each chunk.
+        progress (Callable[[int, int], None], optional): Called with (chunks done, total chunks) after each chunk.
     
     Returns:
         str: A concatenated summary of all chunks.
@@ -58,12 +212,15 @@ def extractive_summarize_chunks(chunks: List[str], sentences_count: int = 1) ->
     summaries = []
     summarizer = LuhnSummarizer()
     
-    for chunk in chunks:
+    for done, chunk in enumerate(chunks, start=1):
         parser = PlaintextParser.from_string(chunk, Tokenizer("english"))
         summary = summarizer(parser.document, sentences_count)
         
         summarized_text = ' '.join([sentence._text for sentence in summary])
         summaries.append(summarized_text)
+
+        if progress is not None:
+            progress(done, len(chunks))
     
     # Combine all summaries into one final text
     final_summary = "".join(summaries)
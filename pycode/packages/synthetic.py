@@ -0,0 +1,193 @@
+import os
+from dataclasses import dataclass, replace
+from typing import Optional
+import numpy as np
+from packages.transcript import Transcript
+from packages.vtt_formatting import format_milliseconds
+
+# Words drawn at random when no text corpus is given
+DEFAULT_VOCABULARY = (
+    "the we I you it that to and of a is in so think yeah okay um uh but just like would need should "
+    "project meeting design team user budget remote control button feature deadline next week idea "
+    "agree maybe really good point question data model report slide market price cost product test "
+    "decide plan task change issue review draft customer option problem solution time today"
+).split()
+
+# Speaking rate of the synthetic speakers, as measured on data/example_transcripts.vtt
+MS_PER_WORD = 300
+
+
+@dataclass(frozen=True)
+class SyntheticConfig:
+    """
+    Shape of a synthetic meeting. Cue lengths follow a log-normal distribution, speakers take turns with
+    Zipf-like weights (a few speakers dominate, as in real meetings), and the cues are spread over the
+    requested duration with random pauses in between.
+
+    Attributes:
+        duration_s (float): Length of the meeting in seconds.
+        cues (int): Number of cues.
+        speakers (int): Number of speakers.
+        words_median (float): Median number of words per cue.
+        words_sigma (float): Spread of the log-normal distribution of cue lengths.
+        max_words (int): Longest cue in words.
+        overlap_rate (float): Share of the cues starting before the previous cue ended, spoken by another speaker.
+        seed (int): Seed of the random generator; a configuration always generates the same meeting.
+        source (str, optional): Text file, or directory of .txt files such as data/ami-transcripts, the cue texts
+            are cut from. Random words from DEFAULT_VOCABULARY by default.
+    """
+    duration_s: float = 3600.0
+    cues: int = 1000
+    speakers: int = 6
+    words_median: float = 8.0
+    words_sigma: float = 0.8
+    max_words: int = 120
+    overlap_rate: float = 0.05
+    seed: int = 0
+    source: Optional[str] = None
+
+    def scaled(self, factor):
+        """The same meeting shape, `factor` times longer and with `factor` times more cues."""
+        return replace(self, duration_s=self.duration_s * factor, cues=int(self.cues * factor))
+
+
+# Presets, selectable by name
+PRESETS = {
+    # Shape of data/example_transcripts.vtt
+    "example": SyntheticConfig(duration_s=889.0, cues=75, speakers=4, words_median=23.0, words_sigma=1.2),
+    "meeting": SyntheticConfig(),
+    # Full-day workshop
+    "workshop": SyntheticConfig(duration_s=8 * 3600.0, cues=20000, speakers=40, words_median=3.5),
+}
+
+
+def corpus_words(source):
+    """
+    Read the words of a text file, or of every .txt file of a directory in a stable order.
+
+    Args:
+        source (str): The file or directory.
+
+    Returns:
+        np.ndarray: The words, in reading order.
+    """
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in sorted(os.listdir(source)) if name.endswith(".txt")]
+    else:
+        paths = [source]
+
+    words = []
+    for path in paths:
+        with open(path, encoding="utf-8") as file:
+            words.extend(file.read().split())
+    if not words:
+        raise ValueError(f"No text found in {source}")
+    return np.array(words, dtype=object)
+
+
+def generate_transcript(config=None):
+    """
+    Generate a synthetic meeting.
+
+    Args:
+        config (SyntheticConfig, optional): Shape of the meeting. Defaults to SyntheticConfig().
+
+    Returns:
+        Transcript: The meeting, with speakers "Speaker 1" to "Speaker N".
+    """
+    config = config or SyntheticConfig()
+    rng = np.random.default_rng(config.seed)
+    count = config.cues
+
+    # Cue lengths in words
+    lengths = np.clip(np.rint(rng.lognormal(np.log(config.words_median), config.words_sigma, count)),
+                      1, config.max_words).astype(np.int64)
+
+    # Speakers: Zipf-like weights, and an overlapping cue always comes from someone else
+    weights = 1.0 / np.arange(1, config.speakers + 1)
+    speaker_ids = rng.choice(config.speakers, size=count, p=weights / weights.sum()).astype(np.int32)
+    overlaps = rng.random(count) < config.overlap_rate
+    overlaps[0] = False
+    if config.speakers > 1:
+        same = overlaps[1:] & (speaker_ids[1:] == speaker_ids[:-1])
+        shift = rng.integers(1, config.speakers, size=int(same.sum()))
+        speaker_ids[1:][same] = (speaker_ids[1:][same] + shift) % config.speakers
+
+    # Speech time of every cue, scaled down if the cues do not fit in the duration
+    durations = lengths * MS_PER_WORD * rng.uniform(0.8, 1.25, count)
+    duration_ms = config.duration_s * 1000
+    speech = durations[~overlaps].sum()
+    if speech > duration_ms:
+        durations *= duration_ms / speech
+        speech = duration_ms
+
+    # Pauses share the remaining time; an overlapping cue starts inside the previous one instead
+    pauses = rng.exponential(1.0, count)
+    pauses[overlaps] = 0
+    pauses *= (duration_ms - speech) / max(pauses.sum(), 1e-9)
+    starts = np.empty(count)
+    ends = np.empty(count)
+    position = 0.0
+    overlap_at = rng.uniform(0.3, 0.9, count)
+    for i in range(count):
+        if overlaps[i]:
+            start = starts[i - 1] + overlap_at[i] * (ends[i - 1] - starts[i - 1])
+        else:
+            start = position + pauses[i]
+        starts[i] = start
+        ends[i] = start + durations[i]
+        position = max(position, ends[i])
+
+    # Overlapping cues may run past the end of the cue they overlap: shrink the timeline back to the duration
+    if position > duration_ms:
+        starts *= duration_ms / position
+        ends *= duration_ms / position
+
+    # Texts: windows of the corpus at random offsets, or random words
+    if config.source is not None:
+        words = corpus_words(config.source)
+        offsets = rng.integers(0, max(len(words) - config.max_words, 1), size=count)
+        texts = [" ".join(words[offset:offset + length]) for offset, length in zip(offsets.tolist(), lengths.tolist())]
+    else:
+        vocabulary = np.array(DEFAULT_VOCABULARY, dtype=object)
+        drawn = vocabulary[rng.integers(0, len(vocabulary), size=int(lengths.sum()))]
+        bounds = np.concatenate(([0], np.cumsum(lengths))).tolist()
+        texts = [" ".join(drawn[bounds[i]:bounds[i + 1]]).capitalize() + "." for i in range(count)]
+
+    speakers = [f"Speaker {i + 1}" for i in range(config.speakers)]
+    return Transcript.from_columns(np.rint(starts).astype(np.int64), np.rint(ends).astype(np.int64),
+                                   speaker_ids, speakers, texts)
+
+
+def write_vtt(transcript, file_path):
+    """
+    Write a transcript as a VTT file with voice tags, in the layout of Teams exports.
+
+    Args:
+        transcript (Transcript): The transcript.
+        file_path (str): Path of the VTT file written.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    os.makedirs(directory, exist_ok=True)
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.write("WEBVTT\n\n")
+        for i, (start, end) in enumerate(zip(transcript.start_ms.tolist(), transcript.end_ms.tolist())):
+            speaker = transcript.speaker(i)
+            text = transcript.text(i) if speaker is None else f"<v {speaker}>{transcript.text(i)}</v>"
+            file.write(f"{format_milliseconds(start)} --> {format_milliseconds(end)}\n{text}\n\n")
+
+
+def generate_vtt(file_path, config=None):
+    """
+    Generate a synthetic meeting and write it as a VTT file.
+
+    Args:
+        file_path (str): Path of the VTT file written.
+        config (SyntheticConfig, optional): Shape of the meeting. Defaults to SyntheticConfig().
+
+    Returns:
+        Transcript: The meeting written.
+    """
+    transcript = generate_transcript(config)
+    write_vtt(transcript, file_path)
+    return transcript
@@ -1,33 +1,48 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 import matplotlib.patches as patches
-from matplotlib.ticker import MaxNLocator
-from matplotlib.dates import DateFormatter
+from matplotlib.ticker import MaxNLocator, FuncFormatter
+from packages.transcript import turn_columns
+
+def format_seconds(seconds, _=None):
+    """
+    Format a position of the time axis, in seconds, as HH:MM:SS.
+
+    Args:
+        seconds (float): Position on the time axis.
+
+    Returns:
+        str: The formatted time.
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
 
 def create_timeline_figure(df):
     """
     Generate a timeline figure illustrating the durations each speaker spoke in a conversation.
     This function uses the Matplotlib library to create a timeline from a DataFrame that contains
-    start and end times along with speaker identifiers.
+    start and end times along with speaker identifiers. Each speaker's turns are drawn in a single
+    vectorized broken_barh call, and the DataFrame is left unchanged.
 
     Args:
-        df (pd.DataFrame): DataFrame containing the columns 'StartTime', 'EndTime', and 'Speaker',
-        where time columns are in the format HH:MM:SS.sss.
+        df (pd.DataFrame or Transcript): DataFrame containing the columns 'StartMs' and 'EndMs' written by format_VTT,
+        or 'StartTime' and 'EndTime' in the format HH:MM:SS.sss, and 'Speaker'. A Transcript is used without conversion.
 
     Returns:
         matplotlib.figure.Figure: The matplotlib figure object representing the timeline.
     """
-    # Convert start and end times in the DataFrame to datetime objects
-    df['StartTime'] = pd.to_datetime(df['StartTime'], format='%H:%M:%S.%f')
-    df['EndTime'] = pd.to_datetime(df['EndTime'], format='%H:%M:%S.%f')
-    
-    # Extract and sort unique speakers
-    speakers = sorted(df['Speaker'].unique())
+    # Cue times in milliseconds and sorted unique speakers, as integer codes into the sorted speaker list
+    start_ms, end_ms, codes, speakers = turn_columns(df)
+    speakers = list(speakers)
+
+    # Start times and durations in seconds, as numeric arrays
+    starts = start_ms / 1000
+    durations = (end_ms - start_ms) / 1000
     
     # Define the base height per speaker and calculate total figure height
     base_height_per_speaker = 1  # Height per speaker in inches
-    fig_height = len(speakers) * base_height_per_speaker
+    fig_height = max(len(speakers), 1) * base_height_per_speaker
     
     # Create a figure and axis with dynamically calculated height
     fig, ax = plt.subplots(figsize=(8, fig_height))
@@ -35,38 +50,35 @@ def create_timeline_figure(df):
     # Hide unnecessary spines (borders)
     for spine in ['top', 'right', 'bottom', 'left']:
         ax.spines[spine].set_visible(False)
-    
-    # Map speakers to vertical positions on the plot
-    speaker_positions = {speaker: idx for idx, speaker in enumerate(speakers)}
 
     # Create a color map for the speakers
     cmap = plt.get_cmap('Pastel2')
     colors = cmap(np.linspace(0, 1, len(speakers)))
+
+    # Group the cue indices by speaker in one pass: a stable sort on the codes, then the
+    # boundaries of each speaker's run. Cues without a speaker (code -1) sort first and are skipped
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(speakers) + 1))
     
     # Initialize legend patches for adding to the legend later
     legend_patches = []
 
-    # Plot each speaker's speaking durations as rectangles on the timeline
+    # Plot each speaker's speaking durations as one collection of bars on the timeline
     for idx, speaker in enumerate(speakers):
-        speaker_df = df[df['Speaker'] == speaker]
+        turns = order[bounds[idx]:bounds[idx + 1]]
         color = colors[idx]
-        for _, row in speaker_df.iterrows():
-            start = row['StartTime']
-            end = row['EndTime']
-            ax.add_patch(
-                patches.Rectangle(
-                    (start, speaker_positions[speaker] - 0.15), end - start, 0.5, color=color, alpha=0.5
-                )
-            )
+        ax.broken_barh(np.column_stack((starts[turns], durations[turns])), (idx - 0.15, 0.5),
+                       facecolors=color, alpha=0.5)
         legend_patches.append(patches.Patch(color=color, label=speaker, alpha=0.5))
     
     # Add a legend to the plot
     # ax.legend(handles=legend_patches, loc='upper right')
 
     # Format the x-axis with appropriate time labels and set axis limits
-    ax.xaxis.set_major_formatter(DateFormatter('%H:%M:%S'))
+    ax.xaxis.set_major_formatter(FuncFormatter(format_seconds))
     ax.xaxis.set_major_locator(MaxNLocator(nbins=10))
-    ax.set_xlim(df['StartTime'].min(), df['EndTime'].max())
+    if len(starts):
+        ax.set_xlim(starts.min(), (end_ms.max() / 1000))
 
     # Set y-axis ticks and labels
     ax.set_yticks(range(len(speakers)))
@@ -79,7 +91,7 @@ def create_timeline_figure(df):
     # Add a title to the plot
     ax.set_title('Timeline of the Conversation')
 
-    return None
+    return fig
 
 # # Debugging
 # from vtt_formatting import format_VTT
@@ -0,0 +1,238 @@
+import numpy as np
+import pandas as pd
+from packages.vtt_formatting import _read_vtt_columns, cue_times_ms, format_milliseconds
+
+# Dtypes of the columns of a transcript
+TIME_DTYPE = np.int64
+SPEAKER_DTYPE = np.int32
+OFFSET_DTYPE = np.int64
+
+
+class Transcript:
+    """
+    Compact, array-backed transcript. Cue times are integer milliseconds, speakers are interned as integer
+    ids into a lookup table and all the texts share one UTF-8 buffer addressed by byte offsets, so a parsed
+    meeting costs a few arrays instead of one Python string per field and per cue. The arrays are exposed
+    as they are, and to_frame builds a DataFrame over them without copying.
+
+    Args:
+        start_ms (np.ndarray): Start of every cue in milliseconds.
+        end_ms (np.ndarray): End of every cue in milliseconds.
+        speaker_ids (np.ndarray): Index of the speaker of every cue in `speakers`, -1 for cues without a speaker.
+        speakers (Sequence[str]): Speaker lookup table.
+        text_buffer (bytes-like): UTF-8 texts of all the cues, one after the other.
+        text_offsets (np.ndarray): Byte offsets of the texts in `text_buffer`, one more than the number of cues.
+        timed (bool, optional): False for transcripts without timestamps, e.g. plain text. Defaults to True.
+    """
+
+    def __init__(self, start_ms, end_ms, speaker_ids, speakers, text_buffer, text_offsets, timed=True):
+        self.start_ms = np.asarray(start_ms, dtype=TIME_DTYPE)
+        self.end_ms = np.asarray(end_ms, dtype=TIME_DTYPE)
+        self.speaker_ids = np.asarray(speaker_ids, dtype=SPEAKER_DTYPE)
+        self.speakers = tuple(speakers)
+        self.text_buffer = text_buffer
+        self.text_offsets = np.asarray(text_offsets, dtype=OFFSET_DTYPE)
+        self.timed = timed
+
+        if not len(self.start_ms) == len(self.end_ms) == len(self.speaker_ids) == len(self.text_offsets) - 1:
+            raise ValueError("The columns of a transcript must have one entry per cue.")
+
+    @classmethod
+    def from_columns(cls, start_ms, end_ms, speaker_ids, speakers, texts, timed=True):
+        """
+        Build a transcript from its columns, packing the texts into one buffer.
+
+        Args:
+            start_ms (array-like): Start of every cue in milliseconds.
+            end_ms (array-like): End of every cue in milliseconds.
+            speaker_ids (array-like): Index of the speaker of every cue in `speakers`, -1 for none.
+            speakers (Sequence[str]): Speaker lookup table.
+            texts (Iterable[str]): Text of every cue.
+            timed (bool, optional): False for transcripts without timestamps. Defaults to True.
+
+        Returns:
+            Transcript: The transcript.
+        """
+        encoded = [str(text).encode("utf-8") for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=OFFSET_DTYPE)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=OFFSET_DTYPE, count=len(encoded)), out=offsets[1:])
+        return cls(start_ms, end_ms, speaker_ids, speakers, b"".join(encoded), offsets, timed)
+
+    @classmethod
+    def from_vtt(cls, file_path, formatted_lines=None):
+        """
+        Parse a VTT file in a single streaming pass.
+
+        Args:
+            file_path (str): The path to the VTT file.
+            formatted_lines (list, optional): Forwarded to iter_vtt_cues to rebuild the formatted content.
+
+        Returns:
+            Transcript: The transcript, with the speakers in order of first appearance.
+        """
+        columns = _read_vtt_columns(file_path, formatted_lines)
+        speakers = columns["Speaker"]
+        return cls.from_columns(columns["StartMs"], columns["EndMs"], speakers.codes, list(speakers.categories),
+                                columns["Text"])
+
+    @classmethod
+    def from_text(cls, file_path):
+        """
+        Read a plain-text transcript, one untimed cue per sentence as in format_TXT.
+
+        Args:
+            file_path (str): The path to the text file.
+
+        Returns:
+            Transcript: The transcript, with `timed` set to False.
+        """
+        # Only plain-text transcripts need the sentence tokenizer
+        import nltk
+
+        with open(file_path, encoding="utf-8") as file:
+            sentences = nltk.sent_tokenize(file.read())
+
+        zeros = np.zeros(len(sentences), dtype=TIME_DTYPE)
+        return cls.from_columns(zeros, zeros, np.full(len(sentences), -1, dtype=SPEAKER_DTYPE), (), sentences, timed=False)
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Convert a cue table, e.g. from format_VTT, format_TXT or parse_VTT.
+
+        Args:
+            df (pd.DataFrame): Cue table with a 'Text' column and optionally 'Speaker' and timing columns.
+
+        Returns:
+            Transcript: The transcript.
+        """
+        timed = ("StartMs" in df and "EndMs" in df) or ("StartTime" in df and "EndTime" in df)
+        if timed:
+            start_ms, end_ms = cue_times_ms(df)
+        else:
+            start_ms = end_ms = np.zeros(len(df), dtype=TIME_DTYPE)
+
+        if "Speaker" in df:
+            # Categorical speakers already are ids into a lookup table
+            speaker_ids, speakers = pd.factorize(df["Speaker"].astype("category"))
+            speakers = list(speakers)
+        else:
+            speaker_ids, speakers = np.full(len(df), -1, dtype=SPEAKER_DTYPE), ()
+
+        return cls.from_columns(start_ms, end_ms, speaker_ids, speakers, df["Text"], timed)
+
+    def __len__(self):
+        return len(self.text_offsets) - 1
+
+    def __repr__(self):
+        return f"Transcript({len(self)} cues, {len(self.speakers)} speakers, {self.nbytes} bytes)"
+
+    @property
+    def durations_ms(self):
+        """Length of every cue in milliseconds."""
+        return self.end_ms - self.start_ms
+
+    @property
+    def nbytes(self):
+        """Memory held by the columns of the transcript, in bytes."""
+        return (self.start_ms.nbytes + self.end_ms.nbytes + self.speaker_ids.nbytes
+                + self.text_offsets.nbytes + len(self.text_buffer))
+
+    def text(self, index):
+        """
+        Decode the text of one cue.
+
+        Args:
+            index (int): Index of the cue.
+
+        Returns:
+            str: The text of the cue.
+        """
+        return str(self.text_buffer[self.text_offsets[index]:self.text_offsets[index + 1]], "utf-8")
+
+    def texts(self):
+        """
+        Decode the texts of all the cues.
+
+        Returns:
+            List[str]: The text of every cue.
+        """
+        buffer, offsets = self.text_buffer, self.text_offsets.tolist()
+        return [str(buffer[start:end], "utf-8") for start, end in zip(offsets[:-1], offsets[1:])]
+
+    def speaker(self, index):
+        """
+        Name of the speaker of one cue.
+
+        Args:
+            index (int): Index of the cue.
+
+        Returns:
+            str or None: The speaker, None if the cue has none.
+        """
+        speaker_id = self.speaker_ids[index]
+        return self.speakers[speaker_id] if speaker_id >= 0 else None
+
+    def speaker_codes(self, sort=False):
+        """
+        Speaker ids of the cues along with their lookup table, in the shape returned by pd.factorize.
+
+        Args:
+            sort (bool, optional): Renumber the speakers in alphabetical order. Defaults to False.
+
+        Returns:
+            tuple: The id of every cue (-1 for none) and the tuple of speakers.
+        """
+        if not sort:
+            return self.speaker_ids, self.speakers
+
+        # Rank of each speaker in alphabetical order, with -1 kept for cues without a speaker
+        order = sorted(range(len(self.speakers)), key=self.speakers.__getitem__)
+        rank = np.empty(len(order) + 1, dtype=SPEAKER_DTYPE)
+        rank[np.array(order, dtype=np.intp)] = np.arange(len(order), dtype=SPEAKER_DTYPE)
+        rank[-1] = -1
+        return rank[self.speaker_ids], tuple(self.speakers[i] for i in order)
+
+    def to_frame(self, timestamps=False):
+        """
+        View the transcript as a cue table. The time columns share memory with the transcript.
+
+        Args:
+            timestamps (bool, optional): Also add 'StartTime' and 'EndTime' strings, as written by format_VTT.
+                Defaults to False.
+
+        Returns:
+            pd.DataFrame: 'Text', plus 'Speaker' (categorical, missing for cues without a voice tag), 'StartMs' and
+            'EndMs' for timed transcripts, as format_VTT returns them; untimed ones have 'Speaker' only if they have speakers.
+        """
+        columns = {}
+        if self.timed and timestamps:
+            columns["StartTime"] = [format_milliseconds(ms) for ms in self.start_ms.tolist()]
+            columns["EndTime"] = [format_milliseconds(ms) for ms in self.end_ms.tolist()]
+        columns["Text"] = self.texts()
+        if self.speakers or self.timed:
+            columns["Speaker"] = pd.Categorical.from_codes(self.speaker_ids, categories=list(self.speakers))
+        if self.timed:
+            columns["StartMs"] = self.start_ms
+            columns["EndMs"] = self.end_ms
+        return pd.DataFrame(columns, copy=False)
+
+
+def turn_columns(data):
+    """
+    Timing and speaker columns of a transcript or of a cue table, for the statistics and plots.
+
+    Args:
+        data (Transcript or pd.DataFrame): The transcript, or a cue table with 'Speaker' and timing columns.
+
+    Returns:
+        tuple: Start and end times in milliseconds, speaker codes into the sorted speakers (-1 for cues without
+        a speaker) and the sorted speakers.
+    """
+    if isinstance(data, Transcript):
+        codes, speakers = data.speaker_codes(sort=True)
+        return data.start_ms, data.end_ms, codes, speakers
+
+    start_ms, end_ms = cue_times_ms(data)
+    codes, speakers = pd.factorize(data['Speaker'].to_numpy(dtype=object), sort=True)
+    return start_ms, end_ms, codes, tuple(speakers)
@@ -0,0 +1,324 @@
+import os
+import mmap
+import struct
+import hashlib
+import tempfile
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from packages.cache import DEFAULT_CACHE_DIR
+from packages.transcript import Transcript, TIME_DTYPE, SPEAKER_DTYPE, OFFSET_DTYPE
+
+# Where load_or_convert keeps the stores of transcripts opened from anywhere, overridable through the environment
+DEFAULT_STORE_DIR = os.environ.get("MEETINSIGHT_STORE_DIR", os.path.join(DEFAULT_CACHE_DIR, "transcripts"))
+
+# Extension of the store files
+STORE_EXTENSION = ".mtr"
+
+# File signature and format version, bumped whenever the layout changes
+MAGIC = b"MTRS"
+VERSION = 1
+
+# Header: magic, version, flags, cue count, byte lengths of the speaker table, texts and content,
+# then the size and modification time of the source file the store was converted from
+HEADER = struct.Struct("<4sHHQQQQQq")
+
+# Header flags
+FLAG_TIMED = 1
+
+# Every section starts on a multiple of this many bytes, so the arrays can be viewed in place
+ALIGNMENT = 8
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _layout(cue_count, speakers_nbytes, text_nbytes, content_nbytes):
+    """
+    Byte offsets of the sections of a store, in file order.
+
+    Returns:
+        dict: Section name -> (offset, byte length), plus 'end' -> (file size, 0).
+    """
+    sections = {}
+    offset = HEADER.size
+    for name, nbytes in (("start_ms", cue_count * np.dtype(TIME_DTYPE).itemsize),
+                         ("end_ms", cue_count * np.dtype(TIME_DTYPE).itemsize),
+                         ("speaker_ids", cue_count * np.dtype(SPEAKER_DTYPE).itemsize),
+                         ("text_offsets", (cue_count + 1) * np.dtype(OFFSET_DTYPE).itemsize),
+                         ("speakers", speakers_nbytes),
+                         ("texts", text_nbytes),
+                         ("content", content_nbytes)):
+        offset = _aligned(offset)
+        sections[name] = (offset, nbytes)
+        offset += nbytes
+    sections["end"] = (offset, 0)
+    return sections
+
+
+def write_store(transcript, content, path, source_stat=None):
+    """
+    Write a transcript and its text content to a store file. The file is written to a temporary name and
+    renamed, so readers never see a partial store.
+
+    Args:
+        transcript (Transcript): The parsed transcript.
+        content (str): Content of the transcript, as returned by format_VTT or format_TXT.
+        path (str): Path of the store file.
+        source_stat (os.stat_result, optional): Stat of the source file, used to detect stale stores.
+    """
+    speakers = "\0".join(transcript.speakers).encode("utf-8")
+    texts = bytes(transcript.text_buffer)
+    content = content.encode("utf-8")
+    cue_count = len(transcript)
+    sections = _layout(cue_count, len(speakers), len(texts), len(content))
+
+    header = HEADER.pack(MAGIC, VERSION, FLAG_TIMED if transcript.timed else 0, cue_count,
+                         len(speakers), len(texts), len(content),
+                         source_stat.st_size if source_stat else 0, source_stat.st_mtime_ns if source_stat else 0)
+    payloads = {
+        "start_ms": transcript.start_ms.astype(TIME_DTYPE, copy=False).tobytes(),
+        "end_ms": transcript.end_ms.astype(TIME_DTYPE, copy=False).tobytes(),
+        "speaker_ids": transcript.speaker_ids.astype(SPEAKER_DTYPE, copy=False).tobytes(),
+        "text_offsets": transcript.text_offsets.astype(OFFSET_DTYPE, copy=False).tobytes(),
+        "speakers": speakers,
+        "texts": texts,
+        "content": content,
+    }
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as file:
+            file.write(header)
+            for name, payload in payloads.items():
+                file.write(b"\0" * (sections[name][0] - file.tell()))
+                file.write(payload)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+def read_header(path):
+    """
+    Read and check the header of a store file.
+
+    Args:
+        path (str): Path of the store file.
+
+    Returns:
+        dict: The fields of the header.
+
+    Raises:
+        ValueError: If the file is not a store, or was written by another version of the format.
+    """
+    with open(path, "rb") as file:
+        raw = file.read(HEADER.size)
+    if len(raw) < HEADER.size or raw[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a transcript store.")
+
+    fields = dict(zip(("magic", "version", "flags", "cue_count", "speakers_nbytes", "text_nbytes",
+                       "content_nbytes", "source_size", "source_mtime_ns"), HEADER.unpack(raw)))
+    if fields["version"] != VERSION:
+        raise ValueError(f"{path} uses version {fields['version']} of the transcript store, expected {VERSION}.")
+    return fields
+
+
+def open_store(path):
+    """
+    Open a store file through mmap. The arrays of the transcript are views of the mapped file, so nothing
+    is parsed and pages are only read from disk when they are used.
+
+    Args:
+        path (str): Path of the store file.
+
+    Returns:
+        tuple: The Transcript and its content as a string, like format_VTT returns a DataFrame and its content.
+
+    Raises:
+        ValueError: If the file is not a store, was written by another version of the format or is truncated.
+    """
+    header = read_header(path)
+    cue_count = header["cue_count"]
+    sections = _layout(cue_count, header["speakers_nbytes"], header["text_nbytes"], header["content_nbytes"])
+
+    with open(path, "rb") as file:
+        # The mapping stays alive as long as the arrays viewing it
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapped) < sections["end"][0]:
+        raise ValueError(f"{path} is truncated.")
+
+    def view(name, dtype, count):
+        return np.frombuffer(mapped, dtype=dtype, count=count, offset=sections[name][0])
+
+    def raw(name):
+        offset, nbytes = sections[name]
+        return memoryview(mapped)[offset:offset + nbytes]
+
+    speakers = str(raw("speakers"), "utf-8")
+    transcript = Transcript(
+        start_ms=view("start_ms", TIME_DTYPE, cue_count),
+        end_ms=view("end_ms", TIME_DTYPE, cue_count),
+        speaker_ids=view("speaker_ids", SPEAKER_DTYPE, cue_count),
+        speakers=speakers.split("\0") if speakers else (),
+        text_buffer=raw("texts"),
+        text_offsets=view("text_offsets", OFFSET_DTYPE, cue_count + 1),
+        timed=bool(header["flags"] & FLAG_TIMED),
+    )
+    return transcript, str(raw("content"), "utf-8")
+
+
+def parse_source(file_path):
+    """
+    Parse a .vtt or .txt transcript into a Transcript and its content.
+
+    Args:
+        file_path (str): Path to a .vtt or .txt transcript.
+
+    Returns:
+        tuple: The Transcript and its content, the formatted VTT content for .vtt files.
+    """
+    if file_path.lower().endswith(".vtt"):
+        formatted_lines = []
+        transcript = Transcript.from_vtt(file_path, formatted_lines)
+        return transcript, "\n".join(formatted_lines)
+
+    transcript = Transcript.from_text(file_path)
+    with open(file_path, encoding="utf-8") as file:
+        return transcript, file.read()
+
+
+def convert_file(source, target=None, index=True):
+    """
+    Convert a .vtt or .txt transcript to a store file. The transcript is also added to the search index,
+    unless MEETINSIGHT_AUTO_INDEX=0 or indexing is suspended (see search_index.auto_index_suspended).
+
+    Args:
+        source (str): Path to the transcript.
+        target (str, optional): Path of the store file. Defaults to store_path(source), where load_or_convert looks.
+        index (bool, optional): Add the transcript to the search index. Defaults to True.
+
+    Returns:
+        str: Path of the store file written.
+    """
+    target = target or store_path(source)
+    source_stat = os.stat(source)
+    transcript, content = parse_source(source)
+    write_store(transcript, content, target, source_stat)
+
+    # Keep the search index in step with the transcripts as they are ingested
+    from packages.search_index import auto_indexing, index_transcript
+    if index and auto_indexing():
+        index_transcript(source, transcript, source_stat)
+    return target
+
+
+def is_up_to_date(source, target):
+    """
+    Whether a store file exists, has the current format and was converted from the current version of its source.
+
+    Args:
+        source (str): Path to the transcript.
+        target (str): Path of the store file.
+
+    Returns:
+        bool: True if the store can be used instead of parsing the source.
+    """
+    try:
+        header = read_header(target)
+        source_stat = os.stat(source)
+    except (OSError, ValueError):
+        return False
+    return header["source_size"] == source_stat.st_size and header["source_mtime_ns"] == source_stat.st_mtime_ns
+
+
+def store_path(source, store_dir=None):
+    """
+    Path of the store of a transcript in the store directory. The name combines a hash of the absolute
+    path, so files of the same name in different folders do not collide.
+
+    Args:
+        source (str): Path to the transcript.
+        store_dir (str, optional): Directory holding the stores. Defaults to DEFAULT_STORE_DIR.
+
+    Returns:
+        str: Path of the store file.
+    """
+    path_hash = hashlib.sha256(os.path.abspath(source).encode("utf-8")).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(store_dir or DEFAULT_STORE_DIR, f"{name}-{path_hash}{STORE_EXTENSION}")
+
+
+def load_or_convert(source, store_dir=None):
+    """
+    Load a transcript from its store, converting it first if the store is missing or stale. Reopening a
+    transcript then costs an mmap instead of a full parse.
+
+    Args:
+        source (str): Path to a .vtt or .txt transcript.
+        store_dir (str, optional): Directory holding the stores. Defaults to DEFAULT_STORE_DIR.
+
+    Returns:
+        tuple: The Transcript and its content.
+    """
+    target = store_path(source, store_dir)
+    if not is_up_to_date(source, target):
+        convert_file(source, target)
+    return open_store(target)
+
+
+def convert_directory(directory, store_dir=None, workers=None, force=False):
+    """
+    Convert every transcript of a directory, e.g. data/ami-transcripts, across a pool of worker processes.
+    The stores are written where load_or_convert looks for them, so later runs open them instead of parsing
+    the transcripts. Stores that are already up to date are skipped. The converted transcripts are added to the
+    search index once every conversion is done, in one commit.
+
+    Args:
+        directory (str): Directory holding .vtt or .txt transcripts.
+        store_dir (str, optional): Directory holding the stores. Defaults to DEFAULT_STORE_DIR.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        force (bool, optional): Convert the transcripts whose store is up to date too. Defaults to False.
+
+    Returns:
+        dict: Maps each transcript path to its store file, or to None if the conversion failed.
+    """
+    from packages.batch import find_transcripts
+
+    results = {}
+    pending = {}
+
+    for source in find_transcripts(directory):
+        target = store_path(source, store_dir)
+        if not force and is_up_to_date(source, target):
+            results[source] = target
+        else:
+            pending[source] = target
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(convert_file, source, target, False): source for source, target in pending.items()}
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as error:
+                    # Keep going with the rest of the corpus
+                    results[futures[future]] = None
+                    print(f"{os.path.basename(futures[future])} failed: {error}")
+
+    # Index what was converted in one commit, rather than one segment per transcript from every worker
+    from packages.search_index import auto_indexing, default_index
+    converted = [source for source in pending if results.get(source)]
+    if converted and auto_indexing():
+        try:
+            index = default_index()
+            for source in converted:
+                index.add(source, open_store(results[source])[0], os.stat(source))
+            index.commit()
+        except Exception as error:
+            warnings.warn(f"The converted transcripts could not be indexed: {error}")
+
+    return results
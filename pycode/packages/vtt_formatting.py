@@ -1,70 +1,240 @@
-import webvtt
 import re
+from array import array
+import numpy as np
 import pandas as pd
+from packages.instrumentation import span
+
+# Cue timing line, e.g. "0:1:4.540 --> 0:1:28.810". Hours are optional, as allowed by the VTT spec
+CUE_TIMING_PATTERN = re.compile(r"\s*(?:(\d+):)?(\d+):(\d+)\.(\d+)\s+-->\s+(?:(\d+):)?(\d+):(\d+)\.(\d+)")
+
+# Voice span carrying the speaker name, e.g. "<v Speaker 4>"
+VOICE_PATTERN = re.compile(r"<v(?:\.[^\s>]*)?\s+([^>]*)>")
+
+# Any cue text tag (voice, class, italics, ...)
+CUE_TAG_PATTERN = re.compile(r"<.*?>")
+
+
+def _to_milliseconds(hours, minutes, seconds, milliseconds):
+    """
+    Convert the captured fields of a timestamp into integer milliseconds.
+
+    Args:
+        hours (str or None): Hours field, None when the timestamp has no hours.
+        minutes (str): Minutes field.
+        seconds (str): Seconds field.
+        milliseconds (str): Fraction field, read as an integer number of milliseconds like format_VTT always did.
+
+    Returns:
+        int: The timestamp in milliseconds.
+    """
+    return ((int(hours or 0) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(milliseconds)
+
+
+def format_milliseconds(ms, hour_digits=2):
+    """
+    Format a number of milliseconds as a VTT timestamp.
+
+    Args:
+        ms (int): The timestamp in milliseconds.
+        hour_digits (int, optional): Zero padding applied to the hours. Defaults to 2.
+
+    Returns:
+        str: The timestamp formatted as HH:MM:SS.mmm.
+    """
+    seconds, milliseconds = divmod(int(ms), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:0{hour_digits}d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+
+def iter_vtt_cues(lines, formatted_lines=None):
+    """
+    Stream the cues out of the lines of a VTT file in a single pass. Timestamps are normalized and the speaker
+    is read from the voice tag while the cue is parsed, so the file never has to be rewritten or read twice.
+
+    Args:
+        lines (Iterable[str]): Lines of a VTT file, for example an open file object.
+        formatted_lines (list, optional): If given, every input line is appended to it with its timestamps
+            formatted as HHH:MM:SS.mmm, rebuilding the formatted VTT content along the way.
+
+    Yields:
+        tuple: (start_ms, end_ms, speaker, text) for each cue. Speaker is None when the cue has no voice tag.
+    """
+    timing = None  # Timing of the cue being read, None outside of a cue
+    payload = []  # Text lines of the cue being read
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+
+        if "-->" in line:
+            match = CUE_TIMING_PATTERN.match(line)
+            if match is None:
+                raise ValueError(f"Invalid cue timing: {line}")
+
+            # A timing line directly after another cue closes it
+            if timing is not None:
+                yield _build_cue(timing, payload)
+
+            fields = match.groups()
+            timing = (_to_milliseconds(*fields[:4]), _to_milliseconds(*fields[4:]))
+            payload = []
+
+            if formatted_lines is not None:
+                formatted_lines.append(f"{format_milliseconds(timing[0], 3)} --> {format_milliseconds(timing[1], 3)}")
+            continue
+
+        if formatted_lines is not None:
+            formatted_lines.append(line)
+
+        # Header, NOTE blocks and cue identifiers are not part of any cue
+        if timing is None:
+            continue
+
+        if line.strip():
+            payload.append(line)
+        else:
+            # A blank line ends the cue
+            yield _build_cue(timing, payload)
+            timing = None
+
+    # Flush the last cue if the file does not end with a blank line
+    if timing is not None:
+        yield _build_cue(timing, payload)
+
+
+def _build_cue(timing, payload):
+    """
+    Assemble a parsed cue from its timing and its text lines.
+
+    Args:
+        timing (tuple): Start and end of the cue in milliseconds.
+        payload (List[str]): Raw text lines of the cue, which may include cue tags.
+
+    Returns:
+        tuple: (start_ms, end_ms, speaker, text).
+    """
+    raw_text = "\n".join(payload)
+    voice = VOICE_PATTERN.match(raw_text)
+    speaker = voice.group(1) if voice else None
+    return timing[0], timing[1], speaker, CUE_TAG_PATTERN.sub("", raw_text)
+
+
+def _read_vtt_columns(file_path, formatted_lines=None):
+    """
+    Read a VTT file straight into columnar arrays.
+
+    Args:
+        file_path (str): The path to the VTT file.
+        formatted_lines (list, optional): Forwarded to iter_vtt_cues to rebuild the formatted content.
+
+    Returns:
+        dict: 'StartMs' and 'EndMs' as int64 arrays, 'Speaker' as a Categorical and 'Text' as a list of strings.
+    """
+    start = array("q")
+    end = array("q")
+    speaker_codes = array("i")
+    speaker_ids = {}  # Speaker name -> category code, in order of first appearance
+    text = []
+
+    with open(file_path, encoding="utf-8") as file:
+        for start_ms, end_ms, speaker, content in iter_vtt_cues(file, formatted_lines):
+            start.append(start_ms)
+            end.append(end_ms)
+            # Cues without a voice tag get the missing category code
+            speaker_codes.append(-1 if speaker is None else speaker_ids.setdefault(speaker, len(speaker_ids)))
+            text.append(content)
+
+    return {
+        "StartMs": np.frombuffer(start, dtype=np.int64),
+        "EndMs": np.frombuffer(end, dtype=np.int64),
+        "Speaker": pd.Categorical.from_codes(np.frombuffer(speaker_codes, dtype=np.int32), categories=list(speaker_ids)),
+        "Text": text,
+    }
+
+
+def parse_VTT(file_path):
+    """
+    Parse a VTT file into a columnar DataFrame in a single streaming pass, without writing any
+    intermediate file.
+
+    Args:
+        file_path (str): The path to the VTT file.
+
+    Returns:
+        pd.DataFrame: One row per cue with 'StartMs' and 'EndMs' (int64 milliseconds), 'Speaker' (categorical)
+        and 'Text' columns.
+    """
+    return pd.DataFrame(_read_vtt_columns(file_path))
+
 
 def format_VTT(file_path):
     """
     Read and process a VTT file to format its timestamps and extract data into a DataFrame.
-    This function also saves a new VTT file with formatted timestamps.
-    
+    The file is parsed once and nothing is written to disk, so several files can be processed concurrently.
+
     Args:
         file_path (str): The path to the VTT file that needs to be formatted and processed.
-        
+
     Returns:
         tuple: A tuple containing a DataFrame with the VTT data and the formatted VTT content as a string.
+        Besides 'StartTime', 'EndTime' (HH:MM:SS.mmm strings), 'Text' and 'Speaker', the DataFrame holds
+        the cue times in milliseconds as 'StartMs' and 'EndMs'.
     """
+    formatted_lines = []
+    with span("format_VTT") as trace:
+        columns = _read_vtt_columns(file_path, formatted_lines)
+
+        # Create a DataFrame from the parsed data
+        df = pd.DataFrame({
+            "StartTime": [format_milliseconds(ms) for ms in columns["StartMs"].tolist()],
+            "EndTime": [format_milliseconds(ms) for ms in columns["EndMs"].tolist()],
+            "Text": columns["Text"],
+            "Speaker": columns["Speaker"],
+            "StartMs": columns["StartMs"],
+            "EndMs": columns["EndMs"],
+        })
+        trace.size = len(df)
+    return df, "\n".join(formatted_lines)
+
 
-    # Open the VTT file and read its content
-    with open(file_path) as file:
-        vtt_content = file.read()
+def format_TXT(file_path):
+    """
+    Read a plain-text transcript, such as the AMI transcripts in data/ami-transcripts, into the same
+    shape as format_VTT. Plain text carries no timing or speaker information, so every sentence becomes
+    one untimed turn.
 
+    Args:
+        file_path (str): The path to the text file.
 
-    # Helper function to format timestamps in VTT entries
-    def format_time_stamp(time_stamp):
-        # Match the time stamp pattern
-        match = re.match(r"(\d+):(\d+):(\d+)\.(\d+) --> (\d+):(\d+):(\d+)\.(\d+)", time_stamp)
-        if match:
-            # Extract the individual components of the time stamp
-            hours1, minutes1, seconds1, milliseconds1 = map(int, match.groups()[:4])
-            hours2, minutes2, seconds2, milliseconds2 = map(int, match.groups()[4:])
+    Returns:
+        tuple: A tuple containing a DataFrame with one 'Text' row per sentence and the file content as a string.
+    """
+    # Only plain-text transcripts need the sentence tokenizer
+    import nltk
 
-            # Format the time stamps
-            formatted_time1 = f"{hours1:03d}:{minutes1:02d}:{seconds1:02d}.{milliseconds1:03d}"
-            formatted_time2 = f"{hours2:03d}:{minutes2:02d}:{seconds2:02d}.{milliseconds2:03d}"
+    with open(file_path, encoding="utf-8") as file:
+        content = file.read()
 
-            # Combine the formatted time stamps
-            return f"{formatted_time1} --> {formatted_time2}"
-        else:
-            return time_stamp
-
-    # Format the content of the VTT file by updating its timestamps
-    formatted_content = "\n".join(
-        format_time_stamp(line) if "-->" in line else line
-        for line in vtt_content.splitlines()
-    )
-
-    # Save the formatted content to a new .vtt file
-    with open("data/formatted_output.vtt", "w", encoding="utf-8") as file:
-        file.write(formatted_content)
-
-
-    formatted_output = 'data/formatted_output.vtt'
-    print(), print("Formatted .vtt file saved as '" + formatted_output + "'.")
-
-    start=[]
-    end=[]
-    text=[]
-    speaker=[]
-    # Read the formatted VTT file using webvtt-py to parse its contents
-    for caption in webvtt.read(formatted_output):
-        start.append(caption.start)
-        end.append(caption.end)
-        text.append(caption.text)
-        speaker.append(caption.raw_text)
-
-    # Create a DataFrame from the parsed data
-    df = pd.DataFrame(list(zip(start,end,text,speaker)), columns = ['StartTime', 'EndTime',"Text","Speaker"])
-    listx=df['Speaker'].str.split('>', n=1, expand=True)
-    df["Speaker"]=listx[0]
-    df["Speaker"]=df["Speaker"].str.replace("<v ","")
-    return df, formatted_content
\ No newline at end of file
+    df = pd.DataFrame({"Text": nltk.sent_tokenize(content)})
+    return df, content
+
+
+def cue_times_ms(df):
+    """
+    Start and end of every cue in milliseconds, as NumPy arrays. The 'StartMs' and 'EndMs' columns written
+    by format_VTT are used as they are; frames holding only 'StartTime' and 'EndTime' strings are parsed
+    in one vectorized pass. The frame is never modified.
+
+    Args:
+        df (pd.DataFrame): Cue table with 'StartMs'/'EndMs' or 'StartTime'/'EndTime' columns.
+
+    Returns:
+        tuple: Two int64 arrays holding the start and end times in milliseconds.
+    """
+    if "StartMs" in df and "EndMs" in df:
+        return df["StartMs"].to_numpy(dtype=np.int64), df["EndMs"].to_numpy(dtype=np.int64)
+
+    def parse(column):
+        return pd.to_timedelta(column.astype(str)).to_numpy().astype("timedelta64[ms]").astype(np.int64)
+
+    return parse(df["StartTime"]), parse(df["EndTime"])
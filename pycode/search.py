@@ -0,0 +1,73 @@
+import argparse
+from packages.search_index import SearchIndex, DEFAULT_INDEX_DIR
+from packages.embeddings import EmbeddingIndex, DEFAULT_EMBEDDING_DIR
+from packages.vtt_formatting import format_milliseconds
+
+
+def print_hit(hit, context=0):
+    """Print a hit, with the cues around it when `context` is set."""
+    timestamp = format_milliseconds(hit.start_ms) if hit.start_ms is not None else "untimed"
+    print(f"{hit.score:7.2f}  {hit.path}  cue {hit.cue}  [{timestamp}]")
+    if not context:
+        print(f"         {hit.speaker or ''}: {hit.text or ''}".rstrip())
+        return
+
+    from packages.transcript_store import load_or_convert
+    transcript = load_or_convert(hit.path)[0]
+    for cue in range(max(hit.cue - context, 0), min(hit.cue + context + 1, len(transcript))):
+        marker = ">" if cue == hit.cue else " "
+        print(f"       {marker} {transcript.speaker(cue) or ''}: {transcript.text(cue)}")
+
+
+def print_passage(hit):
+    """Print a semantic hit: the passage of consecutive cues similar to the query."""
+    timestamp = format_milliseconds(hit.start_ms) if hit.start_ms is not None else "untimed"
+    print(f"{hit.score:7.2f}  {hit.path}  cues {hit.first_cue}-{hit.last_cue}  [{timestamp}]")
+    print(f"         {hit.text or ''}".rstrip())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search the cues of every indexed transcript, or add transcripts to the index.")
+    parser.add_argument("query", nargs="*", help="words to look for")
+    parser.add_argument("-n", "--limit", type=int, default=10, help="number of hits (default: %(default)s)")
+    parser.add_argument("-c", "--context", type=int, default=0, help="cues shown before and after every hit")
+    parser.add_argument("--index", nargs="+", metavar="PATH", help="index .vtt or .txt transcripts, or directories holding them")
+    parser.add_argument("--force", action="store_true", help="index again transcripts that are up to date")
+    parser.add_argument("--compact", action="store_true", help="merge the index into a single segment")
+    parser.add_argument("--index-dir", help=f"directory of the index (default: {DEFAULT_INDEX_DIR}, "
+                                            f"or {DEFAULT_EMBEDDING_DIR} with --semantic)")
+    parser.add_argument("-s", "--semantic", action="store_true",
+                        help="search and index by meaning with sentence embeddings, e.g. \"discussions about the budget\"")
+    parser.add_argument("--train", action="store_true", help="cluster the semantic index again (with --semantic)")
+    args = parser.parse_args()
+
+    if args.semantic:
+        index = EmbeddingIndex(args.index_dir or DEFAULT_EMBEDDING_DIR)
+        if args.index:
+            from packages.pipeline import expand_paths
+            print(f"{index.index_files(expand_paths(args.index), force=args.force)} transcripts embedded")
+        if args.train:
+            index.train()
+        if args.query:
+            hits = index.search(" ".join(args.query), limit=args.limit)
+            for hit in hits:
+                print_passage(hit)
+            if not hits:
+                print("The semantic index is empty")
+        elif not (args.index or args.train):
+            parser.error("nothing to do: give a query, --index or --train")
+    else:
+        index = SearchIndex(args.index_dir or DEFAULT_INDEX_DIR)
+        if args.index:
+            from packages.pipeline import expand_paths
+            print(f"{index.index_files(expand_paths(args.index), force=args.force)} transcripts indexed")
+        if args.compact:
+            index.compact()
+        if args.query:
+            hits = index.search(" ".join(args.query), limit=args.limit)
+            for hit in hits:
+                print_hit(hit, args.context)
+            if not hits:
+                print(f"No match in {len(index)} transcripts")
+        elif not (args.index or args.compact):
+            parser.error("nothing to do: give a query, --index or --compact")
@@ -0,0 +1,21 @@
+import argparse
+import dataclasses
+from packages.inference_server import serve, DEFAULT_HOST, DEFAULT_PORT
+from packages.summaries import INFERENCE_CONFIGS, DEFAULT_INFERENCE
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve summarization, sentiment and chunking to every MeetInsight client of the machine.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="interface to listen on (default: %(default)s)")
+    parser.add_argument("-p", "--port", type=int, default=DEFAULT_PORT, help="port to listen on (default: %(default)s)")
+    parser.add_argument("-b", "--batch-size", type=int, default=8, help="largest number of texts per generate call")
+    parser.add_argument("--max-delay", type=float, default=0.05, help="seconds a request waits for others to share its batch")
+    parser.add_argument("-i", "--inference", choices=INFERENCE_CONFIGS, default=DEFAULT_INFERENCE,
+                        help="model and quantization preset (default: %(default)s)")
+    parser.add_argument("-t", "--threads", type=int, default=None, help="torch intra-op threads (defaults to the torch default)")
+    args = parser.parse_args()
+
+    # Clients find the service through MEETINSIGHT_SERVICE_URL=http://<host>:<port>
+    config = INFERENCE_CONFIGS[args.inference]
+    if args.threads:
+        config = dataclasses.replace(config, intra_op_threads=args.threads)
+    serve(args.host, args.port, args.batch_size, args.max_delay, config=config)
@@ -0,0 +1,26 @@
+import argparse
+import dataclasses
+from packages.synthetic import PRESETS, generate_vtt
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic meeting as a VTT file.")
+    parser.add_argument("output", help="path of the VTT file written")
+    parser.add_argument("-p", "--preset", choices=list(PRESETS), default="meeting", help="meeting shape (default: %(default)s)")
+    parser.add_argument("-x", "--scale", type=float, default=1.0, help="multiply the duration and the cue count of the preset")
+    parser.add_argument("--duration", type=float, default=None, help="length of the meeting in seconds")
+    parser.add_argument("--cues", type=int, default=None, help="number of cues")
+    parser.add_argument("--speakers", type=int, default=None, help="number of speakers")
+    parser.add_argument("--words-median", type=float, default=None, help="median number of words per cue")
+    parser.add_argument("--words-sigma", type=float, default=None, help="spread of the log-normal cue lengths")
+    parser.add_argument("--overlap-rate", type=float, default=None, help="share of the cues overlapping the previous one")
+    parser.add_argument("--source", default=None, help="text file or directory the cue texts are cut from, e.g. data/ami-transcripts")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random generator")
+    args = parser.parse_args()
+
+    config = PRESETS[args.preset].scaled(args.scale)
+    overrides = {"duration_s": args.duration, "cues": args.cues, "speakers": args.speakers, "words_median": args.words_median,
+                 "words_sigma": args.words_sigma, "overlap_rate": args.overlap_rate, "source": args.source, "seed": args.seed}
+    config = dataclasses.replace(config, **{name: value for name, value in overrides.items() if value is not None})
+
+    transcript = generate_vtt(args.output, config)
+    print(f"{len(transcript)} cues from {len(transcript.speakers)} speakers written to {args.output}")
@@ -0,0 +1,65 @@
+import zlib
+import numpy as np
+import pytest
+from packages import embeddings
+from packages.embeddings import EmbeddingIndex, PASSAGE_WORDS
+from packages.transcript import Transcript
+
+DIM = 16
+
+
+def encode(texts):
+    # Stand-in for the model: a unit vector drawn from the text, near one of a few topics
+    topics = np.random.default_rng(0).normal(size=(8, DIM))
+    vectors = []
+    for text in texts:
+        rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+        vectors.append(topics[rng.integers(len(topics))] + 0.3 * rng.normal(size=DIM))
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def meeting(number, passages):
+    # One cue per passage, long enough to be a passage on its own
+    texts = [" ".join(f"m{number}p{i}w{j}" for j in range(PASSAGE_WORDS)) for i in range(passages)]
+    starts = np.arange(passages, dtype=np.int64) * 1000
+    return Transcript.from_columns(starts, starts + 900, np.zeros(passages, dtype=np.int32), ["A"], texts)
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddings, "TRAIN_MIN_ROWS", 64)
+    monkeypatch.setattr(embeddings, "TRAIN_SAMPLE_PER_LIST", 8)
+    monkeypatch.setattr(embeddings, "MAX_LIST_BLOCKS", 4)
+    index = EmbeddingIndex(str(tmp_path / "embeddings"), encode=encode, model_name="stub")
+    for number in range(12):
+        source = tmp_path / f"m{number}.vtt"
+        source.write_text(str(number))
+        index.add(str(source), meeting(number, 10))
+    return index
+
+
+def test_appended_rows_are_found_in_their_lists(index):
+    manifest = index._read_manifest()
+    assert manifest["trained_count"] == 70 and manifest["count"] == 120
+    assert manifest["list_blocks"] > 1
+
+    # Every row is in the list it was assigned to, once
+    lists, offsets = index._lists(manifest)
+    _, rows = index._arrays(manifest)
+    for block in np.asarray(offsets):
+        for number in range(manifest["n_lists"]):
+            assert (rows["list"][lists[block[number]:block[number + 1]]] == number).all()
+    assert sorted(np.asarray(lists).tolist()) == list(range(manifest["count"]))
+
+
+def test_probing_every_list_matches_an_exhaustive_search(index):
+    n_lists = index._read_manifest()["n_lists"]
+    hits = index.search("m3p4", limit=5, n_probe=n_lists, with_text=False)
+
+    manifest = index._read_manifest()
+    vectors, rows = index._arrays(manifest)
+    scores = np.asarray(vectors, dtype=np.float32) @ encode(["m3p4"])[0]
+    best = np.argsort(-scores, kind="stable")[:5]
+    assert [(hit.path, hit.first_cue) for hit in hits] == \
+           [(manifest["sources"][rows["transcript"][row]], int(rows["first_cue"][row])) for row in best]
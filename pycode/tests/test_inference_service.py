@@ -0,0 +1,31 @@
+import threading
+import pytest
+from packages import models, inference_client
+from packages.inference_server import InferenceServer
+from packages.summaries import INFERENCE_CONFIGS, default_config
+
+
+@pytest.fixture
+def service(monkeypatch):
+    # Only /health is called, so no model is loaded
+    server = InferenceServer(("127.0.0.1", 0), config=INFERENCE_CONFIGS["distilled-cpu"])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(inference_client, "SERVICE_URL", f"http://127.0.0.1:{server.server_port}")
+    models.clear("inference_service")
+    yield server
+
+    models.clear("inference_service")
+    server.shutdown()
+    server.server_close()
+
+
+def test_summaries_are_keyed_on_the_model_of_the_service(service):
+    assert service.config != default_config()
+    assert inference_client.summary_model_name() == INFERENCE_CONFIGS["distilled-cpu"].cache_name
+
+
+def test_summaries_are_keyed_on_the_local_preset_without_a_service(monkeypatch):
+    monkeypatch.setattr(inference_client, "SERVICE_URL", None)
+    assert inference_client.summary_model_name() == default_config().cache_name
@@ -0,0 +1,74 @@
+import json
+import time
+import threading
+import importlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from packages import models
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Chat completions stub: answers with the prompt, after a 429 for prompts starting with "busy"."""
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = payload["messages"][0]["content"]
+        server = self.server
+        with server.lock:
+            server.requests.append(prompt)
+            attempts = server.requests.count(prompt)
+
+        if prompt.startswith("busy") and attempts == 1:
+            self._reply(429, {"error": {"message": "Rate limit reached"}}, {"Retry-After": "0"})
+            return
+        if prompt.startswith("slow"):
+            # Earlier prompts answer later, so the responses arrive out of order
+            time.sleep(0.05 * (5 - int(prompt.split()[1])))
+        self._reply(200, {"choices": [{"message": {"content": f"answer to {prompt}"}}]})
+
+    def _reply(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def openai(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    module = importlib.reload(importlib.import_module("packages.openai"))
+    models.clear("openai_client")
+    yield module, server
+
+    models.clear("openai_client")
+    server.shutdown()
+    server.server_close()
+
+
+def test_rate_limited_request_is_retried(openai):
+    module, server = openai
+    assert module.chat("busy prompt") == "answer to busy prompt"
+    assert server.requests == ["busy prompt", "busy prompt"]
+
+
+def test_post_many_keeps_the_order_of_the_payloads(openai):
+    module, server = openai
+    prompts = [f"slow {i}" for i in range(5)]
+    responses = module.get_client().post_many("/chat/completions", [module.chat_payload(prompt) for prompt in prompts],
+                                              max_concurrency=5)
+    assert [module.chat_content(response) for response in responses] == [f"answer to {prompt}" for prompt in prompts]
+    assert sorted(server.requests) == prompts
@@ -0,0 +1,28 @@
+import numpy as np
+from packages.speaker_stats import compute_speaker_stats
+from packages.synthetic import SyntheticConfig, generate_transcript
+from packages.transcript import Transcript
+
+
+def test_speaker_without_turns():
+    # "Speaker B" is in the speaker table but never speaks, and sorts between the others
+    transcript = Transcript.from_columns(
+        np.array([0, 1000, 3000], dtype=np.int64), np.array([500, 2500, 3200], dtype=np.int64),
+        np.array([0, 2, 0], dtype=np.int32), ["Speaker A", "Speaker B", "Speaker C"],
+        ["Hello.", "Hi there.", "Bye."])
+    stats = compute_speaker_stats(transcript)
+
+    assert stats.speakers == ("Speaker A", "Speaker B", "Speaker C")
+    assert stats.talk_ms.tolist() == [700, 0, 1500]
+    assert stats.turns.tolist() == [2, 0, 1]
+    assert stats.longest_ms.tolist() == [500, 0, 1500]
+
+
+def test_unused_speakers_of_synthetic_meeting():
+    transcript = generate_transcript(SyntheticConfig(cues=5, speakers=10, duration_s=60))
+    stats = compute_speaker_stats(transcript)
+
+    assert stats.turns.sum() == len(transcript)
+    assert stats.talk_ms.sum() == int((transcript.end_ms - transcript.start_ms).sum())
+    assert np.all(stats.talk_ms[stats.turns == 0] == 0)
+    assert np.isclose(stats.talk_percent.sum(), 100)